@@ -1,79 +1,80 @@
 import os
+import time
+import argparse
+from datetime import datetime
+
 import django
-from django.db.models import Sum
 
 # Configuración inicial de Django para correr como script
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mundial_prode.settings')
 django.setup()
 
+from django.utils import timezone
+
 from core.models import Partido, Pronostico, PerfilEmpleado
+from core.historial import actualizar_historial
+from core.puntos import puntuar_partido, recalcular_totales
+
+# Columnas que necesita el motor de puntos (no traemos el resto del partido)
+CAMPOS_PARTIDO = ('id', 'numero_fecha', 'jugado', 'goles_local_real', 'goles_visitante_real')
+
 
-def calcular_puntos():
+def calcular_puntos(since=None, fecha=None, partido=None):
     print("--- INICIANDO CÁLCULO DE PUNTOS ---")
-    
-    # 1. Buscamos solo los partidos que YA SE JUGARON y tienen resultado cargado
-    partidos_jugados = Partido.objects.filter(jugado=True)
-    
-    print(f"Procesando {partidos_jugados.count()} partidos jugados...")
-
-    for partido in partidos_jugados:
-        # Obtenemos todos los pronósticos hechos para ese partido
-        pronosticos = Pronostico.objects.filter(partido=partido)
-        
-        real_local = partido.goles_local_real
-        real_visitante = partido.goles_visitante_real
-
-        for pron in pronosticos:
-            pred_local = pron.goles_local_prediccion
-            pred_visitante = pron.goles_visitante_prediccion
-            
-            puntos = 0
-
-            # A) ¿Acertó el resultado EXACTO? (Ej: Dijo 2-1 y fue 2-1)
-            if real_local == pred_local and real_visitante == pred_visitante:
-                puntos = 3 
-            
-            # B) Si no fue exacto, ¿acertó al menos quién ganaba?
-            else:
-                # Verificamos quién ganó en la realidad
-                gano_local_real = real_local > real_visitante
-                gano_visita_real = real_visitante > real_local
-                empate_real = real_local == real_visitante
-                
-                # Verificamos quién ganó en la predicción
-                gano_local_pred = pred_local > pred_visitante
-                gano_visita_pred = pred_visitante > pred_local
-                empate_pred = pred_local == pred_visitante
-                
-                # Si coinciden los escenarios, suma 1 punto
-                if (gano_local_real and gano_local_pred) or \
-                   (gano_visita_real and gano_visita_pred) or \
-                   (empate_real and empate_pred):
-                    puntos = 1
-            
-            # Guardamos los puntos en ese pronóstico específico
-            if pron.puntos_ganados != puntos:
-                pron.puntos_ganados = puntos
-                pron.save()
-    
-    # 2. Actualizar la Tabla de Posiciones (Suma total por usuario)
+    inicio = time.monotonic()
+
+    # 1. Elegimos los partidos a recalcular (por defecto, todos).
+    # Los que no están jugados también pasan: si tenían puntos, vuelven a 0.
+    partidos = Partido.objects.all()
+    if since:
+        partidos = partidos.filter(fecha_hora__gte=since)
+    if fecha is not None:
+        partidos = partidos.filter(numero_fecha=fecha)
+    if partido is not None:
+        partidos = partidos.filter(id=partido)
+
+    filas = Pronostico.objects.filter(partido__in=partidos).count()
+    print(f"Procesando {filas} pronósticos...")
+
+    # 2. Puntuar pronósticos (un UPDATE por partido, en un solo proceso: con
+    # SQLite las escrituras van de a una y repartirlas en procesos era más lento)
+    cambiados = 0
+    for p in partidos.only(*CAMPOS_PARTIDO).iterator():
+        cambiados += puntuar_partido(p, actualizar_ranking=False)
+
+    # 3. Actualizar la Tabla de Posiciones de los usuarios afectados (un solo UPDATE)
     print("Actualizando Ranking de Usuarios...")
-    perfiles = PerfilEmpleado.objects.all()
-    
-    for perfil in perfiles:
-        # Sumamos la columna 'puntos_ganados' de todos sus pronósticos
-        resultado = Pronostico.objects.filter(usuario=perfil.usuario).aggregate(Sum('puntos_ganados'))
-        total = resultado['puntos_ganados__sum']
-        
-        # Si no tiene puntos (None), le ponemos 0
-        if total is None:
-            total = 0
-            
-        perfil.puntos_totales = total
-        perfil.save()
-        print(f" > {perfil.usuario.username}: {total} pts")
+    if since or fecha is not None or partido is not None:
+        perfiles = PerfilEmpleado.objects.filter(
+            usuario__in=Pronostico.objects.filter(partido__in=partidos).values('usuario')
+        )
+    else:
+        perfiles = PerfilEmpleado.objects.all()
+    actualizados = recalcular_totales(perfiles)
+
+    # 4. Rehacer las fotos del ranking desde la primera fecha tocada
+    fotos = actualizar_historial(partidos.values_list('numero_fecha', flat=True).distinct())
 
+    duracion = time.monotonic() - inicio
+    por_segundo = filas / duracion if duracion else filas
+    print(f" > {cambiados} pronósticos cambiaron, {actualizados} perfiles recalculados, {fotos} filas de historial")
+    print(f" > {filas} filas en {duracion:.2f}s ({por_segundo:,.0f} filas/s)")
     print("--- CÁLCULO FINALIZADO ---")
 
+
+def parsear_fecha(valor):
+    return timezone.make_aware(datetime.strptime(valor, "%Y-%m-%d"))
+
+
 if __name__ == "__main__":
-    calcular_puntos()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Recalcula los puntos de los pronósticos y el ranking")
+    parser.add_argument('--since', type=parsear_fecha, help="Solo partidos desde esta fecha (AAAA-MM-DD)")
+    parser.add_argument('--fecha', type=int, help="Solo partidos de este numero_fecha")
+    parser.add_argument('--partido', type=int, help="Solo este partido (id)")
+    args = parser.parse_args()
+
+    calcular_puntos(
+        since=args.since,
+        fecha=args.fecha,
+        partido=args.partido,
+    )
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Partido, Pronostico, PerfilEmpleado, Empresa
+from .models import Partido, Pronostico, PerfilEmpleado, Empresa, SnapshotRanking
 
 # 1. Configuración para los Partidos
 @admin.register(Partido)
@@ -8,7 +8,7 @@ class PartidoAdmin(admin.ModelAdmin):
     list_display = ('numero_fecha', 'fecha_hora', 'equipo_local', 'goles_local_real', 'goles_visitante_real', 'equipo_visitante', 'jugado')
     
     # Filtros laterales (¡Súper útil!)
-    list_filter = ('numero_fecha', 'jugado')
+    list_filter = ('competicion', 'numero_fecha', 'jugado')
     
     # Buscador por nombre de equipos
     search_fields = ('equipo_local', 'equipo_visitante')
@@ -35,5 +35,13 @@ class PerfilEmpleadoAdmin(admin.ModelAdmin):
     search_fields = ('usuario__username', 'empresa__nombre')
     ordering = ('-puntos_totales',) # Ordenar por quien va ganando
 
-# 4. Configuración simple para Empresa
+# 4. Historial del ranking (se llena solo al terminar cada fecha)
+@admin.register(SnapshotRanking)
+class SnapshotRankingAdmin(admin.ModelAdmin):
+    list_display = ('numero_fecha', 'posicion', 'usuario', 'puntos')
+    list_filter = ('numero_fecha',)
+    search_fields = ('usuario__username',)
+    ordering = ('numero_fecha', 'posicion')
+
+# 5. Configuración simple para Empresa
 admin.site.register(Empresa)
\ No newline at end of file
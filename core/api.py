@@ -0,0 +1,230 @@
+import json
+from functools import wraps
+
+from django.db.models import Count, Q, Subquery
+from django.http import JsonResponse
+from django.utils import timezone
+
+from .condicional import segun_versiones
+from .models import Partido, PerfilEmpleado, Pronostico, Torneo
+from .pronosticos import guardar_pronosticos
+from .ranking import TAMANIO_PAGINA, pagina_ranking_valores, perfiles_del_alcance
+
+# --- API JSON ---
+# Lo mismo que muestran las páginas, en JSON compacto (para la app móvil):
+#   GET  /api/partidos/[?fecha=N]                             fixture
+#   GET  /api/pronosticos/[?fecha=N]                          mis pronósticos
+#   POST /api/pronosticos/                                    varios pronósticos de una vez
+#   GET  /api/ranking/[?empresa=|torneo=][&despues=][&n=]     tabla, paginada por cursor
+#   GET  /api/torneos/                                        mis torneos
+# Todas aceptan ?campos=a,b para traer solo esos campos. Las filas salen de
+# .values() (sin armar instancias del modelo) y el JSON va sin espacios.
+# Se autentica con la sesión, igual que el sitio: los POST llevan X-CSRFToken.
+
+TAMANIO_MAXIMO = 200  # Filas por página del ranking (?n=)
+LOTE_MAXIMO = 100     # Pronósticos por POST
+
+# Nombre en la API -> campo para .values()
+CAMPOS_PARTIDO = {
+    'id': 'id',
+    'fecha': 'numero_fecha',
+    'hora': 'fecha_hora',
+    'local': 'equipo_local',
+    'visitante': 'equipo_visitante',
+    'escudo_local': 'escudo_local',
+    'escudo_visitante': 'escudo_visitante',
+    'jugado': 'jugado',
+    'goles_local': 'goles_local_real',
+    'goles_visitante': 'goles_visitante_real',
+}
+CAMPOS_PRONOSTICO = {
+    'partido': 'partido_id',
+    'local': 'goles_local_prediccion',
+    'visitante': 'goles_visitante_prediccion',
+    'puntos': 'puntos_ganados',
+}
+CAMPOS_PERFIL = {
+    'posicion': 'posicion',  # La calcula pagina_ranking_valores
+    'id': 'id',
+    'usuario': 'usuario__username',
+    'empresa': 'empresa__nombre',
+    'puntos': 'puntos_totales',
+}
+CAMPOS_TORNEO = {
+    'id': 'id',
+    'nombre': 'nombre',
+    'codigo': 'codigo',
+    'creador': 'creador__username',
+    'participantes': 'participantes_cantidad',  # Anotados en la consulta
+    'mi_posicion': 'mi_posicion',
+}
+
+
+class ErrorAPI(Exception):
+
+    def __init__(self, mensaje, status=400):
+        super().__init__(mensaje)
+        self.status = status
+
+
+def _json(datos, status=200):
+    return JsonResponse(datos, status=status, safe=False, json_dumps_params={'separators': (',', ':')})
+
+
+def endpoint(metodos=('GET',), login=False):
+    """Método permitido, sesión (401 en vez de redirigir al login) y ErrorAPI -> JSON."""
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in metodos:
+                respuesta = _json({'error': 'Método no permitido'}, status=405)
+                respuesta['Allow'] = ', '.join(metodos)
+                return respuesta
+            if login and not request.user.is_authenticated:
+                return _json({'error': 'Hace falta iniciar sesión'}, status=401)
+            try:
+                return vista(request, *args, **kwargs)
+            except ErrorAPI as e:
+                return _json({'error': str(e)}, status=e.status)
+        return envoltura
+    return decorador
+
+
+def _elegir(request, campos):
+    """?campos=a,b -> {nombre: campo} solo con esos (por defecto, todos)."""
+    pedidos = request.GET.get('campos')
+    if not pedidos:
+        return campos
+    nombres = pedidos.split(',')
+    desconocidos = [nombre for nombre in nombres if nombre not in campos]
+    if desconocidos:
+        raise ErrorAPI(f"Campos desconocidos: {', '.join(desconocidos)}. Disponibles: {', '.join(campos)}")
+    return {nombre: campos[nombre] for nombre in nombres}
+
+
+def _filas(filas, campos):
+    return [{nombre: fila[campo] for nombre, campo in campos.items()} for fila in filas]
+
+
+def _entero(request, parametro, defecto=None):
+    valor = request.GET.get(parametro)
+    if not valor:
+        return defecto
+    try:
+        return int(valor)
+    except ValueError:
+        raise ErrorAPI(f"'{parametro}' tiene que ser un número")
+
+
+# --- PARTIDOS ---
+@endpoint()
+@segun_versiones(lambda request: (['fixture'], ()))
+def partidos(request):
+    campos = _elegir(request, CAMPOS_PARTIDO)
+    consulta = Partido.objects.order_by('fecha_hora')
+    numero_fecha = _entero(request, 'fecha')
+    if numero_fecha is not None:
+        consulta = consulta.filter(numero_fecha=numero_fecha)
+    return _json({'partidos': _filas(consulta.values(*campos.values()), campos)})
+
+
+# --- PRONÓSTICOS ---
+def _dominios_pronosticos(request):
+    # Los puntos ganados cambian al puntuar: eso también cambia el fixture y el ranking
+    return ['fixture', 'ranking', f"pronosticos:{request.user.pk}"], ()
+
+
+@endpoint(metodos=('GET', 'POST'), login=True)
+@segun_versiones(_dominios_pronosticos)
+def pronosticos(request):
+    if request.method == 'POST':
+        return _guardar_lote(request)
+
+    campos = _elegir(request, CAMPOS_PRONOSTICO)
+    consulta = Pronostico.objects.filter(usuario=request.user).order_by('partido__fecha_hora')
+    numero_fecha = _entero(request, 'fecha')
+    if numero_fecha is not None:
+        consulta = consulta.filter(partido__numero_fecha=numero_fecha)
+    return _json({'pronosticos': _filas(consulta.values(*campos.values()), campos)})
+
+
+def _guardar_lote(request):
+    """
+    Cuerpo: {"pronosticos": [{"partido": id, "local": goles, "visitante": goles}, ...]}
+    Se guardan todos con un solo upsert (guardar_pronosticos). Los partidos
+    que ya empezaron o que no existen vuelven en "rechazados".
+    """
+    try:
+        lote = json.loads(request.body)['pronosticos']
+        goles_por_partido = {
+            item['partido']: (item['local'], item['visitante']) for item in lote
+        }
+    except (ValueError, KeyError, TypeError):
+        raise ErrorAPI('Se espera {"pronosticos": [{"partido": id, "local": goles, "visitante": goles}, ...]}')
+    if len(goles_por_partido) > LOTE_MAXIMO:
+        raise ErrorAPI(f"Como máximo {LOTE_MAXIMO} pronósticos por pedido")
+    valores = [*goles_por_partido, *[goles for par in goles_por_partido.values() for goles in par]]
+    if not all(type(valor) is int and valor >= 0 for valor in valores):
+        raise ErrorAPI("Los partidos y los goles tienen que ser enteros no negativos")
+
+    partidos_del_lote = Partido.objects.filter(id__in=goles_por_partido).only('id', 'fecha_hora', 'jugado')
+    guardados = guardar_pronosticos(request.user, partidos_del_lote, goles_por_partido, timezone.now())
+    aceptados = {pronostico.partido_id for pronostico in guardados}
+    return _json({
+        'guardados': sorted(aceptados),
+        'rechazados': sorted(set(goles_por_partido) - aceptados),
+    })
+
+
+# --- RANKING ---
+def _dominios_ranking(request):
+    # Mismo parseo que la vista: '?torneo=01' y '?torneo=1' comparten versión
+    torneo_id = _entero(request, 'torneo')
+    if torneo_id is not None:
+        return [f"torneo:{torneo_id}"], ()
+    empresa_id = _entero(request, 'empresa')
+    if empresa_id is not None:
+        return [f"empresa:{empresa_id}"], ()
+    return ['ranking'], ()
+
+
+@endpoint()
+@segun_versiones(_dominios_ranking)
+def ranking(request):
+    """Global, de una empresa (?empresa=<id>) o de un torneo propio (?torneo=<id>)."""
+    campos = _elegir(request, CAMPOS_PERFIL)
+    empresa_id = _entero(request, 'empresa')
+    torneo_id = _entero(request, 'torneo')
+    tamanio = min(max(_entero(request, 'n', TAMANIO_PAGINA), 1), TAMANIO_MAXIMO)
+
+    # La tabla de un torneo solo la ven sus participantes (como la página)
+    if torneo_id is not None and not (
+        request.user.is_authenticated
+        and Torneo.participantes.through.objects.filter(torneo_id=torneo_id, user_id=request.user.pk).exists()
+    ):
+        raise ErrorAPI("No participás de ese torneo", status=404)
+
+    extra = [campo for campo in campos.values() if campo not in ('id', 'puntos_totales', 'posicion')]
+    filas, cursor_siguiente = pagina_ranking_valores(
+        perfiles_del_alcance(empresa_id, torneo_id), extra, request.GET.get('despues'), tamanio
+    )
+    return _json({'filas': _filas(filas, campos), 'siguiente': cursor_siguiente})
+
+
+# --- TORNEOS ---
+@endpoint(login=True)
+def torneos(request):
+    """Mis torneos, con la cantidad de participantes y mi posición en cada uno (una consulta)."""
+    campos = _elegir(request, CAMPOS_TORNEO)
+    mis_puntos = PerfilEmpleado.objects.filter(usuario=request.user).values('puntos_totales')[:1]
+    consulta = Torneo.objects.filter(
+        id__in=Torneo.participantes.through.objects.filter(user=request.user).values('torneo')
+    ).annotate(
+        participantes_cantidad=Count('participantes', distinct=True),
+        mi_posicion=Count(
+            'participantes',
+            filter=Q(participantes__perfilempleado__puntos_totales__gt=Subquery(mis_puntos)),
+            distinct=True,
+        ) + 1,
+    ).order_by('nombre')
+    return _json({'torneos': _filas(consulta.values(*campos.values()), campos)})
@@ -0,0 +1,128 @@
+import json
+import logging
+import os
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+# --- CLIENTE DE LA API DE FOOTBALL DATA ---
+# Lo comparten importar_fixture.py y el comando actualizar_resultados.
+#  - Una sola sesión HTTP (reutiliza conexiones)
+#  - GET condicional con ETag / Last-Modified: si nada cambió la API responde 304
+#  - Ventana de fechas alrededor de "hoy" para las sincronizaciones de rutina
+#  - Respeta los headers de límite de pedidos de la API
+
+
+class ClienteFootballData:
+
+    def __init__(self, token=None, url_base=None, archivo_estado=None, timeout=15):
+        self.url_base = (url_base or settings.FOOTBALL_DATA_URL).rstrip('/')
+        self.archivo_estado = archivo_estado or settings.FOOTBALL_DATA_ESTADO
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        self.session.mount('https://', HTTPAdapter(pool_connections=2, pool_maxsize=10))
+        self.session.mount('http://', HTTPAdapter(pool_connections=2, pool_maxsize=10))
+        self.session.headers['X-Auth-Token'] = token or os.getenv('API_TOKEN', '')
+
+        self._estado = self._leer_estado()
+        self._pendientes = {}
+        self._esperar_hasta = 0
+
+    # --- API PÚBLICA ---
+    def partidos(self, competicion, completo=False, dias_antes=3, dias_despues=7):
+        """
+        Partidos de una competencia. Por defecto solo trae una ventana de
+        fechas alrededor de hoy; con completo=True trae toda la temporada.
+        Devuelve None si la API indica que nada cambió desde la última vez.
+        """
+        params = {}
+        if not completo:
+            hoy = timezone.now().date()
+            params['dateFrom'] = (hoy - timedelta(days=dias_antes)).isoformat()
+            params['dateTo'] = (hoy + timedelta(days=dias_despues)).isoformat()
+
+        data = self.get_condicional(f"/competitions/{competicion}/matches", params)
+        return None if data is None else data.get('matches', [])
+
+    def get_condicional(self, ruta, params=None):
+        """GET que manda el ETag/Last-Modified guardado. Devuelve None si hubo 304."""
+        params = params or {}
+        clave = ruta + '?' + '&'.join(f"{k}={v}" for k, v in sorted(params.items()))
+
+        headers = {}
+        anterior = self._estado.get(clave, {})
+        if anterior.get('etag'):
+            headers['If-None-Match'] = anterior['etag']
+        if anterior.get('last_modified'):
+            headers['If-Modified-Since'] = anterior['last_modified']
+
+        response = self.get(ruta, params, headers)
+        if response.status_code == 304:
+            return None
+
+        validadores = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+        if validadores['etag'] or validadores['last_modified']:
+            self._pendientes[clave] = validadores
+        return response.json()
+
+    def get(self, ruta, params=None, headers=None, intentos=3):
+        """GET con reintentos cuando la API responde 429 (demasiados pedidos)."""
+        for intento in range(intentos):
+            self._esperar_limite()
+            response = self.session.get(
+                self.url_base + ruta, params=params, headers=headers, timeout=self.timeout
+            )
+            self._registrar_limite(response)
+
+            if response.status_code == 429 and intento < intentos - 1:
+                continue
+            response.raise_for_status()
+            return response
+
+    def confirmar(self):
+        """
+        Guarda los ETag de las respuestas ya procesadas. Se llama DESPUÉS de
+        guardar los datos en la base: si algo falla antes, la próxima vez se
+        vuelve a descargar todo en lugar de recibir un 304.
+        """
+        if not self._pendientes:
+            return
+        self._estado.update(self._pendientes)
+        self._pendientes = {}
+        with open(self.archivo_estado, 'w') as archivo:
+            json.dump(self._estado, archivo)
+
+    # --- LÍMITE DE PEDIDOS ---
+    def _registrar_limite(self, response):
+        # Football Data informa cuántos pedidos quedan en el minuto y en
+        # cuántos segundos se reinicia el contador
+        disponibles = response.headers.get('X-Requests-Available-Minute')
+        reinicio = response.headers.get('X-RequestCounter-Reset') or response.headers.get('Retry-After')
+
+        if response.status_code == 429 or disponibles == '0':
+            segundos = int(reinicio) if reinicio and reinicio.isdigit() else 60
+            self._esperar_hasta = time.monotonic() + segundos
+
+    def _esperar_limite(self):
+        espera = self._esperar_hasta - time.monotonic()
+        if espera > 0:
+            logger.warning("Límite de la API alcanzado, esperando %.0fs", espera)
+            time.sleep(espera)
+
+    # --- ESTADO (ETag guardados entre ejecuciones) ---
+    def _leer_estado(self):
+        try:
+            with open(self.archivo_estado) as archivo:
+                return json.load(archivo)
+        except (OSError, ValueError):
+            return {}
@@ -0,0 +1,43 @@
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler
+
+# --- HANDLER ASGI ---
+# En Django 4.1 el ASGIHandler recorre el cuerpo de un StreamingHttpResponse
+# dentro del event loop: si el iterador usa el ORM (las exportaciones) falla
+# con SynchronousOnlyOperation, y si no, cada bloque frena a todos los demás
+# pedidos mientras se arma. Este handler pide cada bloque con
+# sync_to_async(next): el iterador corre en el hilo del pedido (el mismo que
+# usó la vista, con su conexión a la base) y el loop sigue atendiendo a los
+# demás mientras tanto. Las respuestas comunes se mandan igual que siempre.
+
+_FIN = object()
+
+
+class ManejadorASGI(ASGIHandler):
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        # Encabezados y cookies, igual que ASGIHandler.send_response
+        encabezados = []
+        for nombre, valor in response.items():
+            if isinstance(nombre, str):
+                nombre = nombre.encode('ascii')
+            if isinstance(valor, str):
+                valor = valor.encode('latin1')
+            encabezados.append((bytes(nombre), bytes(valor)))
+        for cookie in response.cookies.values():
+            encabezados.append((b'Set-Cookie', cookie.output(header='').encode('ascii').strip()))
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': encabezados})
+
+        siguiente = sync_to_async(next, thread_sensitive=True)
+        iterador = iter(response)
+        try:
+            while (parte := await siguiente(iterador, _FIN)) is not _FIN:
+                for bloque, _ in self.chunk_bytes(parte):
+                    await send({'type': 'http.response.body', 'body': bloque, 'more_body': True})
+            await send({'type': 'http.response.body'})
+        finally:
+            # Cierra el iterador (y su cursor) aunque el cliente se haya ido
+            await sync_to_async(response.close, thread_sensitive=True)()
@@ -0,0 +1,89 @@
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
+from django.utils.http import http_date, quote_etag
+
+from . import fixture
+from .versiones import cache_compartida, versiones
+
+# --- GET CONDICIONAL (ETag / 304) ---
+# Cada página de solo lectura depende de pocos dominios de versiones (ver
+# versiones.py): 'ranking', 'empresa:<id>', 'torneo:<id>', 'fecha:<n>',
+# 'pronosticos:<usuario>'... El ETag se arma con esas versiones y con la
+# cookie de sesión (la página muestra al usuario y lleva su token CSRF).
+# Si el navegador manda el mismo ETag se contesta 304 sin tocar la base de
+# la app ni renderizar. Con Cache-Control: no-cache el navegador pregunta
+# siempre antes de usar lo que tiene guardado.
+#
+# Last-Modified sale de la versión más nueva, pero el 304 se decide solo por
+# el ETag: If-Modified-Since tiene resolución de un segundo y no sabe del
+# usuario, así que podría devolver una página vieja.
+#
+# Solo con una cache compartida (PRODE_CACHE_DIR): con la cache en memoria de
+# cada proceso, un worker no se entera de lo que cambió otro y contestaría 304
+# con una página vieja. Sin cache compartida las vistas responden como siempre.
+
+
+def _validadores(request, dominios, args, kwargs):
+    nombres, otros = dominios(request, *args, **kwargs)
+    numeros = versiones(*nombres)
+    sesion = request.COOKIES.get(settings.SESSION_COOKIE_NAME, '')
+    etag = hashlib.md5(repr((numeros, otros, sesion)).encode()).hexdigest()
+    return quote_etag(etag), max(numeros) // 1_000_000
+
+
+def _marcar(respuesta, etag, ultima):
+    if respuesta.status_code in (200, 304):
+        respuesta.headers.setdefault('ETag', etag)
+        respuesta.headers.setdefault('Last-Modified', http_date(ultima))
+    patch_cache_control(respuesta, private=True, no_cache=True)
+    return respuesta
+
+
+def segun_versiones(dominios):
+    """
+    Decorador de vistas: 304 si el ETag del navegador coincide.
+    Sin cache compartida no hace nada (ver arriba).
+    dominios(request, *args, **kwargs) devuelve (dominios de versiones, otros
+    valores de los que depende la página); solo puede leer la cache.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or not cache_compartida():
+                return vista(request, *args, **kwargs)
+            etag, ultima = _validadores(request, dominios, args, kwargs)
+            respuesta = get_conditional_response(request, etag=etag)
+            if respuesta is None:
+                respuesta = vista(request, *args, **kwargs)
+            return _marcar(respuesta, etag, ultima)
+        return envoltura
+    return decorador
+
+
+# --- DOMINIOS DE CADA PÁGINA ---
+def dominios_ranking(request):
+    # Las flechas de movimiento salen del historial, que también incrementa 'ranking'
+    return ['ranking'], ()
+
+
+def dominios_ranking_empresa(request, empresa_id):
+    return [f"empresa:{empresa_id}"], ()
+
+
+def dominios_torneo(request, torneo_id):
+    # Unirse o salir del torneo incrementa su versión: también cubre el permiso
+    return [f"torneo:{torneo_id}"], ()
+
+
+def dominios_prode(request):
+    from .views import fecha_a_mostrar
+
+    ahora = timezone.now()
+    numero_fecha = fecha_a_mostrar(request.GET.get('fecha'), fixture.fechas_disponibles(), ahora)
+    # Un partido que empieza queda bloqueado: cambia la página sin cambiar ningún dato
+    empezados = sum(partido.fecha_hora < ahora for partido in fixture.partidos_de_fecha(numero_fecha))
+    return ['fixture', f"fecha:{numero_fecha}", f"pronosticos:{request.user.pk}"], (numero_fecha, empezados)
@@ -0,0 +1,6 @@
+from django.conf import settings
+
+
+def en_vivo(request):
+    """Las páginas solo se conectan a /eventos/ si lo sirve el proceso (ASGI)."""
+    return {'en_vivo': settings.PRODE_EN_VIVO}
@@ -0,0 +1,182 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+# --- RESULTADOS EN VIVO (SERVER-SENT EVENTS) ---
+# Cada vez que se puntúa un partido se guarda un EventoEnVivo con el marcador
+# y los puntos_totales nuevos de los usuarios que cambiaron. Los procesos que
+# puntúan (señal del admin, cron, vigilar_partidos) no son el que atiende a
+# los navegadores: la tabla hace de buzón entre procesos.
+#
+# En el proceso ASGI un único Publicador lee los eventos nuevos (una consulta
+# por vuelta, no una por cliente) y los reparte a la cola de cada conexión
+# abierta en /eventos/. La conexión la atiende una app ASGI propia que envuelve
+# a la de Django (en 4.1 StreamingHttpResponse no acepta iteradores async).
+
+RUTA = '/eventos/'
+CONSERVAR = 1000          # Eventos que quedan en la tabla (el resto se borra)
+RECORTAR_CADA = 100       # Cada cuántos eventos se borran los viejos
+PENDIENTES_MAXIMOS = 100  # Si un cliente se atrasa más que esto, se lo desconecta
+LATIDO = 15               # Segundos entre comentarios "ping" para que no corten la conexión
+
+
+def _datos(partido, ranking):
+    return {
+        'partido': {
+            'id': partido.id,
+            'numero_fecha': partido.numero_fecha,
+            'jugado': partido.jugado,
+            'goles_local': partido.goles_local_real,
+            'goles_visitante': partido.goles_visitante_real,
+        },
+        'ranking': [list(fila) for fila in ranking],
+    }
+
+
+def publicar_resultados(partidos):
+    """Guarda de una vez el evento (solo marcador) de varios partidos."""
+    from .models import EventoEnVivo
+
+    eventos = EventoEnVivo.objects.bulk_create([EventoEnVivo(datos=_datos(partido, ())) for partido in partidos])
+    if eventos:
+        _recortar(eventos[0].id, eventos[-1].id)
+    return eventos
+
+
+def publicar_resultado(partido, ranking=()):
+    """
+    Guarda el evento de un partido puntuado.
+    ranking: pares (perfil_id, puntos_totales) de los perfiles que cambiaron.
+    """
+    from .models import EventoEnVivo
+
+    evento = EventoEnVivo.objects.create(datos=_datos(partido, ranking))
+    _recortar(evento.id, evento.id)
+    return evento
+
+
+def _recortar(primero, ultimo):
+    """Borra los eventos viejos cuando los ids nuevos cruzan un múltiplo de RECORTAR_CADA."""
+    from .models import EventoEnVivo
+
+    if (primero - 1) // RECORTAR_CADA != ultimo // RECORTAR_CADA:
+        EventoEnVivo.objects.filter(id__lte=ultimo - CONSERVAR).delete()
+
+
+def _ultimo_id():
+    from .models import EventoEnVivo
+
+    return EventoEnVivo.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _eventos_desde(ultimo_id):
+    from .models import EventoEnVivo
+
+    return list(EventoEnVivo.objects.filter(id__gt=ultimo_id).order_by('id').values_list('id', 'datos'))
+
+
+def formato_sse(evento_id, datos):
+    return f"id: {evento_id}\nevent: resultado\ndata: {json.dumps(datos)}\n\n".encode()
+
+
+class Publicador:
+    """Lee los eventos nuevos una vez y los reparte a todas las conexiones abiertas."""
+
+    def __init__(self):
+        self.suscriptores = set()
+        self.tarea = None
+
+    def suscribir(self):
+        cola = asyncio.Queue(maxsize=PENDIENTES_MAXIMOS)
+        self.suscriptores.add(cola)
+        # La tarea vive mientras haya alguien escuchando (y en el loop actual)
+        if self.tarea is None or self.tarea.done() or self.tarea.get_loop() is not asyncio.get_running_loop():
+            self.tarea = asyncio.create_task(self.vigilar())
+        return cola
+
+    def desuscribir(self, cola):
+        self.suscriptores.discard(cola)
+
+    async def vigilar(self):
+        # Se arranca desde el último evento: al conectarse no se repite lo viejo
+        ultimo_id = await sync_to_async(_ultimo_id)()
+        while self.suscriptores:
+            await asyncio.sleep(settings.PRODE_EN_VIVO_INTERVALO)
+            for evento_id, datos in await sync_to_async(_eventos_desde)(ultimo_id):
+                ultimo_id = evento_id
+                self.repartir(formato_sse(evento_id, datos))
+
+    def repartir(self, mensaje):
+        for cola in list(self.suscriptores):
+            try:
+                cola.put_nowait(mensaje)
+            except asyncio.QueueFull:
+                # Cliente demasiado lento: se corta y EventSource se reconecta solo
+                self.suscriptores.discard(cola)
+                while not cola.empty():
+                    cola.get_nowait()
+                cola.put_nowait(None)
+
+
+async def _esperar_desconexion(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+class AplicacionEventos:
+    """App ASGI: atiende RUTA con el stream de eventos y pasa todo lo demás a Django."""
+
+    def __init__(self, django):
+        self.django = django
+        self.publicador = Publicador()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == RUTA:
+            await self.transmitir(scope, receive, send)
+        else:
+            await self.django(scope, receive, send)
+
+    async def transmitir(self, scope, receive, send):
+        if scope['method'] != 'GET':
+            await send({'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'GET')]})
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),  # que nginx no lo guarde en buffer
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+
+        cola = self.publicador.suscribir()
+        desconexion = asyncio.ensure_future(_esperar_desconexion(receive))
+        lectura = None
+        try:
+            while True:
+                if lectura is None:
+                    lectura = asyncio.ensure_future(cola.get())
+                hechas, _ = await asyncio.wait(
+                    {lectura, desconexion}, timeout=LATIDO, return_when=asyncio.FIRST_COMPLETED
+                )
+                if desconexion in hechas:
+                    return
+                if lectura in hechas:
+                    mensaje, lectura = lectura.result(), None
+                    if mensaje is None:
+                        break
+                else:
+                    mensaje = b': ping\n\n'
+                await send({'type': 'http.response.body', 'body': mensaje, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            self.publicador.desuscribir(cola)
+            desconexion.cancel()
+            if lectura is not None:
+                lectura.cancel()
@@ -0,0 +1,105 @@
+import csv
+import json
+from itertools import islice
+
+from .models import Pronostico, SnapshotRanking
+from .ranking import perfiles_del_alcance
+
+# --- EXPORTACIONES (CSV / NDJSON) ---
+# La tabla de posiciones y los pronósticos, filtrados por empresa, torneo o
+# fecha. Las filas salen de .values_list().iterator(chunk_size=TAMANIO_TRAMO):
+# la base las entrega de a tramos y cada tramo se escribe apenas se arma, así
+# la memoria no crece con la cantidad de filas (sirve para millones de
+# pronósticos). Lo usan la vista de staff (StreamingHttpResponse; con ASGI
+# cada bloque se arma fuera del event loop, ver core/asgi.py) y `manage.py exportar`.
+
+TAMANIO_TRAMO = 2000  # Filas por lectura a la base y líneas por bloque de texto
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+COLUMNAS_RANKING = ('posicion', 'usuario', 'empresa', 'puntos')
+COLUMNAS_PRONOSTICOS = (
+    'usuario', 'empresa', 'fecha', 'partido', 'local', 'visitante', 'goles_local', 'goles_visitante',
+    'pronostico_local', 'pronostico_visitante', 'puntos',
+)
+
+
+def filas_ranking(empresa=None, torneo=None, fecha=None):
+    """
+    (posicion, usuario, empresa, puntos) en el orden de la tabla; los
+    empatados comparten posición. Con fecha, la foto del final de esa fecha.
+    """
+    if fecha is None:
+        filas = perfiles_del_alcance(empresa, torneo).order_by('-puntos_totales', 'id').values_list(
+            'usuario__username', 'empresa__nombre', 'puntos_totales'
+        )
+    else:
+        fotos = SnapshotRanking.objects.filter(numero_fecha=fecha)
+        if empresa is not None:
+            fotos = fotos.filter(usuario__perfilempleado__empresa=empresa)
+        if torneo is not None:
+            fotos = fotos.filter(usuario__torneos_participados=torneo)
+        filas = fotos.order_by('-puntos', 'usuario_id').values_list(
+            'usuario__username', 'usuario__perfilempleado__empresa__nombre', 'puntos'
+        )
+
+    posicion = anteriores = None
+    for i, (usuario, nombre_empresa, puntos) in enumerate(filas.iterator(chunk_size=TAMANIO_TRAMO), start=1):
+        if puntos != anteriores:
+            posicion, anteriores = i, puntos
+        yield posicion, usuario, nombre_empresa, puntos
+
+
+def filas_pronosticos(empresa=None, torneo=None, fecha=None):
+    """Cada pronóstico con su usuario, empresa, partido y resultado real (en el orden en que se cargaron)."""
+    pronosticos = Pronostico.objects.all()
+    if empresa is not None:
+        pronosticos = pronosticos.filter(usuario__perfilempleado__empresa=empresa)
+    if torneo is not None:
+        pronosticos = pronosticos.filter(usuario__torneos_participados=torneo)
+    if fecha is not None:
+        pronosticos = pronosticos.filter(partido__numero_fecha=fecha)
+    return pronosticos.order_by('id').values_list(
+        'usuario__username', 'usuario__perfilempleado__empresa__nombre', 'partido__numero_fecha', 'partido_id',
+        'partido__equipo_local', 'partido__equipo_visitante', 'partido__goles_local_real',
+        'partido__goles_visitante_real', 'goles_local_prediccion', 'goles_visitante_prediccion', 'puntos_ganados',
+    ).iterator(chunk_size=TAMANIO_TRAMO)
+
+
+EXPORTACIONES = {
+    'ranking': (COLUMNAS_RANKING, filas_ranking),
+    'pronosticos': (COLUMNAS_PRONOSTICOS, filas_pronosticos),
+}
+
+
+class _Eco:
+    """'Archivo' para csv.writer: devuelve la línea en vez de guardarla."""
+
+    def write(self, linea):
+        return linea
+
+
+def _lineas(columnas, filas, formato):
+    if formato == 'csv':
+        escritor = csv.writer(_Eco())
+        yield escritor.writerow(columnas)
+        for fila in filas:
+            yield escritor.writerow(fila)
+    else:
+        for fila in filas:
+            yield json.dumps(dict(zip(columnas, fila)), ensure_ascii=False) + '\n'
+
+
+def exportar(que, formato='csv', **filtros):
+    """
+    Bloques de texto (de a TAMANIO_TRAMO líneas) con la exportación `que`
+    ('ranking' o 'pronosticos'). filtros: empresa, torneo y/o fecha.
+    """
+    columnas, filas = EXPORTACIONES[que]
+    lineas = _lineas(columnas, filas(**filtros), formato)
+    while bloque := ''.join(islice(lineas, TAMANIO_TRAMO)):
+        yield bloque
+
@@ -0,0 +1,61 @@
+from bisect import bisect_left
+
+from django.core.cache import cache
+
+from .versiones import duracion, incrementar, version
+
+# --- CACHE DEL FIXTURE ---
+# Los partidos de cada fecha, el listado de fechas y el calendario son iguales
+# para todos los usuarios: se guardan en la cache con la versión del fixture
+# en la clave. Se invalida al guardar/borrar un Partido y al sincronizar con la API.
+# Sin cache compartida otro proceso puede cambiar el fixture sin que este se
+# entere: ahí dura solo DURACION_LOCAL (ver versiones.py).
+
+DURACION = 60 * 60 * 24
+
+
+def _cacheado(nombre, calcular):
+    clave = f"fixture:{version('fixture')}:{nombre}"
+    valor = cache.get(clave)
+    if valor is None:
+        valor = calcular()
+        cache.set(clave, valor, duracion(DURACION))
+    return valor
+
+
+def partidos_de_fecha(numero_fecha):
+    """Partidos de una fecha, ordenados por horario."""
+    from .models import Partido
+
+    return _cacheado(
+        f"fecha:{numero_fecha}",
+        lambda: list(Partido.objects.filter(numero_fecha=numero_fecha).order_by('fecha_hora')),
+    )
+
+
+def fechas_disponibles():
+    """Listado de numero_fecha para el dropdown."""
+    from .models import Partido
+
+    return _cacheado(
+        "fechas",
+        lambda: list(Partido.objects.values_list('numero_fecha', flat=True).distinct().order_by('numero_fecha')),
+    )
+
+
+def fecha_del_proximo_partido(ahora):
+    """numero_fecha del primer partido que empieza ahora o más tarde (None si no hay)."""
+    from .models import Partido
+
+    calendario = _cacheado(
+        "calendario",
+        lambda: list(Partido.objects.order_by('fecha_hora').values_list('fecha_hora', 'numero_fecha')),
+    )
+    posicion = bisect_left(calendario, (ahora,))
+    if posicion == len(calendario):
+        return None
+    return calendario[posicion][1]
+
+
+def invalidar_fixture():
+    incrementar('fixture')
@@ -0,0 +1,109 @@
+from collections import defaultdict
+
+from django.db.models import Count, IntegerField, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .versiones import incrementar_al_confirmar
+
+# --- HISTORIAL DEL RANKING POR FECHA ---
+# Cuando se terminan de jugar todos los partidos de un numero_fecha se guarda
+# una foto (SnapshotRanking) con los puntos y la posición de cada usuario.
+# La foto de una fecha se arma sobre la de la fecha anterior: puntos de la
+# foto anterior + puntos de los partidos jugados desde entonces. Así nunca
+# se vuelve a sumar toda la historia de pronósticos.
+
+
+def fechas_completas(desde):
+    """Números de fecha >= desde con todos sus partidos jugados."""
+    from .models import Partido
+
+    estado = Partido.objects.filter(numero_fecha__gte=desde).values('numero_fecha').annotate(
+        pendientes=Count('id', filter=Q(jugado=False))
+    ).order_by('numero_fecha')
+    return [fila['numero_fecha'] for fila in estado if not fila['pendientes']]
+
+
+def actualizar_historial(numeros_fecha):
+    """
+    Llamar después de puntuar partidos de esas fechas. Guarda (o corrige) la
+    foto de cada fecha terminada a partir de la menor de ellas, y borra la de
+    las fechas que dejaron de estar terminadas (ej: se desmarcó un partido).
+    Se lee la foto base y los puntos por usuario y fecha (un GROUP BY); el
+    acumulado y las posiciones se calculan en Python y todo se guarda con un
+    solo upsert.
+    Devuelve la cantidad de filas guardadas.
+    """
+    from .models import PerfilEmpleado, Pronostico, SnapshotRanking
+
+    numeros_fecha = set(numeros_fecha)
+    if not numeros_fecha:
+        return 0
+
+    desde = min(numeros_fecha)
+    completas = fechas_completas(desde)
+
+    incompletas = numeros_fecha - set(completas)
+    if incompletas and SnapshotRanking.objects.filter(numero_fecha__in=incompletas).delete()[0]:
+        incrementar_al_confirmar('ranking')
+    if not completas:
+        return 0
+
+    # Base: la última foto anterior a las fechas que se recalculan
+    anterior = SnapshotRanking.objects.filter(numero_fecha__lt=desde).aggregate(
+        fecha=Max('numero_fecha')
+    )['fecha'] or 0
+    foto_anterior = SnapshotRanking.objects.filter(
+        usuario=OuterRef('usuario'), numero_fecha=anterior
+    ).values('puntos')[:1]
+    acumulado = dict(PerfilEmpleado.objects.annotate(
+        base=Coalesce(Subquery(foto_anterior, output_field=IntegerField()), Value(0))
+    ).values_list('usuario_id', 'base'))
+    if not acumulado:
+        return 0
+
+    # Puntos de cada usuario en cada fecha posterior a la base (un GROUP BY)
+    por_fecha = defaultdict(list)
+    for usuario_id, numero_fecha, puntos in Pronostico.objects.filter(
+        partido__numero_fecha__gt=anterior,
+        partido__numero_fecha__lte=completas[-1],
+        puntos_ganados__gt=0,
+    ).order_by().values_list('usuario_id', 'partido__numero_fecha').annotate(total=Sum('puntos_ganados')):
+        por_fecha[numero_fecha].append((usuario_id, puntos))
+
+    # Se acumula fecha por fecha; en cada fecha terminada se saca la foto
+    fotos = []
+    terminadas = set(completas)
+    for numero_fecha in sorted(set(por_fecha) | terminadas):
+        for usuario_id, puntos in por_fecha[numero_fecha]:
+            if usuario_id in acumulado:
+                acumulado[usuario_id] += puntos
+        if numero_fecha not in terminadas:
+            continue
+        posiciones = _posiciones(acumulado)
+        fotos += [
+            SnapshotRanking(
+                usuario_id=usuario_id,
+                numero_fecha=numero_fecha,
+                puntos=puntos,
+                posicion=posiciones[usuario_id],
+            )
+            for usuario_id, puntos in acumulado.items()
+        ]
+
+    SnapshotRanking.objects.bulk_create(
+        fotos,
+        update_conflicts=True,
+        unique_fields=['usuario', 'numero_fecha'],
+        update_fields=['puntos', 'posicion'],
+    )
+    # Las flechas de movimiento del ranking global salen de estas fotos
+    incrementar_al_confirmar('ranking')
+    return len(fotos)
+
+
+def _posiciones(puntos_por_usuario):
+    """{usuario: puntos} -> {usuario: posición}; los empatados comparten posición."""
+    primera_con = {}
+    for i, puntos in enumerate(sorted(puntos_por_usuario.values(), reverse=True)):
+        primera_con.setdefault(puntos, i + 1)
+    return {usuario_id: primera_con[puntos] for usuario_id, puntos in puntos_por_usuario.items()}
@@ -0,0 +1,154 @@
+from datetime import datetime, timezone
+
+from django.db import transaction
+
+from .en_vivo import publicar_resultados
+from .fixture import invalidar_fixture
+from .historial import actualizar_historial
+from .models import Partido, Pronostico
+from .puntos import puntuar_partidos
+
+# --- IMPORTACIÓN DE PARTIDOS DESDE LA API ---
+# Lo usan importar_fixture.py y el comando actualizar_resultados.
+
+# Campos de Partido que vienen de la API
+CAMPOS_SINCRONIZADOS = (
+    'competicion',
+    'numero_fecha',
+    'equipo_local',
+    'escudo_local',
+    'equipo_visitante',
+    'escudo_visitante',
+    'fecha_hora',
+    'jugado',
+    'goles_local_real',
+    'goles_visitante_real',
+)
+
+
+def parsear_partido(match):
+    """Convierte un partido del JSON de Football Data en los campos de Partido."""
+    fecha_hora = datetime.strptime(match['utcDate'], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+
+    # --- TRUCO: Si no viene el escudo, lo fabricamos con el ID ---
+    id_local = match['homeTeam']['id']
+    escudo_local = match['homeTeam'].get('crest')
+    if not escudo_local:
+        escudo_local = f"https://crests.football-data.org/{id_local}.png"
+
+    id_visitante = match['awayTeam']['id']
+    escudo_visitante = match['awayTeam'].get('crest')
+    if not escudo_visitante:
+        escudo_visitante = f"https://crests.football-data.org/{id_visitante}.png"
+
+    # Estado y resultado
+    jugado = match['status'] in ['FINISHED', 'IN_PLAY']
+
+    goles_local = None
+    goles_visitante = None
+
+    if jugado and match['score']['fullTime']['home'] is not None:
+        goles_local = match['score']['fullTime']['home']
+        goles_visitante = match['score']['fullTime']['away']
+
+    competicion = match.get('competition') or {}
+
+    return {
+        'api_id': str(match['id']),
+        'competicion': str(competicion['id']) if competicion.get('id') else None,
+        'numero_fecha': match.get('matchday') or 1,
+        'equipo_local': match['homeTeam']['name'],
+        'escudo_local': escudo_local,
+        'equipo_visitante': match['awayTeam']['name'],
+        'escudo_visitante': escudo_visitante,
+        'fecha_hora': fecha_hora,
+        'jugado': jugado,
+        'goles_local_real': goles_local,
+        'goles_visitante_real': goles_visitante,
+    }
+
+
+def sincronizar_partidos(partidos_api):
+    """
+    Guarda los partidos de la API comparando contra lo que ya hay en la base:
+      1. Trae los Partido existentes en un dict por api_id (una consulta)
+      2. Compara campo por campo
+      3. bulk_create para los nuevos y bulk_update solo de filas/campos cambiados
+    En la misma transacción (que empieza escribiendo los partidos) calcula
+    los puntos solo de los partidos cuyo resultado cambió y guarda la foto
+    del ranking de las fechas que se completaron. Al confirmarla invalida el
+    fixture cacheado.
+
+    Devuelve un dict con 'nuevos', 'actualizados', 'sin_cambios' y 'repuntuados'.
+    """
+    # Si la API repite un partido, nos quedamos con la última versión
+    datos_api = {}
+    for match in partidos_api:
+        datos = parsear_partido(match)
+        datos_api[datos['api_id']] = datos
+
+    nuevos = []
+    modificados = []
+    campos_modificados = set()
+    a_puntuar = []
+
+    # La comparación se hace fuera de la transacción: así la transacción
+    # empieza escribiendo (y no deja a otros escritores esperando mientras comparamos)
+    existentes = Partido.objects.in_bulk(list(datos_api), field_name='api_id')
+
+    for api_id, datos in datos_api.items():
+        partido = existentes.get(api_id)
+
+        if partido is None:
+            nuevos.append(Partido(**datos))
+            continue
+
+        cambios = [campo for campo in CAMPOS_SINCRONIZADOS if getattr(partido, campo) != datos[campo]]
+        if not cambios:
+            continue
+
+        for campo in cambios:
+            setattr(partido, campo, datos[campo])
+        modificados.append(partido)
+        campos_modificados.update(cambios)
+
+        if any(campo in Partido.CAMPOS_RESULTADO for campo in cambios):
+            a_puntuar.append(partido)
+
+    # Fechas que pueden haberse completado (o corregido): foto del ranking
+    fechas_con_resultados = {partido.numero_fecha for partido in a_puntuar}
+    fechas_con_resultados.update(partido.numero_fecha for partido in nuevos if partido.jugado)
+
+    if nuevos or modificados:
+        # Partidos, puntos y fotos del ranking en una sola transacción: si algo
+        # falla no queda ningún partido con el resultado nuevo y los puntos viejos
+        with transaction.atomic():
+            if nuevos:
+                Partido.objects.bulk_create(nuevos)
+            if modificados:
+                Partido.objects.bulk_update(modificados, sorted(campos_modificados))
+
+            # Los partidos nuevos no tienen pronósticos: solo puntuamos los
+            # modificados que tienen al menos un pronóstico
+            if a_puntuar:
+                con_pronosticos = set(
+                    Pronostico.objects.filter(partido__in=a_puntuar).values_list('partido_id', flat=True).distinct()
+                )
+                # Los que no tienen pronósticos igual cambian el marcador en vivo
+                publicar_resultados([partido for partido in a_puntuar if partido.id not in con_pronosticos])
+                a_puntuar = [partido for partido in a_puntuar if partido.id in con_pronosticos]
+                puntuar_partidos(a_puntuar, resultado_cambiado=True)
+
+            if fechas_con_resultados:
+                actualizar_historial(fechas_con_resultados)
+
+            # bulk_create/bulk_update no disparan signals: invalidamos el fixture
+            # a mano, cuando los partidos nuevos ya se ven desde otras conexiones
+            transaction.on_commit(invalidar_fixture)
+
+    return {
+        'nuevos': len(nuevos),
+        'actualizados': len(modificados),
+        'sin_cambios': len(datos_api) - len(nuevos) - len(modificados),
+        'repuntuados': len(a_puntuar),
+    }
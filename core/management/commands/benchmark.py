@@ -0,0 +1,360 @@
+import contextlib
+import io
+import json
+import os
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from core.models import Partido, PerfilEmpleado, Pronostico, Torneo
+from core.ranking import armar_cursor
+
+# --- BENCHMARKS ---
+# Corre sobre la base configurada (idealmente un mundo de generar_datos en
+# otra base: PRODE_DB=/tmp/bench.sqlite3). Cada escenario se repite N veces
+# y se mide tiempo, cantidad de consultas y pico de memoria (tracemalloc,
+# en una vuelta aparte para no inflar los tiempos).
+# Los resultados quedan en benchmarks/resultados/<fecha>.json (no se
+# versionan); el resumen de la última corrida está en benchmarks/RESULTADOS.md.
+
+CARPETA_RESULTADOS = os.path.join(settings.BASE_DIR, 'benchmarks', 'resultados')
+PAYLOAD_GRABADO = os.path.join(settings.BASE_DIR, 'benchmarks', 'payload_temporada.json')
+
+
+class ServidorPayload:
+    """Imita a la API de Football Data devolviendo siempre el mismo payload."""
+
+    def __init__(self, partidos):
+        self.partidos = partidos
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                cuerpo = json.dumps({'matches': servidor.partidos}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.httpd.server_port}"
+
+    def cerrar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def medir(funcion, repeticiones, preparar=None):
+    """Tiempo (mediana/mín/máx), consultas y pico de memoria de `funcion`."""
+    tiempos = []
+    consultas = []
+    for _ in range(repeticiones):
+        if preparar:
+            preparar()
+        with CaptureQueriesContext(connection) as capturadas:
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append(time.perf_counter() - inicio)
+        consultas.append(len(capturadas))
+
+    if preparar:
+        preparar()
+    tracemalloc.start()
+    funcion()
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'tiempo_mediana_ms': round(statistics.median(tiempos) * 1000, 2),
+        'tiempo_min_ms': round(min(tiempos) * 1000, 2),
+        'tiempo_max_ms': round(max(tiempos) * 1000, 2),
+        'consultas': max(consultas),
+        'memoria_pico_kb': round(pico / 1024, 1),
+    }
+
+
+def match_de_partido(partido):
+    """Un Partido en el formato del JSON de Football Data (para grabar el payload)."""
+    return {
+        'id': partido.api_id,
+        'competition': {'id': partido.competicion or 'SINT'},
+        'matchday': partido.numero_fecha,
+        'utcDate': partido.fecha_hora.strftime("%Y-%m-%dT%H:%M:%SZ"),  # la base guarda en UTC
+        'status': 'FINISHED' if partido.jugado else 'TIMED',
+        'homeTeam': {'id': 1, 'name': partido.equipo_local, 'crest': partido.escudo_local},
+        'awayTeam': {'id': 2, 'name': partido.equipo_visitante, 'crest': partido.escudo_visitante},
+        'score': {'fullTime': {'home': partido.goles_local_real, 'away': partido.goles_visitante_real}},
+    }
+
+
+class Command(BaseCommand):
+    help = 'Mide los caminos calientes del prode sobre la base actual (usar con un mundo de generar_datos)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--escenarios', nargs='+', help='Correr solo estos escenarios')
+        parser.add_argument('--salida', default=CARPETA_RESULTADOS, help='Carpeta donde guardar el JSON')
+        parser.add_argument('--payload', default=PAYLOAD_GRABADO, help='Payload grabado para la sincronización')
+        parser.add_argument('--comparar', help='JSON de una corrida anterior para comparar')
+
+    def handle(self, *args, **options):
+        if not Pronostico.objects.exists():
+            raise CommandError("La base no tiene pronósticos: primero corré 'manage.py generar_datos'.")
+
+        self.opciones = options
+        escenarios = {
+            'senal_puntuar_partido': self.escenario_senal,
+            'calcular_puntos_completo': self.escenario_calcular_puntos,
+            'sincronizar_api': self.escenario_sincronizar,
+            'vista_prode': self.escenario_prode,
+            'vista_ranking': self.escenario_ranking,
+            'vista_detalle_torneo': self.escenario_detalle_torneo,
+            'api': self.escenario_api,
+            'exportar': self.escenario_exportar,
+        }
+        elegidos = options['escenarios'] or list(escenarios)
+        desconocidos = set(elegidos) - set(escenarios)
+        if desconocidos:
+            raise CommandError(f"Escenarios desconocidos: {', '.join(sorted(desconocidos))}")
+
+        resultados = {}
+        # El cliente de pruebas usa el host "testserver"
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            for nombre in elegidos:
+                self.stdout.write(f"⏱️  {nombre}...")
+                for variante, medida in escenarios[nombre]().items():
+                    resultados[variante] = medida
+                    self.stdout.write(
+                        f"   {variante}: {medida['tiempo_mediana_ms']} ms, {medida['consultas']} consultas, "
+                        f"{medida['memoria_pico_kb']} KB" + (f", respuesta de {medida['bytes']} bytes" if 'bytes' in medida else '')
+                    )
+
+        archivo = self.guardar(resultados)
+        self.stdout.write(self.style.SUCCESS(f"✅ Resultados guardados en {archivo}"))
+
+        if options['comparar']:
+            self.comparar(resultados, options['comparar'])
+
+    # --- ESCENARIOS ---
+    def escenario_senal(self):
+        # Cargar (o corregir) el resultado de un partido jugado desde el admin
+        partido = Partido.objects.filter(jugado=True, pronostico__isnull=False).order_by('-fecha_hora').first()
+        if partido is None:
+            return {}
+
+        def cargar_resultado():
+            partido.goles_local_real = ((partido.goles_local_real or 0) + 1) % 5
+            with contextlib.redirect_stdout(io.StringIO()):
+                partido.save()
+
+        return {'senal_puntuar_partido': medir(cargar_resultado, self.opciones['repeticiones'])}
+
+    def escenario_calcular_puntos(self):
+        from calcular_puntos import calcular_puntos
+
+        def calcular():
+            with contextlib.redirect_stdout(io.StringIO()):
+                calcular_puntos()
+
+        # Es el más lento: con 1 repetición alcanza para compararlo
+        return {'calcular_puntos_completo': medir(calcular, max(1, self.opciones['repeticiones'] // 5))}
+
+    def escenario_sincronizar(self):
+        payload = self.payload_grabado()
+        servidor = ServidorPayload(payload)
+        estado = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+        jugados = [match for match in payload if match['status'] == 'FINISHED'][:10]
+
+        def cambiar_resultados():
+            # Cada vuelta llegan 10 resultados distintos (el resto no cambia)
+            for match in jugados:
+                match['score']['fullTime']['home'] = ((match['score']['fullTime']['home'] or 0) + 1) % 5
+
+        def sincronizar():
+            call_command('actualizar_resultados', '--completo', '--competicion', 'SINT', stdout=io.StringIO())
+
+        try:
+            with mock.patch.dict(os.environ, {'API_TOKEN': 'benchmark'}), \
+                 override_settings(FOOTBALL_DATA_URL=servidor.url, FOOTBALL_DATA_ESTADO=estado), \
+                 contextlib.redirect_stdout(io.StringIO()):
+                return {'sincronizar_api': medir(sincronizar, self.opciones['repeticiones'], cambiar_resultados)}
+        finally:
+            servidor.cerrar()
+            os.unlink(estado)
+
+    def escenario_prode(self):
+        cliente = self.cliente(self.usuario_con_torneo())
+        return {
+            'vista_prode_cache_fria': medir(lambda: self.get(cliente, '/prode/'), self.opciones['repeticiones'], cache.clear),
+            'vista_prode': medir(lambda: self.get(cliente, '/prode/'), self.opciones['repeticiones']),
+        }
+
+    def escenario_ranking(self):
+        cliente = self.cliente(self.usuario_con_torneo())
+        # Un cursor en la mitad de la tabla (página "profunda")
+        mitad = PerfilEmpleado.objects.order_by('-puntos_totales', 'id')[PerfilEmpleado.objects.count() // 2]
+        return {
+            'vista_ranking': medir(lambda: self.get(cliente, '/ranking/'), self.opciones['repeticiones']),
+            'vista_ranking_pagina_profunda': medir(
+                lambda: self.get(cliente, f'/ranking/?despues={armar_cursor(mitad)}'), self.opciones['repeticiones']
+            ),
+        }
+
+    def escenario_detalle_torneo(self):
+        usuario = self.usuario_con_torneo()
+        torneo = Torneo.objects.filter(participantes=usuario).first()
+        cliente = self.cliente(usuario)
+        url = f'/torneos/{torneo.id}/'
+        return {
+            'vista_detalle_torneo_cache_fria': medir(lambda: self.get(cliente, url), self.opciones['repeticiones'], cache.clear),
+            'vista_detalle_torneo': medir(lambda: self.get(cliente, url), self.opciones['repeticiones']),
+        }
+
+    def escenario_api(self):
+        # La API contra la página HTML que reemplaza: tiempo y tamaño de la respuesta
+        usuario = self.usuario_con_torneo()
+        cliente = self.cliente(usuario)
+        proxima = Partido.objects.filter(jugado=False).order_by('fecha_hora').first()
+        numero_fecha = proxima.numero_fecha if proxima else 1
+        urls = {
+            'html_prode_fecha': f'/prode/?fecha={numero_fecha}',
+            'api_partidos_fecha': f'/api/partidos/?fecha={numero_fecha}',
+            'api_pronosticos_fecha': f'/api/pronosticos/?fecha={numero_fecha}',
+            'html_ranking': '/ranking/',
+            'api_ranking': '/api/ranking/',
+            'api_ranking_campos': '/api/ranking/?campos=posicion,usuario,puntos',
+            'api_torneos': '/api/torneos/',
+        }
+        resultados = {}
+        for variante, url in urls.items():
+            resultados[variante] = medir(lambda url=url: self.get(cliente, url), self.opciones['repeticiones'])
+            resultados[variante]['bytes'] = len(self.get(cliente, url).content)
+
+        # Una fecha entera de pronósticos en un solo POST
+        partidos = Partido.objects.filter(numero_fecha=numero_fecha, fecha_hora__gt=timezone.now())
+        lote = json.dumps({'pronosticos': [
+            {'partido': partido.id, 'local': 1, 'visitante': 0} for partido in partidos
+        ]})
+
+        def enviar_lote():
+            respuesta = cliente.post('/api/pronosticos/', lote, content_type='application/json')
+            if respuesta.status_code != 200:
+                raise CommandError(f"POST /api/pronosticos/ respondió {respuesta.status_code}")
+
+        resultados['api_pronosticos_lote'] = medir(enviar_lote, self.opciones['repeticiones'])
+        return resultados
+
+    def escenario_exportar(self):
+        # La memoria tiene que ser la misma exportando una fecha que todos los pronósticos
+        from core.exportacion import exportar
+
+        def variante(que, **filtros):
+            filas = [0]
+
+            def exportar_todo():
+                filas[0] = sum(bloque.count('\n') for bloque in exportar(que, 'csv', **filtros)) - 1
+
+            medida = medir(exportar_todo, max(1, self.opciones['repeticiones'] // 5))
+            medida['filas'] = filas[0]
+            return medida
+
+        primera_fecha = Partido.objects.order_by('numero_fecha').values_list('numero_fecha', flat=True).first()
+        return {
+            'exportar_pronosticos_fecha': variante('pronosticos', fecha=primera_fecha),
+            'exportar_pronosticos_todos': variante('pronosticos'),
+            'exportar_ranking': variante('ranking'),
+        }
+
+    # --- AUXILIARES ---
+    def usuario_con_torneo(self):
+        usuario = User.objects.filter(torneos_participados__isnull=False, perfilempleado__isnull=False).first()
+        if usuario is None:
+            raise CommandError("No hay usuarios en torneos: generá datos con --torneos > 0.")
+        return usuario
+
+    def cliente(self, usuario):
+        cliente = Client()
+        cliente.force_login(usuario)
+        return cliente
+
+    def get(self, cliente, url):
+        respuesta = cliente.get(url)
+        if respuesta.status_code != 200:
+            raise CommandError(f"GET {url} respondió {respuesta.status_code}")
+        return respuesta
+
+    def payload_grabado(self):
+        """Lee el payload grabado; si no existe lo graba a partir de los partidos de la base."""
+        archivo = self.opciones['payload']
+        if not os.path.exists(archivo):
+            partidos = Partido.objects.filter(api_id__isnull=False).order_by('fecha_hora')
+            with open(archivo, 'w') as salida:
+                json.dump([match_de_partido(p) for p in partidos], salida)
+        with open(archivo) as entrada:
+            return json.load(entrada)
+
+    def guardar(self, resultados):
+        os.makedirs(self.opciones['salida'], exist_ok=True)
+        ahora = timezone.now()
+        try:
+            commit = subprocess.run(
+                ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=settings.BASE_DIR
+            ).stdout.strip()
+        except OSError:
+            commit = ''
+
+        datos = {
+            'fecha': ahora.isoformat(),
+            'commit': commit,
+            'repeticiones': self.opciones['repeticiones'],
+            'datos': {
+                'usuarios': PerfilEmpleado.objects.count(),
+                'partidos': Partido.objects.count(),
+                'pronosticos': Pronostico.objects.count(),
+                'torneos': Torneo.objects.count(),
+            },
+            'escenarios': resultados,
+        }
+        archivo = os.path.join(self.opciones['salida'], ahora.strftime('%Y%m%d-%H%M%S') + '.json')
+        with open(archivo, 'w') as salida:
+            json.dump(datos, salida, indent=2)
+        return archivo
+
+    def comparar(self, resultados, archivo):
+        with open(archivo) as entrada:
+            anteriores = json.load(entrada)['escenarios']
+
+        self.stdout.write(f"📊 Comparación contra {archivo}:")
+        for nombre, medida in resultados.items():
+            anterior = anteriores.get(nombre)
+            if not anterior:
+                continue
+            antes, ahora = anterior['tiempo_mediana_ms'], medida['tiempo_mediana_ms']
+            cambio = (ahora - antes) / antes * 100 if antes else 0
+            self.stdout.write(
+                f"   {nombre}: {antes} → {ahora} ms ({cambio:+.0f}%), "
+                f"consultas {anterior['consultas']} → {medida['consultas']}"
+            )
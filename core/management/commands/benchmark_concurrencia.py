@@ -0,0 +1,205 @@
+import io
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+from django.test import override_settings
+from django.utils import timezone
+
+from core.models import Partido, PerfilEmpleado, Pronostico
+from core.ranking import pagina_ranking
+
+from .benchmark import CARPETA_RESULTADOS, ServidorPayload, match_de_partido
+
+# --- BENCHMARK DE CONCURRENCIA ---
+# Varios procesos lectores piden en loop la primera página del ranking y los
+# pronósticos de un usuario (lo que hace un worker web) mientras este proceso
+# corre una sincronización completa en la que cambian todos los resultados
+# (re-puntúa todos los partidos jugados). Se mide la latencia de las
+# lecturas con y sin la sincronización corriendo, y cuántas fallaron con
+# "database is locked". Se corre con los PRAGMAs de core/sqlite.py ('wal')
+# y sin ellos ('sin_ajustes': journal DELETE y timeout por defecto de 5 s).
+# Necesita una base en archivo con un mundo de generar_datos:
+#   PRODE_DB=/tmp/bench.sqlite3 python manage.py benchmark_concurrencia
+
+MODOS = {
+    'sin_ajustes': {'journal_mode': 'DELETE'},
+    'wal': settings.PRODE_SQLITE_PRAGMAS,
+}
+
+
+def leer(usuarios):
+    """Una 'visita': primera página del ranking + los pronósticos de un usuario."""
+    filas, _ = pagina_ranking(PerfilEmpleado.objects.all())
+    list(Pronostico.objects.filter(usuario_id=random.choice(usuarios)).select_related('partido'))
+    return filas
+
+
+def lector(pragmas, usuarios, pausa, listos, sincronizando, detener, resultados):
+    """Proceso lector: lee sin parar hasta que le avisan que termine."""
+    reposo, durante, errores = [], [], 0
+    with override_settings(PRODE_SQLITE_PRAGMAS=pragmas):
+        listos.wait()
+        while not detener.is_set():
+            escribiendo = sincronizando.is_set()
+            inicio = time.perf_counter()
+            try:
+                leer(usuarios)
+            except OperationalError:
+                errores += 1
+                continue
+            (durante if escribiendo else reposo).append(time.perf_counter() - inicio)
+            detener.wait(pausa)
+        connections.close_all()
+    resultados.put((reposo, durante, errores))
+
+
+def percentil(tiempos, p):
+    if not tiempos:
+        return None
+    ordenados = sorted(tiempos)
+    return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))] * 1000, 2)
+
+
+class Command(BaseCommand):
+    help = 'Mide la latencia de lectura de varios procesos mientras corre una sincronización completa'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lectores', type=int, default=4, help='Procesos lectores')
+        parser.add_argument(
+            '--pausa',
+            type=float,
+            default=0.05,
+            help='Segundos entre lecturas de cada lector (para no saturar la CPU solo con lecturas)',
+        )
+        parser.add_argument('--reposo', type=float, default=2, help='Segundos de lecturas antes de sincronizar')
+        parser.add_argument('--modos', nargs='+', default=list(MODOS), choices=list(MODOS))
+        parser.add_argument('--salida', default=CARPETA_RESULTADOS, help='Carpeta donde guardar el JSON')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+            raise CommandError("Hace falta una base SQLite en archivo (ej: PRODE_DB=/tmp/bench.sqlite3).")
+        if not Pronostico.objects.exists():
+            raise CommandError("La base no tiene pronósticos: primero corré 'manage.py generar_datos'.")
+
+        self.opciones = options
+        self.usuarios = list(PerfilEmpleado.objects.values_list('usuario_id', flat=True))
+        self.payload = [
+            match_de_partido(partido)
+            for partido in Partido.objects.filter(api_id__isnull=False).order_by('fecha_hora')
+        ]
+
+        resultados = {}
+        for modo in options['modos']:
+            self.stdout.write(f"⏱️  {modo} ({options['lectores']} lectores)...")
+            medida = self.correr(MODOS[modo])
+            resultados[modo] = medida
+            self.stdout.write(
+                f"   lectura en reposo p50 {medida['reposo_p50_ms']} ms / p95 {medida['reposo_p95_ms']} ms; "
+                f"durante la sincronización p50 {medida['durante_p50_ms']} ms / p95 {medida['durante_p95_ms']} ms "
+                f"/ máx {medida['durante_max_ms']} ms; {medida['errores_lock']} lecturas fallidas; "
+                f"sincronización {medida['sincronizacion_s']} s"
+            )
+            if medida['error_sincronizacion']:
+                self.stdout.write(self.style.ERROR(f"   ❌ La sincronización falló: {medida['error_sincronizacion']}"))
+
+        archivo = self.guardar(resultados)
+        self.stdout.write(self.style.SUCCESS(f"✅ Resultados guardados en {archivo}"))
+
+    def correr(self, pragmas):
+        # El modo de journal queda grabado en el archivo: se cambia sin otras conexiones abiertas
+        connections.close_all()
+        base = sqlite3.connect(connection.settings_dict['NAME'])
+        base.execute(f"PRAGMA journal_mode = {pragmas['journal_mode']}")
+        base.close()
+
+        # Todos los resultados cambian: se re-puntúan todos los partidos jugados
+        for match in self.payload:
+            if match['status'] == 'FINISHED':
+                goles = match['score']['fullTime']
+                goles['home'] = ((goles['home'] or 0) + 1) % 5
+
+        contexto = multiprocessing.get_context('fork')
+        lectores = self.opciones['lectores']
+        listos = contexto.Barrier(lectores + 1)
+        sincronizando, detener = contexto.Event(), contexto.Event()
+        cola = contexto.Queue()
+        argumentos = (pragmas, self.usuarios, self.opciones['pausa'], listos, sincronizando, detener, cola)
+        procesos = [contexto.Process(target=lector, args=argumentos) for _ in range(lectores)]
+        for proceso in procesos:
+            proceso.start()
+
+        servidor = ServidorPayload(self.payload)
+        estado = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+        error = None
+        try:
+            with override_settings(PRODE_SQLITE_PRAGMAS=pragmas, FOOTBALL_DATA_URL=servidor.url,
+                                   FOOTBALL_DATA_ESTADO=estado), \
+                 mock.patch.dict(os.environ, {'API_TOKEN': 'benchmark'}):
+                listos.wait()
+                time.sleep(self.opciones['reposo'])
+                sincronizando.set()
+                inicio = time.perf_counter()
+                try:
+                    call_command('actualizar_resultados', '--completo', '--competicion', 'SINT',
+                                 stdout=io.StringIO())
+                except OperationalError as e:
+                    error = str(e)
+                duracion = time.perf_counter() - inicio
+                connections.close_all()
+        finally:
+            detener.set()
+            servidor.cerrar()
+            os.unlink(estado)
+
+        reposo, durante, errores = [], [], 0
+        for _ in procesos:
+            r, d, e = cola.get()
+            reposo += r
+            durante += d
+            errores += e
+        for proceso in procesos:
+            proceso.join()
+
+        return {
+            'lecturas_reposo': len(reposo),
+            'reposo_p50_ms': percentil(reposo, 50),
+            'reposo_p95_ms': percentil(reposo, 95),
+            'lecturas_durante': len(durante),
+            'durante_p50_ms': percentil(durante, 50),
+            'durante_p95_ms': percentil(durante, 95),
+            'durante_p99_ms': percentil(durante, 99),
+            'durante_max_ms': round(max(durante) * 1000, 2) if durante else None,
+            'durante_media_ms': round(statistics.mean(durante) * 1000, 2) if durante else None,
+            'errores_lock': errores,
+            'sincronizacion_s': round(duracion, 2),
+            'error_sincronizacion': error,
+        }
+
+    def guardar(self, resultados):
+        os.makedirs(self.opciones['salida'], exist_ok=True)
+        ahora = timezone.now()
+        datos = {
+            'fecha': ahora.isoformat(),
+            'lectores': self.opciones['lectores'],
+            'datos': {
+                'usuarios': len(self.usuarios),
+                'partidos': len(self.payload),
+                'pronosticos': Pronostico.objects.count(),
+            },
+            'modos': resultados,
+        }
+        archivo = os.path.join(self.opciones['salida'], ahora.strftime('concurrencia-%Y%m%d-%H%M%S') + '.json')
+        with open(archivo, 'w') as salida:
+            json.dump(datos, salida, indent=2)
+        return archivo
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core.exportacion import EXPORTACIONES, FORMATOS, exportar
+
+
+class Command(BaseCommand):
+    help = 'Exporta la tabla de posiciones o los pronósticos en CSV / NDJSON, sin cargarlos todos en memoria'
+
+    def add_arguments(self, parser):
+        parser.add_argument('que', choices=list(EXPORTACIONES))
+        parser.add_argument('--formato', choices=list(FORMATOS), default='csv')
+        parser.add_argument('--empresa', type=int, help='Solo los empleados de esta empresa (id)')
+        parser.add_argument('--torneo', type=int, help='Solo los participantes de este torneo (id)')
+        parser.add_argument('--fecha', type=int, help='Pronósticos de esa fecha / ranking al final de esa fecha')
+        parser.add_argument('--salida', help='Archivo donde guardarla (por defecto, la salida estándar)')
+
+    def handle(self, *args, **options):
+        filtros = {clave: options[clave] for clave in ('empresa', 'torneo', 'fecha') if options[clave] is not None}
+        bloques = exportar(options['que'], options['formato'], **filtros)
+
+        if not options['salida']:
+            for bloque in bloques:
+                self.stdout.write(bloque, ending='')
+            return
+
+        with open(options['salida'], 'w', newline='', encoding='utf-8') as archivo:
+            for bloque in bloques:
+                archivo.write(bloque)
+        self.stdout.write(self.style.SUCCESS(f"✅ Exportación guardada en {options['salida']}"))
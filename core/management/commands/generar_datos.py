@@ -0,0 +1,155 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from core.fixture import invalidar_fixture
+from core.historial import actualizar_historial
+from core.models import Empresa, Partido, PerfilEmpleado, Pronostico, Torneo
+from core.puntos import puntuar_partido, recalcular_totales
+
+# Todo lo sintético lleva estos prefijos: así --limpiar borra solo eso
+PREFIJO_USUARIO = 'sint_'
+PREFIJO_EMPRESA = 'SINT'
+PREFIJO_PARTIDO = 'sint-'
+
+EQUIPOS = [f"Equipo {i}" for i in range(1, 21)]
+
+
+class Command(BaseCommand):
+    help = 'Crea un mundo sintético y reproducible (empresas, usuarios, partidos, pronósticos y torneos) para benchmarks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empresas', type=int, default=20)
+        parser.add_argument('--usuarios', type=int, default=2000)
+        parser.add_argument('--fechas', type=int, default=38)
+        parser.add_argument('--partidos-por-fecha', type=int, default=10)
+        parser.add_argument(
+            '--jugadas',
+            type=int,
+            help='Cuántas fechas ya se jugaron (por defecto la mitad)',
+        )
+        parser.add_argument(
+            '--cobertura',
+            type=float,
+            default=0.8,
+            help='Probabilidad de que un usuario pronostique cada partido',
+        )
+        parser.add_argument('--torneos', type=int, default=200)
+        parser.add_argument('--participantes', type=int, default=15, help='Participantes por torneo')
+        parser.add_argument('--semilla', type=int, default=2022, help='Misma semilla = mismos datos')
+        parser.add_argument(
+            '--limpiar',
+            action='store_true',
+            help='Borra primero los datos sintéticos anteriores',
+        )
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['semilla'])
+        jugadas = options['jugadas'] if options['jugadas'] is not None else options['fechas'] // 2
+
+        if options['limpiar']:
+            self.limpiar()
+
+        self.stdout.write("🏗️  Generando datos sintéticos...")
+
+        with transaction.atomic():
+            empresas = Empresa.objects.bulk_create([
+                Empresa(nombre=f"Empresa Sintética {i}", codigo_acceso=f"{PREFIJO_EMPRESA}{i:04d}")
+                for i in range(options['empresas'])
+            ])
+
+            # Contraseña "!" = inutilizable (no hace falta hashear miles de claves)
+            usuarios = User.objects.bulk_create([
+                User(username=f"{PREFIJO_USUARIO}{i:06d}", password='!')
+                for i in range(options['usuarios'])
+            ])
+            PerfilEmpleado.objects.bulk_create([
+                PerfilEmpleado(usuario=usuario, empresa=rnd.choice(empresas)) for usuario in usuarios
+            ])
+            self.stdout.write(f"  {len(empresas)} empresas, {len(usuarios)} usuarios")
+
+            partidos = self.crear_partidos(rnd, options['fechas'], options['partidos_por_fecha'], jugadas)
+            self.stdout.write(f"  {len(partidos)} partidos ({jugadas} fechas jugadas)")
+
+            total = self.crear_pronosticos(rnd, usuarios, partidos, options['cobertura'])
+            self.stdout.write(f"  {total} pronósticos")
+
+            torneos = self.crear_torneos(rnd, usuarios, options['torneos'], options['participantes'])
+            self.stdout.write(f"  {torneos} torneos")
+
+        # bulk_create no dispara signals: puntos, ranking, historial y cache a mano
+        for partido in partidos:
+            if partido.jugado:
+                puntuar_partido(partido, actualizar_ranking=False)
+        recalcular_totales()
+        actualizar_historial({partido.numero_fecha for partido in partidos})
+        invalidar_fixture()
+
+        self.stdout.write(self.style.SUCCESS("✅ Mundo sintético listo."))
+
+    def limpiar(self):
+        # Los pronósticos, perfiles y torneos se borran en cascada con los usuarios
+        User.objects.filter(username__startswith=PREFIJO_USUARIO).delete()
+        Partido.objects.filter(api_id__startswith=PREFIJO_PARTIDO).delete()
+        Empresa.objects.filter(codigo_acceso__startswith=PREFIJO_EMPRESA).delete()
+        invalidar_fixture()
+        self.stdout.write("🧹 Datos sintéticos anteriores borrados.")
+
+    def crear_partidos(self, rnd, fechas, por_fecha, jugadas):
+        # Una fecha por semana; las primeras `jugadas` ya pasaron
+        inicio = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(weeks=jugadas)
+        partidos = []
+        for numero_fecha in range(1, fechas + 1):
+            jugada = numero_fecha <= jugadas
+            for j in range(por_fecha):
+                local, visitante = rnd.sample(range(len(EQUIPOS)), 2)
+                partidos.append(Partido(
+                    api_id=f"{PREFIJO_PARTIDO}{numero_fecha}-{j}",
+                    competicion='SINT',
+                    equipo_local=EQUIPOS[local],
+                    equipo_visitante=EQUIPOS[visitante],
+                    escudo_local=f"https://crests.football-data.org/{local + 1}.png",
+                    escudo_visitante=f"https://crests.football-data.org/{visitante + 1}.png",
+                    fecha_hora=inicio + timedelta(weeks=numero_fecha - 1, hours=2 * j),
+                    numero_fecha=numero_fecha,
+                    jugado=jugada,
+                    goles_local_real=rnd.randint(0, 4) if jugada else None,
+                    goles_visitante_real=rnd.randint(0, 4) if jugada else None,
+                ))
+        return Partido.objects.bulk_create(partidos)
+
+    def crear_pronosticos(self, rnd, usuarios, partidos, cobertura):
+        # Se guardan de a un partido por vez para no tener todo en memoria
+        total = 0
+        for partido in partidos:
+            lote = [
+                Pronostico(
+                    usuario=usuario,
+                    partido=partido,
+                    goles_local_prediccion=rnd.randint(0, 3),
+                    goles_visitante_prediccion=rnd.randint(0, 3),
+                )
+                for usuario in usuarios
+                if rnd.random() < cobertura
+            ]
+            Pronostico.objects.bulk_create(lote, batch_size=2000)
+            total += len(lote)
+        return total
+
+    def crear_torneos(self, rnd, usuarios, cantidad, participantes):
+        # bulk_create no pasa por Torneo.save(): el código se arma acá
+        torneos = Torneo.objects.bulk_create([
+            Torneo(nombre=f"Torneo Sintético {i}", codigo=f"S{i:05d}", creador=rnd.choice(usuarios))
+            for i in range(cantidad)
+        ])
+        Participacion = Torneo.participantes.through
+        Participacion.objects.bulk_create([
+            Participacion(torneo_id=torneo.id, user_id=usuario.id)
+            for torneo in torneos
+            for usuario in rnd.sample(usuarios, min(participantes, len(usuarios)))
+        ], batch_size=2000)
+        return len(torneos)
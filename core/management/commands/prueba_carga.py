@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client, override_settings
+from django.utils import timezone
+
+from core.models import Torneo
+
+from .benchmark import CARPETA_RESULTADOS
+
+# --- PRUEBA DE CARGA ---
+# Pega contra las páginas de solo lectura (home, prode, ranking y la tabla
+# de un torneo) con N clientes a la vez (un hilo cada uno) durante unos
+# segundos y mide pedidos por segundo y p50/p95/p99. Por defecto llama al
+# WSGIHandler en el mismo proceso (httpx con WSGITransport, sin servidor en el
+# medio). Con --url se le pega a un servidor de verdad que use la misma base.
+# Con --concurrencia 1 4 16 se ve cómo crece el p99 con la carga.
+
+
+def percentil(tiempos, p):
+    ordenados = sorted(tiempos)
+    return round(ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))] * 1000, 2)
+
+
+def resumir(tiempos, errores, duracion):
+    if not tiempos:
+        return {'pedidos': 0, 'errores': errores}
+    return {
+        'pedidos': len(tiempos),
+        'errores': errores,
+        'pedidos_por_segundo': round(len(tiempos) / duracion, 1),
+        'p50_ms': percentil(tiempos, 50),
+        'p95_ms': percentil(tiempos, 95),
+        'p99_ms': percentil(tiempos, 99),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Prueba de carga de las páginas de solo lectura'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', type=int, nargs='+', default=[1, 4, 16], help='Clientes a la vez')
+        parser.add_argument('--duracion', type=float, default=10, help='Segundos por cada concurrencia')
+        parser.add_argument('--url', help='Servidor externo (ej: http://127.0.0.1:8000) en vez del handler en proceso')
+        parser.add_argument('--salida', default=CARPETA_RESULTADOS, help='Carpeta donde guardar el JSON')
+
+    def handle(self, *args, **options):
+        try:
+            import httpx  # noqa: F401
+        except ImportError:
+            raise CommandError("La prueba de carga necesita httpx (pip install httpx).")
+
+        self.opciones = options
+        usuario = User.objects.filter(torneos_participados__isnull=False, perfilempleado__isnull=False).first()
+        if usuario is None:
+            raise CommandError("No hay usuarios en torneos: primero corré 'manage.py generar_datos'.")
+        torneo = Torneo.objects.filter(participantes=usuario).first()
+        rutas = ['/', '/prode/', '/ranking/', f'/torneos/{torneo.id}/']
+
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+            cliente = Client()
+            cliente.force_login(usuario)
+            cookies = {nombre: cookie.value for nombre, cookie in cliente.cookies.items()}
+
+            resultados = {}
+            for concurrencia in options['concurrencia']:
+                tiempos, errores = self.cargar(rutas, cookies, concurrencia)
+                medida = resultados[concurrencia] = resumir(tiempos, errores, options['duracion'])
+                self.stdout.write(
+                    f"   {concurrencia} clientes: {medida.get('pedidos_por_segundo')} pedidos/s, "
+                    f"p50 {medida.get('p50_ms')} ms, p95 {medida.get('p95_ms')} ms, p99 {medida.get('p99_ms')} ms, "
+                    f"{medida['errores']} errores"
+                )
+
+        archivo = self.guardar(resultados)
+        self.stdout.write(self.style.SUCCESS(f"✅ Resultados guardados en {archivo}"))
+
+    def transporte(self):
+        import httpx
+
+        if self.opciones['url']:
+            return {'base_url': self.opciones['url']}
+        from django.core.handlers.wsgi import WSGIHandler
+        return {'base_url': 'http://testserver', 'transport': httpx.WSGITransport(app=WSGIHandler())}
+
+    def cargar(self, rutas, cookies, concurrencia):
+        import httpx
+
+        tiempos, errores = [], [0]
+        fin = time.monotonic() + self.opciones['duracion']
+        lock = threading.Lock()
+
+        def cliente(numero):
+            propios, fallidos = [], 0
+            with httpx.Client(cookies=cookies, **self.transporte()) as http:
+                i = numero
+                while time.monotonic() < fin:
+                    inicio = time.perf_counter()
+                    respuesta = http.get(rutas[i % len(rutas)])
+                    propios.append(time.perf_counter() - inicio)
+                    fallidos += respuesta.status_code != 200
+                    i += 1
+            with lock:
+                tiempos.extend(propios)
+                errores[0] += fallidos
+
+        hilos = [threading.Thread(target=cliente, args=(n,)) for n in range(concurrencia)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        return tiempos, errores[0]
+
+    def guardar(self, resultados):
+        os.makedirs(self.opciones['salida'], exist_ok=True)
+        ahora = timezone.now()
+        datos = {
+            'fecha': ahora.isoformat(),
+            'duracion_s': self.opciones['duracion'],
+            'url': self.opciones['url'],
+            'concurrencias': resultados,
+        }
+        archivo = os.path.join(self.opciones['salida'], ahora.strftime('carga-%Y%m%d-%H%M%S') + '.json')
+        with open(archivo, 'w') as salida:
+            json.dump(datos, salida, indent=2)
+        return archivo
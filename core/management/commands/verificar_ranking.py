@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from core.models import Empresa, PerfilEmpleado
+from core.puntos import recalcular_totales, total_real_por_usuario, totales_reales_por_empresa
+
+
+class Command(BaseCommand):
+    help = 'Compara puntos_totales del ranking contra la suma real de los pronósticos'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corregir',
+            action='store_true',
+            help='Corrige los perfiles con diferencias',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔍 Verificando totales del ranking...")
+
+        con_diferencias = PerfilEmpleado.objects.annotate(
+            total_real=total_real_por_usuario()
+        ).exclude(puntos_totales=F('total_real')).select_related('usuario')
+
+        total = 0
+        for perfil in con_diferencias.iterator():
+            total += 1
+            self.stdout.write(
+                f"  ❌ {perfil.usuario.username}: guardado {perfil.puntos_totales}, real {perfil.total_real}"
+            )
+
+        # Totales de cada empresa contra la suma de sus perfiles
+        empresas_con_diferencias = Empresa.objects.annotate(**totales_reales_por_empresa()).exclude(
+            puntos_totales=F('total_real'), cantidad_empleados=F('cantidad_real')
+        )
+        empresas = 0
+        for empresa in empresas_con_diferencias.iterator():
+            empresas += 1
+            self.stdout.write(
+                f"  ❌ {empresa.nombre}: guardado {empresa.puntos_totales} pts / {empresa.cantidad_empleados} empleados, "
+                f"real {empresa.total_real} pts / {empresa.cantidad_real} empleados"
+            )
+
+        if not total and not empresas:
+            self.stdout.write(self.style.SUCCESS("✅ El ranking está consistente."))
+            return
+
+        if options['corregir']:
+            # recalcular_totales también vuelve a sumar las empresas
+            corregidos = recalcular_totales(
+                PerfilEmpleado.objects.annotate(
+                    total_real=total_real_por_usuario()
+                ).exclude(puntos_totales=F('total_real'))
+            )
+            self.stdout.write(self.style.SUCCESS(f"✅ Perfiles corregidos: {corregidos}"))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ {total} perfiles y {empresas} empresas con diferencias. Ejecuta con --corregir para arreglarlos"
+            ))
@@ -0,0 +1,144 @@
+import logging
+import signal
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from core.api_futbol import ClienteFootballData
+from core.importacion import sincronizar_partidos
+from core.models import Partido
+
+# Intentar cargar dotenv si está disponible (opcional)
+try:
+    from dotenv import load_dotenv
+    load_dotenv()
+except ImportError:
+    pass  # Si no está instalado, continuar sin él
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Proceso que queda corriendo y sigue los partidos en vivo (reemplaza al cron en días de partido)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--intervalo',
+            type=int,
+            default=30,
+            help='Segundos entre consultas mientras hay partidos en juego',
+        )
+        parser.add_argument(
+            '--duracion',
+            type=int,
+            default=150,
+            help='Minutos desde el inicio durante los que un partido se considera en juego',
+        )
+        parser.add_argument(
+            '--espera-maxima',
+            type=int,
+            default=3600,
+            help='Máximo de segundos a dormir cuando no hay partidos',
+        )
+        parser.add_argument(
+            '--heartbeat',
+            default=settings.PRODE_HEARTBEAT,
+            help='Archivo donde se escribe la hora de la última vuelta',
+        )
+        parser.add_argument(
+            '--una-vez',
+            action='store_true',
+            help='Hace una sola vuelta y termina (útil para probar)',
+        )
+
+    def handle(self, *args, **options):
+        self.detener = threading.Event()
+        signal.signal(signal.SIGTERM, self.pedir_detener)
+        signal.signal(signal.SIGINT, self.pedir_detener)
+
+        self.cliente = ClienteFootballData()
+        self.duracion = timedelta(minutes=options['duracion'])
+        # Partidos que la API ya dio por terminados: no se vuelven a consultar
+        self.finalizados = set()
+
+        self.stdout.write("👀 Vigilando partidos en vivo...")
+
+        errores = 0  # Vueltas seguidas que fallaron
+        while not self.detener.is_set():
+            close_old_connections()
+            ahora = timezone.now()
+
+            try:
+                en_juego = self.consultar_en_juego(ahora)
+                if en_juego:
+                    espera = options['intervalo']
+                else:
+                    espera = self.segundos_hasta_proximo_partido(ahora, options['espera_maxima'])
+                errores = 0
+            except Exception:
+                # Un corte de la API, un "database is locked" mientras escribe otro
+                # proceso o un JSON inesperado no terminan el proceso (solo
+                # SIGTERM/SIGINT lo hacen): se reintenta cada vez más espaciado
+                errores += 1
+                en_juego = 0
+                espera = min(options['espera_maxima'], options['intervalo'] * 2 ** min(errores - 1, 10))
+                logger.exception("Falló la vuelta de vigilancia (%d seguidas), se reintenta en %ds", errores, espera)
+
+            self.latido(options['heartbeat'], ahora, en_juego, espera)
+
+            if options['una_vez']:
+                break
+            self.detener.wait(espera)
+
+        self.stdout.write(self.style.SUCCESS("🛑 Vigilancia detenida."))
+
+    def pedir_detener(self, signum, frame):
+        self.stdout.write("Deteniendo al terminar la vuelta actual...")
+        self.detener.set()
+
+    def consultar_en_juego(self, ahora):
+        """Pide a la API solo los partidos que están en juego. Devuelve cuántos son."""
+        api_ids = [
+            api_id for api_id in Partido.objects.filter(
+                fecha_hora__lte=ahora,
+                fecha_hora__gt=ahora - self.duracion,
+                api_id__isnull=False,
+            ).values_list('api_id', flat=True)
+            if api_id not in self.finalizados
+        ]
+        if not api_ids:
+            return 0
+
+        data = self.cliente.get_condicional('/matches', {'ids': ','.join(api_ids)})
+        if data is None:
+            return len(api_ids)  # 304: nada cambió desde la última consulta
+
+        partidos_api = data.get('matches', [])
+        resultado = sincronizar_partidos(partidos_api)
+        self.cliente.confirmar()
+
+        for match in partidos_api:
+            if match['status'] == 'FINISHED':
+                self.finalizados.add(str(match['id']))
+
+        if resultado['actualizados']:
+            self.stdout.write(
+                f"⚽ {resultado['actualizados']} partidos actualizados, {resultado['repuntuados']} re-puntuados"
+            )
+        return len(api_ids)
+
+    def segundos_hasta_proximo_partido(self, ahora, espera_maxima):
+        proximo = Partido.objects.filter(fecha_hora__gt=ahora).order_by('fecha_hora').values_list(
+            'fecha_hora', flat=True
+        ).first()
+        if proximo is None:
+            return espera_maxima
+        return max(1, min(espera_maxima, (proximo - ahora).total_seconds()))
+
+    def latido(self, archivo, ahora, en_juego, espera):
+        with open(archivo, 'w') as heartbeat:
+            heartbeat.write(f"{ahora.isoformat()} en_juego={en_juego} proxima_vuelta={espera:.0f}s\n")
@@ -0,0 +1,132 @@
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+# --- MÉTRICAS POR VISTA ---
+# Middleware opcional (PRODE_METRICAS=1): mide cada pedido (tiempo total,
+# cantidad de consultas, tiempo en SQL y la consulta más lenta) y guarda en
+# memoria las últimas MUESTRAS de cada vista para sacar p50/p95/p99.
+# Apagado no agrega nada: Django lo saca de la cadena al arrancar.
+# Ojo: cada proceso (worker) tiene sus propias métricas.
+
+MUESTRAS = 1000
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_por_vista = {}
+_FIN = object()
+
+
+class RegistroConsultas:
+    """execute_wrapper que cuenta y cronometra las consultas de un pedido."""
+
+    def __init__(self):
+        self.cantidad = 0
+        self.tiempo = 0.0
+        self.mas_lenta = (0.0, '')
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duracion = time.perf_counter() - inicio
+            self.cantidad += 1
+            self.tiempo += duracion
+            if duracion > self.mas_lenta[0]:
+                self.mas_lenta = (duracion, sql)
+
+
+class MetricasMiddleware:
+
+    def __init__(self, get_response):
+        if not settings.PRODE_METRICAS:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.umbral = settings.PRODE_METRICAS_UMBRAL_MS / 1000
+
+    def __call__(self, request):
+        registro = RegistroConsultas()
+        inicio = time.perf_counter()
+        with connection.execute_wrapper(registro):
+            response = self.get_response(request)
+
+        if response.streaming:
+            # Las exportaciones consultan mientras se manda el cuerpo: se mide
+            # hasta que el iterador termina (o el cliente se va)
+            response.streaming_content = self._medir_cuerpo(request, response.streaming_content, registro, inicio)
+        else:
+            self._registrar(request, registro, inicio)
+        return response
+
+    def _medir_cuerpo(self, request, contenido, registro, inicio):
+        # El wrapper se pone en cada next() y no durante todo el generador:
+        # entre bloque y bloque la conexión puede atender otra cosa
+        iterador = iter(contenido)
+        try:
+            while True:
+                with connection.execute_wrapper(registro):
+                    parte = next(iterador, _FIN)
+                if parte is _FIN:
+                    break
+                yield parte
+        finally:
+            self._registrar(request, registro, inicio)
+
+    def _registrar(self, request, registro, inicio):
+        duracion = time.perf_counter() - inicio
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista = coincidencia.view_name if coincidencia else request.path
+        registrar(vista, duracion, registro)
+
+        if duracion > self.umbral:
+            logger.warning(
+                "Pedido lento: %s %s (%s) %.0f ms, %d consultas, %.0f ms en SQL. Más lenta (%.0f ms): %s",
+                request.method, request.path, vista, duracion * 1000, registro.cantidad,
+                registro.tiempo * 1000, registro.mas_lenta[0] * 1000, registro.mas_lenta[1],
+            )
+
+
+def registrar(vista, duracion, registro):
+    with _lock:
+        muestras = _por_vista.setdefault(vista, deque(maxlen=MUESTRAS))
+        muestras.append((duracion, registro.cantidad, registro.tiempo, registro.mas_lenta))
+
+
+def _percentil(ordenados, p):
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+def resumen():
+    """p50/p95/p99 de tiempo total y de SQL, consultas y la consulta más lenta de cada vista."""
+    with _lock:
+        copia = {vista: list(muestras) for vista, muestras in _por_vista.items()}
+
+    datos = {}
+    for vista, muestras in sorted(copia.items()):
+        tiempos = sorted(m[0] * 1000 for m in muestras)
+        tiempos_sql = sorted(m[2] * 1000 for m in muestras)
+        mas_lenta = max((m[3] for m in muestras), key=lambda c: c[0])
+        datos[vista] = {
+            'pedidos': len(muestras),
+            'p50_ms': round(_percentil(tiempos, 50), 2),
+            'p95_ms': round(_percentil(tiempos, 95), 2),
+            'p99_ms': round(_percentil(tiempos, 99), 2),
+            'sql_p95_ms': round(_percentil(tiempos_sql, 95), 2),
+            'consultas_promedio': round(sum(m[1] for m in muestras) / len(muestras), 1),
+            'consultas_max': max(m[1] for m in muestras),
+            'consulta_mas_lenta_ms': round(mas_lenta[0] * 1000, 2),
+            'consulta_mas_lenta': mas_lenta[1],
+        }
+    return datos
+
+
+def reiniciar():
+    with _lock:
+        _por_vista.clear()
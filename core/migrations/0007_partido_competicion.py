@@ -0,0 +1,18 @@
+# Generated by Django 4.1.5 on 2026-10-18 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_torneo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='partido',
+            name='competicion',
+            field=models.CharField(blank=True, max_length=20, null=True),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.1.5 on 2026-10-18 16:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0007_partido_competicion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('numero_fecha', models.IntegerField()),
+                ('puntos', models.IntegerField()),
+                ('posicion', models.IntegerField()),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='historial_ranking', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('usuario', 'numero_fecha')},
+                'indexes': [models.Index(fields=['numero_fecha', 'posicion'], name='core_snapsh_numero__fcbb30_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.1.5 on 2026-10-18 17:05
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def calcular_totales(apps, schema_editor):
+    """Llena los totales de las empresas que ya existen."""
+    Empresa = apps.get_model('core', 'Empresa')
+    PerfilEmpleado = apps.get_model('core', 'PerfilEmpleado')
+
+    empleados = PerfilEmpleado.objects.filter(empresa=OuterRef('pk')).values('empresa')
+    Empresa.objects.update(
+        puntos_totales=Coalesce(Subquery(empleados.annotate(t=Sum('puntos_totales')).values('t')), Value(0)),
+        cantidad_empleados=Coalesce(Subquery(empleados.annotate(c=Count('id')).values('c')), Value(0)),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_snapshotranking'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empresa',
+            name='cantidad_empleados',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='empresa',
+            name='puntos_totales',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='perfilempleado',
+            index=models.Index(fields=['empresa', '-puntos_totales'], name='core_perfil_empresa_8602a3_idx'),
+        ),
+        migrations.RunPython(calcular_totales, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.1.5 on 2026-10-18 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_empresa_totales'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='partido',
+            index=models.Index(fields=['numero_fecha', 'fecha_hora'], name='core_partid_numero__9980eb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='partido',
+            index=models.Index(fields=['fecha_hora'], name='core_partid_fecha_h_541f25_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='perfilempleado',
+            index=models.Index(fields=['-puntos_totales', 'id'], name='core_perfil_puntos__9500ac_idx'),
+        ),
+    ]
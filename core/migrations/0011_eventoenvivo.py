@@ -0,0 +1,21 @@
+# Generated by Django 4.1.5 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoEnVivo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('datos', models.JSONField()),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
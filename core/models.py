@@ -1,14 +1,30 @@
+import logging
 import uuid
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
-from django.db.models import Sum
+
+from .fixture import invalidar_fixture
+from .historial import actualizar_historial
+from .versiones import incrementar
+from .puntos import puntuar_partidos
+
+logger = logging.getLogger(__name__)
 
 # --- MODELO EMPRESA ---
 class Empresa(models.Model):
     nombre = models.CharField(max_length=100)
     codigo_acceso = models.CharField(max_length=50, unique=True)
+
+    # Totales de la tabla "empresa vs empresa" (se actualizan al puntuar,
+    # no se calculan con GROUP BY en cada visita)
+    puntos_totales = models.IntegerField(default=0)
+    cantidad_empleados = models.IntegerField(default=0)
+
+    @property
+    def promedio(self):
+        return self.puntos_totales / self.cantidad_empleados if self.cantidad_empleados else 0
     
     def __str__(self):
         return self.nombre
@@ -18,6 +34,12 @@ class PerfilEmpleado(models.Model):
     usuario = models.OneToOneField(User, on_delete=models.CASCADE)
     empresa = models.ForeignKey(Empresa, on_delete=models.CASCADE)
     puntos_totales = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-puntos_totales', 'id']),  # Ranking global (y cursor)
+            models.Index(fields=['empresa', '-puntos_totales']),  # Tabla de cada empresa
+        ]
     
     def __str__(self):
         return f"{self.usuario.username} - {self.puntos_totales} pts"
@@ -25,6 +47,7 @@ class PerfilEmpleado(models.Model):
 # --- MODELO PARTIDO ---
 class Partido(models.Model):
     api_id = models.CharField(max_length=50, unique=True, blank=True, null=True)  # ID de la API de Football Data
+    competicion = models.CharField(max_length=20, blank=True, null=True)  # Ej: 2021 = Premier League
     equipo_local = models.CharField(max_length=50)
     equipo_visitante = models.CharField(max_length=50)
     escudo_local = models.URLField(blank=True, null=True)     # URL de imagen
@@ -38,6 +61,27 @@ class Partido(models.Model):
     goles_visitante_real = models.IntegerField(blank=True, null=True)
     jugado = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['numero_fecha', 'fecha_hora']),  # Partidos de una fecha, por horario
+            models.Index(fields=['fecha_hora']),  # Próximo partido / partidos en juego / --since
+        ]
+
+    # Si cambia alguno de estos, hay que volver a calcular los puntos
+    CAMPOS_RESULTADO = ('jugado', 'goles_local_real', 'goles_visitante_real')
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        partido = super().from_db(db, field_names, values)
+        # El resultado como está en la base, para saber al guardar si cambió
+        # (con .only() sin esos campos queda sin saber y se vuelve a puntuar)
+        if not partido.get_deferred_fields() & set(cls.CAMPOS_RESULTADO):
+            partido._resultado_guardado = partido.resultado()
+        return partido
+
+    def resultado(self):
+        return tuple(getattr(self, campo) for campo in self.CAMPOS_RESULTADO)
+
     def __str__(self):
         return f"Fecha {self.numero_fecha}: {self.equipo_local} vs {self.equipo_visitante}"
 
@@ -72,59 +116,113 @@ class Torneo(models.Model):
     def __str__(self):
         return f"{self.nombre} ({self.codigo})"
 
+# --- MODELO SNAPSHOT DEL RANKING (Foto de la tabla al terminar cada fecha) ---
+class SnapshotRanking(models.Model):
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='historial_ranking')
+    numero_fecha = models.IntegerField()
+    puntos = models.IntegerField()
+    posicion = models.IntegerField()
+
+    class Meta:
+        unique_together = ('usuario', 'numero_fecha')  # Una foto por usuario y fecha
+        indexes = [models.Index(fields=['numero_fecha', 'posicion'])]  # La tabla de una fecha, ya ordenada
+
+    def __str__(self):
+        return f"Fecha {self.numero_fecha}: {self.usuario} #{self.posicion} ({self.puntos} pts)"
+
+
+# --- MODELO EVENTO EN VIVO (Buzón de resultados para /eventos/, ver core/en_vivo.py) ---
+class EventoEnVivo(models.Model):
+    datos = models.JSONField()  # Marcador del partido + puntos_totales nuevos de los perfiles que cambiaron
+    creado = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Evento {self.id} ({self.creado:%d/%m %H:%M:%S})"
+
 
 # --- AUTOMATIZACIÓN DE PUNTOS (SIGNALS) ---
-# Esto corre automáticamente cada vez que el Admin guarda un Partido como "Jugado"
+# Esto corre automáticamente cada vez que el Admin guarda un Partido con el
+# resultado cambiado. Si el partido está "Jugado" calcula los puntos; si se
+# desmarca, los devuelve a 0.
+@receiver(post_save, sender=Partido)
+def actualizar_puntos_al_guardar_resultado(sender, instance, created, **kwargs):
+    resultado = instance.resultado()
+    anterior = getattr(instance, '_resultado_guardado', None)
+    instance._resultado_guardado = resultado
+
+    # Un partido recién creado todavía no tiene pronósticos, y si no cambió el
+    # resultado (ej: se corrigió el horario) no hay nada que volver a puntuar
+    if (created and not instance.jugado) or resultado == anterior:
+        return
+
+    logger.info("Calculando puntos para: %s", instance)
+
+    # Calcula los puntos en un solo UPDATE y aplica al ranking
+    # solo la diferencia de cada pronóstico que cambió (el marcador nuevo se
+    # publica en vivo aunque no cambie ningún pronóstico)
+    cambiados = puntuar_partidos([instance], resultado_cambiado=True)
+
+    # Si con este partido se completó (o dejó de estar completa) la fecha, se
+    # guarda (o se borra) la foto del ranking
+    actualizar_historial([instance.numero_fecha])
+
+    logger.info("Ranking actualizado (%d pronósticos cambiaron)", cambiados)
+
+
+# --- TOTALES DE CADA EMPRESA ---
+# Un empleado nuevo (o borrado) suma (o resta) a los totales de su empresa
+# (y entra o sale del ranking global).
+# Si se cambia un perfil de empresa a mano, `verificar_ranking --corregir` lo arregla.
+@receiver(post_save, sender=PerfilEmpleado)
+def sumar_empleado_a_la_empresa(sender, instance, created, **kwargs):
+    if created:
+        Empresa.objects.filter(id=instance.empresa_id).update(
+            cantidad_empleados=models.F('cantidad_empleados') + 1,
+            puntos_totales=models.F('puntos_totales') + instance.puntos_totales,
+        )
+    incrementar('ranking', f"empresa:{instance.empresa_id}")
+
+
+@receiver(post_delete, sender=PerfilEmpleado)
+def restar_empleado_de_la_empresa(sender, instance, **kwargs):
+    Empresa.objects.filter(id=instance.empresa_id).update(
+        cantidad_empleados=models.F('cantidad_empleados') - 1,
+        puntos_totales=models.F('puntos_totales') - instance.puntos_totales,
+    )
+    incrementar('ranking', f"empresa:{instance.empresa_id}")
+
+
+# --- TABLAS DE LOS TORNEOS ---
+# Si alguien entra o sale de un torneo, su tabla cacheada queda vieja
+@receiver(m2m_changed, sender=Torneo.participantes.through)
+def invalidar_tabla_al_cambiar_participantes(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        incrementar(f"torneo:{instance.id}")
+    elif pk_set:
+        # user.torneos_participados.add(...): los torneos vienen en pk_set
+        incrementar(*[f"torneo:{torneo_id}" for torneo_id in pk_set])
+
+
+# El nombre y el código se muestran en la página del torneo
+@receiver(post_save, sender=Torneo)
+def invalidar_torneo_al_guardar(sender, instance, **kwargs):
+    incrementar(f"torneo:{instance.id}")
+
+
+# --- PRONÓSTICOS ---
+# guardar_pronosticos incrementa la versión por su cuenta (bulk_create no
+# dispara signals); esto cubre los cambios desde el admin
+@receiver(post_save, sender=Pronostico)
+@receiver(post_delete, sender=Pronostico)
+def invalidar_prode_al_cambiar_pronostico(sender, instance, **kwargs):
+    incrementar(f"pronosticos:{instance.usuario_id}")
+
+
+# --- CACHE DEL FIXTURE ---
+# Cualquier cambio en un Partido invalida el fixture cacheado
 @receiver(post_save, sender=Partido)
-def actualizar_puntos_al_guardar_resultado(sender, instance, **kwargs):
-    if instance.jugado:
-        print(f"🔄 Calculando puntos para: {instance}")
-        
-        # 1. Buscar todos los pronósticos de este partido
-        pronosticos = Pronostico.objects.filter(partido=instance)
-        
-        real_local = instance.goles_local_real
-        real_visitante = instance.goles_visitante_real
-        
-        # 2. Calcular puntos para cada pronóstico
-        for pron in pronosticos:
-            pred_local = pron.goles_local_prediccion
-            pred_visitante = pron.goles_visitante_prediccion
-            puntos = 0
-
-            # Si acertó exacto (Ej: Dijo 2-1 y salió 2-1) -> 3 Puntos
-            if real_local == pred_local and real_visitante == pred_visitante:
-                puntos = 3
-            else:
-                # Verificamos quién ganó o si fue empate
-                gano_local_real = real_local > real_visitante
-                gano_visita_real = real_visitante > real_local
-                empate_real = real_local == real_visitante
-                
-                gano_local_pred = pred_local > pred_visitante
-                gano_visita_pred = pred_visitante > pred_local
-                empate_pred = pred_local == pred_visitante
-                
-                # Si acertó el resultado (quién ganó) pero no los goles exactos -> 1 Punto
-                if (gano_local_real and gano_local_pred) or \
-                   (gano_visita_real and gano_visita_pred) or \
-                   (empate_real and empate_pred):
-                    puntos = 1
-            
-            # Solo guardamos si cambió el puntaje para optimizar
-            if pron.puntos_ganados != puntos:
-                pron.puntos_ganados = puntos
-                pron.save()
-
-        # 3. ACTUALIZAR EL RANKING (TABLA DE POSICIONES)
-        # Recalculamos el total SOLO para los usuarios afectados
-        usuarios_afectados = pronosticos.values_list('usuario', flat=True)
-        perfiles = PerfilEmpleado.objects.filter(usuario__id__in=usuarios_afectados)
-
-        for perfil in perfiles:
-            resultado = Pronostico.objects.filter(usuario=perfil.usuario).aggregate(Sum('puntos_ganados'))
-            total = resultado['puntos_ganados__sum']
-            perfil.puntos_totales = total if total else 0
-            perfil.save()
-            
-        print("✅ Ranking actualizado automáticamente.")
\ No newline at end of file
+@receiver(post_delete, sender=Partido)
+def invalidar_fixture_al_cambiar_partido(sender, instance, **kwargs):
+    invalidar_fixture()
@@ -0,0 +1,44 @@
+from django.db import transaction
+
+from .models import Pronostico
+from .versiones import incrementar
+
+# --- GUARDADO DE PRONÓSTICOS ---
+
+
+def guardar_pronosticos(usuario, partidos, goles_por_partido, ahora):
+    """
+    Guarda de una vez los pronósticos de un usuario.
+
+    goles_por_partido: {partido_id: (goles_local, goles_visitante)}
+
+    Solo se aceptan partidos que todavía no empezaron (ni se jugaron):
+    `partidos` tiene que venir de la base, no de la cache. Se hace un único
+    INSERT ... ON CONFLICT DO UPDATE sobre (usuario, partido), así crear o
+    modificar cuesta lo mismo sin importar cuántos partidos tenga la fecha.
+    Devuelve los pronósticos guardados.
+    """
+    pronosticos = [
+        Pronostico(
+            usuario=usuario,
+            partido=partido,
+            goles_local_prediccion=goles_por_partido[partido.id][0],
+            goles_visitante_prediccion=goles_por_partido[partido.id][1],
+        )
+        for partido in partidos
+        # Seguridad: Bloquear si el partido ya empezó
+        if partido.id in goles_por_partido and partido.fecha_hora > ahora and not partido.jugado
+    ]
+    if not pronosticos:
+        return []
+
+    with transaction.atomic():
+        Pronostico.objects.bulk_create(
+            pronosticos,
+            update_conflicts=True,
+            unique_fields=['usuario', 'partido'],
+            update_fields=['goles_local_prediccion', 'goles_visitante_prediccion'],
+        )
+    # La página del prode de este usuario (ETag) queda vieja
+    incrementar(f"pronosticos:{usuario.pk}")
+    return pronosticos
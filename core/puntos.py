@@ -0,0 +1,243 @@
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+
+from .en_vivo import publicar_resultado, publicar_resultados
+from .versiones import incrementar, incrementar_al_confirmar
+
+# --- MOTOR DE PUNTOS ---
+# Reglas del prode:
+#   3 puntos -> resultado exacto (Ej: dijo 2-1 y salió 2-1)
+#   1 punto  -> acertó quién ganó (o el empate) pero no los goles
+#   0 puntos -> no acertó nada
+
+
+def calcular_puntos_pronostico(real_local, real_visitante, pred_local, pred_visitante):
+    """Versión en Python de la regla de puntos (para un solo pronóstico)."""
+    if real_local is None or real_visitante is None:
+        return 0
+
+    # Si acertó exacto -> 3 Puntos
+    if real_local == pred_local and real_visitante == pred_visitante:
+        return 3
+
+    # Verificamos quién ganó o si fue empate
+    gano_local_real = real_local > real_visitante
+    gano_visita_real = real_visitante > real_local
+    empate_real = real_local == real_visitante
+
+    gano_local_pred = pred_local > pred_visitante
+    gano_visita_pred = pred_visitante > pred_local
+    empate_pred = pred_local == pred_visitante
+
+    # Si acertó el resultado (quién ganó) pero no los goles exactos -> 1 Punto
+    if (gano_local_real and gano_local_pred) or \
+       (gano_visita_real and gano_visita_pred) or \
+       (empate_real and empate_pred):
+        return 1
+
+    return 0
+
+
+def expresion_puntos(real_local, real_visitante):
+    """
+    Misma regla que calcular_puntos_pronostico, pero como expresión SQL
+    (CASE WHEN) sobre las columnas de Pronostico. Como el resultado real es
+    fijo para todo el partido, se arma una sola vez y la base de datos
+    la evalúa para todas las filas.
+    """
+    if real_local is None or real_visitante is None:
+        return Value(0)
+
+    # Condición de "acertó quién ganó" según el resultado real
+    if real_local > real_visitante:
+        acerto_ganador = Q(goles_local_prediccion__gt=F('goles_visitante_prediccion'))
+    elif real_local < real_visitante:
+        acerto_ganador = Q(goles_local_prediccion__lt=F('goles_visitante_prediccion'))
+    else:
+        acerto_ganador = Q(goles_local_prediccion=F('goles_visitante_prediccion'))
+
+    return Case(
+        When(goles_local_prediccion=real_local, goles_visitante_prediccion=real_visitante, then=Value(3)),
+        When(acerto_ganador, then=Value(1)),
+        default=Value(0),
+    )
+
+
+def puntuar_partido(partido, actualizar_ranking=True):
+    """
+    Calcula los puntos de TODOS los pronósticos de un partido con un único
+    UPDATE condicional. Solo toca las filas cuyo puntaje cambia.
+
+    Antes de pisar los puntos, suma al ranking (PerfilEmpleado.puntos_totales)
+    solo la diferencia de cada pronóstico modificado, así no hay que volver
+    a sumar todos los pronósticos de cada usuario. Si el partido deja de
+    estar "jugado" los puntos vuelven a 0 y la diferencia se descuenta.
+    Lo mismo con el total de cada empresa (Empresa.puntos_totales).
+    Con actualizar_ranking=False solo se tocan los pronósticos (el recálculo
+    completo suma los totales al final con recalcular_totales); si no, y si
+    cambió algún pronóstico, se publica el resultado para los que miran en vivo.
+    Devuelve la cantidad de pronósticos actualizados.
+    """
+    return puntuar_partidos([partido], actualizar_ranking)
+
+
+def puntuar_partidos(partidos, actualizar_ranking=True, resultado_cambiado=False):
+    """
+    Puntúa varios partidos (como puntuar_partido) en una sola transacción:
+    se confirman todos o ninguno. Las versiones de las tablas cacheadas se
+    incrementan una sola vez, al confirmarla. Solo se publican los partidos
+    que cambiaron algún pronóstico; con resultado_cambiado=True (el que llama
+    sabe que cambió el marcador) los demás publican solo el marcador.
+    Devuelve pronósticos actualizados.
+    """
+    if not partidos:
+        return 0
+
+    dominios = set()
+    actualizados = 0
+    solo_marcador = []
+    with transaction.atomic():
+        for partido in partidos:
+            cambiados = _aplicar_puntos(partido, actualizar_ranking, dominios)
+            if not cambiados and resultado_cambiado:
+                solo_marcador.append(partido)
+            actualizados += cambiados
+        if actualizar_ranking:
+            publicar_resultados(solo_marcador)
+        # Las tablas cacheadas de las empresas y torneos afectados quedan viejas,
+        # igual que las páginas (ETag) del ranking global y de las fechas
+        incrementar_al_confirmar(*sorted(dominios))
+    return actualizados
+
+
+def _puntos(partido):
+    if partido.jugado:
+        return expresion_puntos(partido.goles_local_real, partido.goles_visitante_real)
+    return Value(0)
+
+
+def _aplicar_puntos(partido, actualizar_ranking, dominios):
+    """
+    Las escrituras de puntuar_partido; agrega a `dominios` las versiones que cambian.
+    Va dentro de la transacción y empieza con un UPDATE (toma el lock de
+    escritura sin pasar por uno de lectura). Perfiles y empresas afectados
+    salen de `cambiados` en cada UPDATE, no de una lectura previa: si otro
+    proceso puntuó el partido en el medio, las diferencias igual van a los
+    mismos pronósticos que se pisan en el paso 2.
+    """
+    from .models import Empresa, PerfilEmpleado, Pronostico, Torneo
+
+    puntos = _puntos(partido)
+    cambiados = Pronostico.objects.filter(partido=partido).exclude(puntos_ganados=puntos)
+    afectados = PerfilEmpleado.objects.filter(usuario__in=cambiados.values('usuario'))
+    ranking = []
+
+    # 1. Aplicar la diferencia (nuevo - viejo) al total de cada usuario afectado
+    #    y al total de sus empresas
+    if actualizar_ranking:
+        diferencia_empresa = Pronostico.objects.filter(
+            partido=partido, usuario__perfilempleado__empresa=OuterRef('pk')
+        ).values('partido').annotate(
+            diferencia=Sum(puntos - F('puntos_ganados'))
+        ).values('diferencia')
+
+        Empresa.objects.filter(id__in=afectados.values('empresa_id')).update(
+            puntos_totales=F('puntos_totales') + Coalesce(
+                Subquery(diferencia_empresa, output_field=IntegerField()), Value(0)
+            )
+        )
+
+        diferencia = Pronostico.objects.filter(
+            partido=partido, usuario=OuterRef('usuario')
+        ).annotate(
+            diferencia=puntos - F('puntos_ganados')
+        ).values('diferencia')[:1]
+
+        afectados.update(puntos_totales=F('puntos_totales') + Subquery(diferencia))
+
+        # Los totales nuevos de los que cambiaron (para los que miran en vivo) y
+        # sus empresas y torneos (para invalidar sus tablas). Antes del paso 2:
+        # después `cambiados` ya no encuentra a nadie
+        filas = list(afectados.values_list('id', 'puntos_totales', 'empresa_id'))
+        ranking = [(perfil_id, puntos_totales) for perfil_id, puntos_totales, _ in filas]
+        if filas:
+            torneos = Torneo.participantes.through.objects.filter(
+                user__in=cambiados.values('usuario')
+            ).values_list('torneo_id', flat=True).distinct()
+            dominios.update([
+                'ranking',
+                *{f"empresa:{empresa_id}" for _, _, empresa_id in filas},
+                *[f"torneo:{torneo_id}" for torneo_id in torneos],
+            ])
+
+    # 2. Guardar los puntos nuevos de los pronósticos
+    actualizados = cambiados.update(puntos_ganados=puntos)
+    if actualizados:
+        dominios.add(f"fecha:{partido.numero_fecha}")
+
+    # Marcador y puntos nuevos para los que miran en vivo (/eventos/)
+    if actualizar_ranking and actualizados:
+        publicar_resultado(partido, ranking)
+    return actualizados
+
+
+def total_real_por_usuario():
+    """Subquery con la suma real de puntos_ganados del usuario de cada perfil."""
+    from .models import Pronostico
+
+    suma = Pronostico.objects.filter(
+        usuario=OuterRef('usuario')
+    ).values('usuario').annotate(total=Sum('puntos_ganados')).values('total')
+    return Coalesce(Subquery(suma, output_field=IntegerField()), Value(0))
+
+
+def recalcular_totales(perfiles=None):
+    """
+    Vuelve a sumar puntos_totales desde cero con un único UPDATE.
+    Si no se pasan perfiles, recalcula todo el ranking.
+    """
+    from .models import PerfilEmpleado, Torneo
+
+    if perfiles is None:
+        perfiles = PerfilEmpleado.objects.all()
+    torneos = list(Torneo.participantes.through.objects.filter(
+        user__in=perfiles.values('usuario')
+    ).values_list('torneo_id', flat=True).distinct())
+
+    actualizados = perfiles.update(puntos_totales=total_real_por_usuario())
+    recalcular_empresas()
+    incrementar('ranking', *[f"torneo:{torneo_id}" for torneo_id in torneos])
+    return actualizados
+
+
+def totales_reales_por_empresa():
+    """Subqueries con la suma de puntos y la cantidad de empleados de cada empresa."""
+    from .models import PerfilEmpleado
+
+    empleados = PerfilEmpleado.objects.filter(empresa=OuterRef('pk')).values('empresa')
+    suma = empleados.annotate(total=Sum('puntos_totales')).values('total')
+    cantidad = empleados.annotate(cantidad=Count('id')).values('cantidad')
+    return {
+        'total_real': Coalesce(Subquery(suma, output_field=IntegerField()), Value(0)),
+        'cantidad_real': Coalesce(Subquery(cantidad, output_field=IntegerField()), Value(0)),
+    }
+
+
+def recalcular_empresas(empresas=None):
+    """
+    Vuelve a sumar los totales de cada empresa (puntos y empleados) desde
+    los perfiles, con un único UPDATE. Invalida sus tablas cacheadas.
+    """
+    from .models import Empresa
+
+    if empresas is None:
+        empresas = Empresa.objects.all()
+    reales = totales_reales_por_empresa()
+    ids = list(empresas.values_list('id', flat=True))
+    Empresa.objects.filter(id__in=ids).update(
+        puntos_totales=reales['total_real'], cantidad_empleados=reales['cantidad_real']
+    )
+    if ids:
+        incrementar(*[f"empresa:{empresa_id}" for empresa_id in ids])
+    return len(ids)
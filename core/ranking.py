@@ -0,0 +1,195 @@
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, OuterRef, Q, Subquery, Value, When, Window
+from django.db.models.functions import Rank
+
+from .models import PerfilEmpleado
+from .versiones import duracion, version
+
+# --- TABLAS DE POSICIONES ---
+# Paginación "por cursor" (keyset): en vez de OFFSET, cada página arranca
+# después del último perfil de la anterior (puntos, id). Así cualquier
+# página cuesta lo mismo, sea la primera o la número 400.
+
+TAMANIO_PAGINA = 50
+
+# Las páginas de las tablas de empresas y torneos quedan en la cache hasta que
+# cambia la versión del dominio (se incrementa al cambiar los puntos de un
+# empleado/participante o cuando alguien se une a un torneo). Sin cache
+# compartida, como mucho DURACION_LOCAL (ver versiones.py).
+DURACION_CACHE = 60 * 60
+
+
+def armar_cursor(perfil):
+    return f"{perfil.puntos_totales}_{perfil.id}"
+
+
+def leer_cursor(cursor):
+    """Devuelve (puntos, id) o None si el cursor no es válido."""
+    try:
+        puntos, id_perfil = cursor.split('_')
+        return int(puntos), int(id_perfil)
+    except (AttributeError, ValueError):
+        return None
+
+
+class Cantidad(Subquery):
+    """
+    COUNT(*) de un queryset como subconsulta. El Count de Django agregaría un
+    GROUP BY; así SQLite lo cuenta recorriendo el índice (ej: el de puntos).
+    """
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) _cantidad)'
+    output_field = IntegerField()
+
+
+def _despues_de(pagina, desde):
+    """Filtro keyset: los que vienen después de (puntos, id) en la tabla."""
+    puntos, id_perfil = desde
+    return pagina.filter(Q(puntos_totales__lt=puntos) | Q(puntos_totales=puntos, id__gt=id_perfil))
+
+
+def _posicion(perfiles, desde):
+    """
+    Posición de cada fila de la página: RANK() sobre las filas de la página
+    (los empatados comparten posición) más los que quedaron antes del cursor.
+    Los empatados con el cursor comparten su posición: a ellos solo se les
+    suman los que tienen más puntos.
+    """
+    posicion = Window(Rank(), order_by=F('puntos_totales').desc())
+    if not desde:
+        return posicion
+
+    puntos, id_perfil = desde
+    mejores = Cantidad(perfiles.filter(puntos_totales__gt=puntos).values('id'))
+    empatados = Cantidad(perfiles.filter(puntos_totales=puntos, id__lte=id_perfil).values('id'))
+    return posicion + mejores + Case(When(puntos_totales=puntos, then=Value(0)), default=empatados)
+
+
+def _pagina(perfiles, cursor, tamanio):
+    """
+    Las tamanio + 1 filas que siguen al cursor (la de más dice si hay otra
+    página), en el orden de la tabla y con `posicion`, en una sola consulta.
+
+    La página sale recorriendo el índice (-puntos_totales, id) y el RANK()
+    se calcula solo sobre esas filas: con la ventana sobre la tabla, SQLite
+    tendría que ordenarla entera antes de cortar la página.
+    """
+    desde = leer_cursor(cursor)
+    claves = perfiles.order_by('-puntos_totales', 'id')
+    if desde:
+        claves = _despues_de(claves, desde)
+    return perfiles.filter(id__in=claves.values('id')[:tamanio + 1]).annotate(
+        posicion=_posicion(perfiles, desde)
+    ).order_by('-puntos_totales', 'id')
+
+
+def pagina_ranking(perfiles, cursor=None, tamanio=TAMANIO_PAGINA):
+    """
+    Una página de la tabla de posiciones de `perfiles` (queryset de
+    PerfilEmpleado: global, de una empresa, de un torneo...).
+
+    Cada perfil trae `posicion` (los empatados comparten posición).
+    Devuelve (perfiles, cursor_siguiente); cursor_siguiente es None en la
+    última página.
+    """
+    filas = list(_pagina(perfiles, cursor, tamanio).select_related('usuario', 'empresa'))
+    cursor_siguiente = armar_cursor(filas[tamanio - 1]) if len(filas) > tamanio else None
+    return filas[:tamanio], cursor_siguiente
+
+
+def pagina_ranking_valores(perfiles, campos, cursor=None, tamanio=TAMANIO_PAGINA):
+    """
+    Como pagina_ranking, pero cada fila es un dict de .values('id',
+    'puntos_totales', 'posicion', *campos) (para la API JSON).
+    """
+    filas = list(_pagina(perfiles, cursor, tamanio).values('id', 'puntos_totales', 'posicion', *campos))
+    cursor_siguiente = None
+    if len(filas) > tamanio:
+        ultima = filas[tamanio - 1]
+        cursor_siguiente = f"{ultima['puntos_totales']}_{ultima['id']}"  # como armar_cursor
+    return filas[:tamanio], cursor_siguiente
+
+
+def _pagina_cacheada(dominio, perfiles, cursor, tamanio):
+    """Página de `perfiles` guardada en la cache con la versión de `dominio` en la clave."""
+    desde = leer_cursor(cursor)
+    clave = f"ranking:{dominio}:{version(dominio)}:{tamanio}"
+    if desde:
+        clave += ":%d_%d" % desde
+
+    pagina = cache.get(clave)
+    if pagina is None:
+        pagina = pagina_ranking(perfiles, cursor, tamanio)
+        cache.set(clave, pagina, duracion(DURACION_CACHE))
+    return pagina
+
+
+def pagina_ranking_empresa(empresa_id, cursor=None, tamanio=TAMANIO_PAGINA):
+    """
+    Página de la tabla de una empresa, cacheada con la versión
+    'empresa:<id>' en la clave. Usa el índice (empresa, -puntos_totales).
+    """
+    perfiles = PerfilEmpleado.objects.filter(empresa_id=empresa_id)
+    return _pagina_cacheada(f"empresa:{empresa_id}", perfiles, cursor, tamanio)
+
+
+def pagina_ranking_torneo(torneo_id, cursor=None, tamanio=TAMANIO_PAGINA):
+    """
+    Página de la tabla de un torneo, cacheada con la versión 'torneo:<id>'
+    (cambia cuando alguien se une o cuando cambian los puntos de un participante).
+    """
+    return _pagina_cacheada(f"torneo:{torneo_id}", perfiles_del_alcance(torneo=torneo_id), cursor, tamanio)
+
+
+def perfiles_del_alcance(empresa=None, torneo=None):
+    """Perfiles que compiten en una tabla: global, de una Empresa o de un Torneo."""
+    perfiles = PerfilEmpleado.objects.all()
+    if empresa is not None:
+        perfiles = perfiles.filter(empresa=empresa)
+    if torneo is not None:
+        perfiles = perfiles.filter(usuario__torneos_participados=torneo)
+    return perfiles
+
+
+def alrededor(perfiles, perfil, cantidad=3):
+    """
+    La posición exacta de `perfil` dentro de `perfiles` y sus `cantidad`
+    vecinos de arriba y de abajo, sin recorrer la tabla, en una sola consulta:
+      - vecinos: subconsultas por rango del índice a partir de (puntos, id)
+      - posiciones: 1 + cuántos tienen más puntos (un COUNT por índice por fila)
+    `perfil` puede ser el perfil o un queryset que lo trae (ej:
+    filter(usuario=...)); así no hace falta leerlo antes.
+    Devuelve la lista ordenada de perfiles, cada uno con `posicion` (vacía si
+    el perfil no está en `perfiles`).
+    """
+    if isinstance(perfil, PerfilEmpleado):
+        puntos, id_perfil = perfil.puntos_totales, perfil.id
+    else:
+        puntos, id_perfil = Subquery(perfil.values('puntos_totales')[:1]), Subquery(perfil.values('id')[:1])
+
+    # Cada lado en dos rangos (otros puntos / mismos puntos): con un OR entre
+    # los dos y el puntaje en una subconsulta, SQLite recorre el índice entero
+    vecinos = Q(id=id_perfil)
+    if cantidad:
+        mismos = perfiles.filter(puntos_totales=puntos)
+        for rango in (
+            perfiles.filter(puntos_totales__gt=puntos).order_by('puntos_totales', '-id'),
+            mismos.filter(id__lt=id_perfil).order_by('-id'),
+            mismos.filter(id__gt=id_perfil).order_by('id'),
+            perfiles.filter(puntos_totales__lt=puntos).order_by('-puntos_totales', 'id'),
+        ):
+            vecinos |= Q(id__in=rango.values('id')[:cantidad])
+
+    mas_puntos = perfiles.filter(puntos_totales__gt=OuterRef('puntos_totales')).values('id')
+    filas = list(
+        perfiles.filter(vecinos).select_related('usuario', 'empresa')
+        .annotate(posicion=Cantidad(mas_puntos) + 1, es_el_perfil=Q(id=id_perfil))
+        .order_by('-puntos_totales', 'id')
+    )
+
+    # De cada lado pueden venir hasta 2 * cantidad: quedan los más cercanos
+    mia = next((i for i, fila in enumerate(filas) if fila.es_el_perfil), None)
+    if mia is None:
+        return []
+    if isinstance(perfil, PerfilEmpleado):
+        perfil.posicion = filas[mia].posicion
+    return filas[max(mia - cantidad, 0):mia + cantidad + 1]
@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+# --- AJUSTES DE SQLITE PARA VARIOS PROCESOS ---
+# Los workers web leen mientras el cron/vigilar_partidos y la señal de
+# puntos escriben. Con el journal por defecto (DELETE) una escritura bloquea
+# a los lectores y los que esperan terminan en "database is locked".
+# En WAL los lectores no se bloquean nunca: leen la última versión
+# confirmada mientras el escritor agrega al -wal.
+# Los PRAGMA se aplican a cada conexión nueva (settings.PRODE_SQLITE_PRAGMAS).
+
+
+@receiver(connection_created)
+def configurar_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    cursor = connection.connection.cursor()
+    for pragma, valor in settings.PRODE_SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma} = {valor}")
+    cursor.close()
@@ -1,3 +1,1718 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import fixture, metricas
+from .api_futbol import ClienteFootballData
+from .importacion import sincronizar_partidos
+from .models import Empresa, PerfilEmpleado, Partido, Pronostico, SnapshotRanking, Torneo
+from .puntos import calcular_puntos_pronostico, puntuar_partido, puntuar_partidos
+from .ranking import alrededor, pagina_ranking
+from .versiones import DURACION_LOCAL
+
+# Cache compartida entre procesos (como con PRODE_CACHE_DIR)
+CACHE_EN_ARCHIVOS = {'default': {
+    'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+    'LOCATION': os.path.join(tempfile.gettempdir(), 'prode-tests-cache'),
+}}
+
+
+def crear_empleados(empresas, puntos):
+    """
+    Un usuario "user<i>" con su PerfilEmpleado por cada valor de `puntos` (sus
+    puntos_totales), repartidos en ronda entre `empresas` (una o una lista).
+    Devuelve los usuarios.
+    """
+    empresas = empresas if isinstance(empresas, list) else [empresas]
+    usuarios = []
+    for i, puntos_totales in enumerate(puntos):
+        usuario = User.objects.create(username=f"user{i}")
+        PerfilEmpleado.objects.create(usuario=usuario, empresa=empresas[i % len(empresas)],
+                                      puntos_totales=puntos_totales)
+        usuarios.append(usuario)
+    return usuarios
+
+
+# --- MOTOR DE PUNTOS ---
+class MotorDePuntosTests(TestCase):
+
+    def setUp(self):
+        self.empresa = Empresa.objects.create(nombre="Test", codigo_acceso="TEST")
+        self.usuarios = crear_empleados(self.empresa, [0] * 30)
+
+    def crear_partido(self, **kwargs):
+        datos = {
+            'equipo_local': "Local",
+            'equipo_visitante': "Visitante",
+            'fecha_hora': timezone.now() - timedelta(days=1),
+            'numero_fecha': 1,
+        }
+        datos.update(kwargs)
+        return Partido.objects.create(**datos)
+
+    def test_reglas_basicas(self):
+        self.assertEqual(calcular_puntos_pronostico(2, 1, 2, 1), 3)
+        self.assertEqual(calcular_puntos_pronostico(2, 1, 3, 0), 1)
+        self.assertEqual(calcular_puntos_pronostico(1, 1, 0, 0), 1)
+        self.assertEqual(calcular_puntos_pronostico(0, 2, 1, 0), 0)
+        self.assertEqual(calcular_puntos_pronostico(None, None, 1, 0), 0)
+
+    def test_update_condicional_igual_a_la_version_python(self):
+        rnd = random.Random(2021)
+        for _ in range(20):
+            partido = self.crear_partido()
+            for usuario in self.usuarios:
+                Pronostico.objects.create(
+                    usuario=usuario, partido=partido,
+                    goles_local_prediccion=rnd.randint(0, 4),
+                    goles_visitante_prediccion=rnd.randint(0, 4),
+                    puntos_ganados=rnd.choice([0, 1, 3]),
+                )
+            partido.goles_local_real = rnd.randint(0, 4)
+            partido.goles_visitante_real = rnd.randint(0, 4)
+            partido.jugado = True
+            puntuar_partido(partido)
+
+            for pron in Pronostico.objects.filter(partido=partido):
+                esperado = calcular_puntos_pronostico(
+                    partido.goles_local_real, partido.goles_visitante_real,
+                    pron.goles_local_prediccion, pron.goles_visitante_prediccion,
+                )
+                self.assertEqual(pron.puntos_ganados, esperado)
+
+    def test_signal_actualiza_ranking(self):
+        partido = self.crear_partido()
+        Pronostico.objects.create(usuario=self.usuarios[0], partido=partido,
+                                  goles_local_prediccion=2, goles_visitante_prediccion=1)
+        Pronostico.objects.create(usuario=self.usuarios[1], partido=partido,
+                                  goles_local_prediccion=1, goles_visitante_prediccion=0)
+        Pronostico.objects.create(usuario=self.usuarios[2], partido=partido,
+                                  goles_local_prediccion=0, goles_visitante_prediccion=0)
+
+        partido.goles_local_real = 2
+        partido.goles_visitante_real = 1
+        partido.jugado = True
+        partido.save()
+
+        puntos = dict(PerfilEmpleado.objects.values_list('usuario__username', 'puntos_totales'))
+        self.assertEqual(puntos['user0'], 3)
+        self.assertEqual(puntos['user1'], 1)
+        self.assertEqual(puntos['user2'], 0)
+
+    def test_otro_proceso_puntua_en_el_medio(self):
+        partido = self.crear_partido(goles_local_real=1, goles_visitante_real=0, jugado=True)
+        Pronostico.objects.create(usuario=self.usuarios[0], partido=partido,
+                                  goles_local_prediccion=1, goles_visitante_prediccion=0)
+        puntuar_partido(partido)  # user0: 3 puntos
+        atomic = transaction.atomic
+
+        def desmarcado_por_otro_proceso(*args, **kwargs):
+            # Justo antes de nuestra transacción, otro proceso ve el partido sin
+            # jugar y devuelve los puntos a 0 (pronóstico y totales)
+            with atomic():
+                Pronostico.objects.filter(partido=partido).update(puntos_ganados=0)
+                PerfilEmpleado.objects.filter(usuario=self.usuarios[0]).update(puntos_totales=0)
+                Empresa.objects.filter(id=self.empresa.id).update(puntos_totales=0)
+            return atomic(*args, **kwargs)
+
+        with mock.patch('core.puntos.transaction.atomic', desmarcado_por_otro_proceso):
+            self.assertEqual(puntuar_partido(partido), 1)
+
+        # La diferencia va con el pronóstico que se pisa: los totales no se desfasan
+        self.assertEqual(self.totales_guardados()['user0'], 3)
+        self.assertEqual(Empresa.objects.get().puntos_totales, 3)
+
+    def test_signal_solo_repuntua_si_cambia_el_resultado(self):
+        partido = self.crear_partido(goles_local_real=1, goles_visitante_real=0, jugado=True)
+
+        with mock.patch('core.models.puntuar_partidos', return_value=0) as puntuar, \
+                mock.patch('core.models.actualizar_historial') as historial:
+            # Otro horario, o guardar dos veces lo mismo (también leído de la base)
+            partido.fecha_hora -= timedelta(hours=1)
+            partido.save()
+            Partido.objects.get(id=partido.id).save()
+            puntuar.assert_not_called()
+            historial.assert_not_called()
+
+            partido = Partido.objects.get(id=partido.id)
+            partido.goles_visitante_real = 1
+            partido.save()
+            puntuar.assert_called_once_with([partido], resultado_cambiado=True)
+            historial.assert_called_once_with([1])
+
+            # Sin los campos del resultado cargados no se sabe si cambió: se puntúa
+            Partido.objects.only('id', 'fecha_hora').get(id=partido.id).save()
+            self.assertEqual(puntuar.call_count, 2)
+
+    def test_varios_partidos_en_una_transaccion(self):
+        partidos = [self.crear_partido(numero_fecha=n, goles_local_real=1, goles_visitante_real=0, jugado=True)
+                    for n in (1, 2)]
+        Pronostico.objects.bulk_create([
+            Pronostico(usuario=usuario, partido=partido, goles_local_prediccion=1, goles_visitante_prediccion=0)
+            for partido in partidos for usuario in self.usuarios[:3]
+        ])
+
+        # Si falla el segundo partido tampoco queda puntuado el primero
+        with mock.patch('core.puntos.publicar_resultado', side_effect=[None, RuntimeError]):
+            with self.assertRaises(RuntimeError):
+                puntuar_partidos(partidos)
+        self.assertFalse(Pronostico.objects.filter(puntos_ganados__gt=0).exists())
+
+        # Las versiones se incrementan una vez, recién al confirmar
+        with mock.patch('core.versiones.incrementar') as incrementar:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.assertEqual(puntuar_partidos(partidos), 6)
+                incrementar.assert_not_called()
+        incrementar.assert_called_once()
+        self.assertEqual(set(incrementar.call_args.args), {
+            'fecha:1', 'fecha:2', 'ranking', f"empresa:{self.empresa.id}",
+        })
+        self.assertEqual(self.totales_guardados()['user0'], 6)
+
+    def totales_reales(self):
+        return {
+            u.username: Pronostico.objects.filter(usuario=u).aggregate(t=Sum('puntos_ganados'))['t'] or 0
+            for u in self.usuarios
+        }
+
+    def totales_guardados(self):
+        return dict(PerfilEmpleado.objects.values_list('usuario__username', 'puntos_totales'))
+
+    def test_delta_con_correcciones_y_desmarcado(self):
+        rnd = random.Random(7)
+        partidos = [self.crear_partido(numero_fecha=n) for n in range(1, 6)]
+        for partido in partidos:
+            for usuario in self.usuarios:
+                Pronostico.objects.create(
+                    usuario=usuario, partido=partido,
+                    goles_local_prediccion=rnd.randint(0, 3),
+                    goles_visitante_prediccion=rnd.randint(0, 3),
+                )
+
+        for _ in range(3):
+            for partido in partidos:
+                partido.goles_local_real = rnd.randint(0, 3)
+                partido.goles_visitante_real = rnd.randint(0, 3)
+                partido.jugado = True
+                partido.save()
+                self.assertEqual(self.totales_guardados(), self.totales_reales())
+
+        # Desmarcar un partido como jugado devuelve sus puntos
+        partidos[0].jugado = False
+        partidos[0].save()
+        self.assertFalse(Pronostico.objects.filter(partido=partidos[0], puntos_ganados__gt=0).exists())
+        self.assertEqual(self.totales_guardados(), self.totales_reales())
+
+    def test_verificar_ranking_detecta_y_corrige(self):
+        partido = self.crear_partido(goles_local_real=1, goles_visitante_real=0)
+        Pronostico.objects.create(usuario=self.usuarios[0], partido=partido,
+                                  goles_local_prediccion=1, goles_visitante_prediccion=0)
+        partido.jugado = True
+        partido.save()
+        PerfilEmpleado.objects.filter(usuario=self.usuarios[1]).update(puntos_totales=10)
+
+        salida = StringIO()
+        call_command('verificar_ranking', stdout=salida)
+        self.assertIn('user1', salida.getvalue())
+        self.assertEqual(self.totales_guardados()['user1'], 10)
+
+        call_command('verificar_ranking', '--corregir', stdout=StringIO())
+        self.assertEqual(self.totales_guardados(), self.totales_reales())
+
+
+# --- SINCRONIZACIÓN CON LA API ---
+class ServidorAPIFalso:
+    """
+    Servidor HTTP local que imita a api.football-data.org, para probar
+    el cliente y la sincronización sin conexión a internet.
+    """
+
+    def __init__(self):
+        self.partidos = []
+        self.pedidos = []
+        self.limitar = 0  # Cantidad de pedidos a rechazar con 429
+
+        servidor_falso = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                servidor_falso.pedidos.append({
+                    'ruta': url.path,
+                    'params': parse_qs(url.query),
+                    'headers': dict(self.headers),
+                })
+
+                if servidor_falso.limitar:
+                    servidor_falso.limitar -= 1
+                    self.send_response(429)
+                    self.send_header('X-RequestCounter-Reset', '0')
+                    self.end_headers()
+                    return
+
+                cuerpo = json.dumps({'matches': servidor_falso.partidos}).encode()
+                etag = '"%s"' % hashlib.md5(cuerpo).hexdigest()
+                if self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('ETag', etag)
+                self.send_header('X-Requests-Available-Minute', '9')
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_port}/v4"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class ServidorAPIFalsoMixin:
+
+    def setUp(self):
+        super().setUp()
+        self.api = ServidorAPIFalso()
+        self.addCleanup(self.api.cerrar)
+        self.estado = tempfile.NamedTemporaryFile(suffix='.json', delete=False).name
+        self.addCleanup(os.remove, self.estado)
+        entorno = mock.patch.dict('os.environ', {'API_TOKEN': 'test'})
+        entorno.start()
+        self.addCleanup(entorno.stop)
+        configuracion = self.settings(FOOTBALL_DATA_URL=self.api.url, FOOTBALL_DATA_ESTADO=self.estado)
+        configuracion.enable()
+        self.addCleanup(configuracion.disable)
+
+
+class ClienteFootballDataTests(ServidorAPIFalsoMixin, TestCase):
+
+    def test_get_condicional_y_ventana_de_fechas(self):
+        self.api.partidos = [match_api(1)]
+        cliente = ClienteFootballData()
+        self.assertEqual(len(cliente.partidos(2021)), 1)
+        cliente.confirmar()
+
+        pedido = self.api.pedidos[-1]
+        self.assertEqual(pedido['ruta'], '/v4/competitions/2021/matches')
+        self.assertIn('dateFrom', pedido['params'])
+        self.assertIn('dateTo', pedido['params'])
+        self.assertEqual(pedido['headers']['X-Auth-Token'], 'test')
+
+        # Otra ejecución (cliente nuevo) manda el ETag guardado y recibe 304
+        self.assertIsNone(ClienteFootballData().partidos(2021))
+        self.assertIn('If-None-Match', self.api.pedidos[-1]['headers'])
+
+        self.api.partidos = [match_api(1), match_api(2)]
+        self.assertEqual(len(ClienteFootballData().partidos(2021)), 2)
+
+    def test_sin_confirmar_no_guarda_etag(self):
+        self.api.partidos = [match_api(1)]
+        ClienteFootballData().partidos(2021, completo=True)
+        self.assertEqual(len(ClienteFootballData().partidos(2021, completo=True)), 1)
+        self.assertNotIn('dateFrom', self.api.pedidos[-1]['params'])
+
+    def test_reintenta_cuando_la_api_limita(self):
+        self.api.partidos = [match_api(1)]
+        self.api.limitar = 1
+        self.assertEqual(len(ClienteFootballData().partidos(2021)), 1)
+        self.assertEqual(len(self.api.pedidos), 2)
+
+    def test_la_espera_por_el_limite_queda_en_el_log(self):
+        self.api.partidos = [match_api(1)]
+        cliente = ClienteFootballData()
+        cliente._esperar_hasta = time.monotonic() + 30
+        with mock.patch('core.api_futbol.time.sleep') as dormir, \
+                self.assertLogs('core.api_futbol', 'WARNING') as logs:
+            cliente.partidos(2021)
+        self.assertGreater(dormir.call_args_list[0].args[0], 29)
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("esperando 30s", logs.output[0])
+
+
+def match_api(id, local=None, visitante=None, status='TIMED', matchday=1):
+    return {
+        'id': id,
+        'matchday': matchday,
+        'utcDate': "2024-08-17T14:00:00Z",
+        'status': status,
+        'homeTeam': {'id': 1, 'name': "Local", 'crest': None},
+        'awayTeam': {'id': 2, 'name': "Visitante", 'crest': None},
+        'score': {'fullTime': {'home': local, 'away': visitante}},
+    }
+
+
+class ActualizarResultadosTests(ServidorAPIFalsoMixin, TestCase):
+
+    def sincronizar(self, partidos_api):
+        self.api.partidos = partidos_api
+        salida = StringIO()
+        call_command('actualizar_resultados', stdout=salida)
+        return salida.getvalue()
+
+    def test_solo_repuntua_partidos_con_cambios(self):
+        salida = self.sincronizar([match_api(1), match_api(2, 1, 0, 'FINISHED')])
+        self.assertIn("Nuevos: 2, Sin cambios: 0, Re-puntuados: 0", salida)
+
+        usuario = User.objects.create(username="ana")
+        empresa = Empresa.objects.create(nombre="Test", codigo_acceso="TEST")
+        PerfilEmpleado.objects.create(usuario=usuario, empresa=empresa)
+        Pronostico.objects.create(usuario=usuario, partido=Partido.objects.get(api_id='1'),
+                                  goles_local_prediccion=2, goles_visitante_prediccion=2)
+
+        # Sin cambios la API responde 304 y no se toca la base
+        salida = self.sincronizar([match_api(1), match_api(2, 1, 0, 'FINISHED')])
+        self.assertIn("Sin cambios en la API", salida)
+
+        # Termina el partido 1
+        salida = self.sincronizar([match_api(1, 2, 2, 'FINISHED'), match_api(2, 1, 0, 'FINISHED')])
+        self.assertIn("Actualizados: 1, Nuevos: 0, Sin cambios: 1, Re-puntuados: 1", salida)
+        self.assertEqual(PerfilEmpleado.objects.get(usuario=usuario).puntos_totales, 3)
+
+    def test_sincroniza_la_competencia_pedida(self):
+        self.api.partidos = [dict(match_api(1), competition={'id': 2000})]
+        salida = StringIO()
+        call_command('actualizar_resultados', '--competicion', '2000', stdout=salida)
+
+        self.assertIn("Nuevos: 1", salida.getvalue())
+        self.assertEqual(self.api.pedidos[-1]['ruta'], '/v4/competitions/2000/matches')
+        self.assertEqual(Partido.objects.get(api_id='1').competicion, '2000')
+
+    def test_sincronizar_temporada_completa_con_pocas_consultas(self):
+        temporada = [match_api(i, matchday=i // 10 + 1) for i in range(380)]
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = sincronizar_partidos(temporada)
+        self.assertEqual(resultado['nuevos'], 380)
+        self.assertLessEqual(len(consultas), 8)  # los INSERT van en lotes
+
+        # Sin cambios: solo la consulta de existentes (ni siquiera abre la transacción)
+        with self.assertNumQueries(1):
+            resultado = sincronizar_partidos(temporada)
+        self.assertEqual(resultado['sin_cambios'], 380)
+
+        for match in temporada[:20]:
+            match.update(status='FINISHED', score={'fullTime': {'home': 1, 'away': 1}})
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = sincronizar_partidos(temporada)
+        self.assertEqual(resultado['actualizados'], 20)
+        self.assertLessEqual(len(consultas), 9)  # +1: los marcadores en vivo van en un solo INSERT
+
+    def test_resultado_y_puntos_se_guardan_juntos(self):
+        sincronizar_partidos([match_api(1)])
+        usuario = User.objects.create(username="ana")
+        PerfilEmpleado.objects.create(usuario=usuario, empresa=Empresa.objects.create(nombre="E", codigo_acceso="E"))
+        Pronostico.objects.create(usuario=usuario, partido=Partido.objects.get(), goles_local_prediccion=1,
+                                  goles_visitante_prediccion=0)
+
+        # Si falla la foto del ranking no queda el resultado nuevo con los puntos viejos
+        with mock.patch('core.importacion.actualizar_historial', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                sincronizar_partidos([match_api(1, 1, 0, 'FINISHED')])
+        self.assertFalse(Partido.objects.get().jugado)
+        self.assertEqual(PerfilEmpleado.objects.get().puntos_totales, 0)
+
+        sincronizar_partidos([match_api(1, 1, 0, 'FINISHED')])
+        self.assertEqual(PerfilEmpleado.objects.get().puntos_totales, 3)
+
+
+class VigilarPartidosTests(ServidorAPIFalsoMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.heartbeat = tempfile.NamedTemporaryFile(delete=False).name
+        self.addCleanup(os.remove, self.heartbeat)
+
+    def vigilar(self):
+        salida = StringIO()
+        call_command('vigilar_partidos', '--una-vez', '--heartbeat', self.heartbeat, stdout=salida)
+        with open(self.heartbeat) as archivo:
+            return archivo.read()
+
+    def test_consulta_solo_partidos_en_juego(self):
+        ahora = timezone.now()
+        Partido.objects.create(api_id='1', equipo_local="A", equipo_visitante="B",
+                               fecha_hora=ahora - timedelta(minutes=30), numero_fecha=1)
+        Partido.objects.create(api_id='2', equipo_local="C", equipo_visitante="D",
+                               fecha_hora=ahora + timedelta(hours=2), numero_fecha=1)
+        Partido.objects.create(api_id='3', equipo_local="E", equipo_visitante="F",
+                               fecha_hora=ahora - timedelta(days=2), numero_fecha=1)
+        self.api.partidos = [match_api(1, 1, 0, 'IN_PLAY')]
+
+        latido = self.vigilar()
+
+        self.assertEqual(len(self.api.pedidos), 1)
+        self.assertEqual(self.api.pedidos[0]['ruta'], '/v4/matches')
+        self.assertEqual(self.api.pedidos[0]['params']['ids'], ['1'])
+        self.assertEqual(Partido.objects.get(api_id='1').goles_local_real, 1)
+        self.assertIn("en_juego=1", latido)
+
+    def test_sin_partidos_duerme_hasta_el_proximo(self):
+        Partido.objects.create(api_id='2', equipo_local="C", equipo_visitante="D",
+                               fecha_hora=timezone.now() + timedelta(minutes=10), numero_fecha=1)
+
+        latido = self.vigilar()
+
+        self.assertEqual(self.api.pedidos, [])
+        self.assertIn("en_juego=0", latido)
+        espera = int(latido.split("proxima_vuelta=")[1].rstrip("s\n"))
+        self.assertTrue(590 <= espera <= 600)
+
+    def test_un_error_no_termina_la_vigilancia(self):
+        from django.db import OperationalError
+
+        from core.management.commands.vigilar_partidos import Command
+
+        errores = [OperationalError("database is locked"), KeyError('matches')]
+
+        def consultar(comando, ahora):
+            if errores:
+                raise errores.pop(0)
+            comando.detener.set()  # Como un SIGTERM
+            return 0
+
+        with mock.patch.object(Command, 'consultar_en_juego', autospec=True, side_effect=consultar), \
+                mock.patch.object(threading.Event, 'wait') as esperar, \
+                self.assertLogs('core.management.commands.vigilar_partidos', 'ERROR') as logs:
+            call_command('vigilar_partidos', '--heartbeat', self.heartbeat, stdout=StringIO())
+
+        # Sigue vigilando después de cada error, esperando cada vez más
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn("database is locked", logs.output[0])
+        self.assertEqual([llamada.args[0] for llamada in esperar.call_args_list][:2], [30, 60])
+
+
+# --- VISTAS ---
+class ProdeVistaTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        empresa = Empresa.objects.create(nombre="Test", codigo_acceso="TEST")
+        self.usuario = User.objects.create(username="ana")
+        PerfilEmpleado.objects.create(usuario=self.usuario, empresa=empresa)
+        self.client.force_login(self.usuario)
+
+    def crear_fecha(self, numero_fecha, cantidad, dias=1):
+        for i in range(cantidad):
+            partido = Partido.objects.create(
+                equipo_local=f"Local {i}", equipo_visitante=f"Visitante {i}",
+                fecha_hora=timezone.now() + timedelta(days=dias, hours=i), numero_fecha=numero_fecha,
+            )
+            Pronostico.objects.create(usuario=self.usuario, partido=partido,
+                                      goles_local_prediccion=i, goles_visitante_prediccion=0)
+
+    def test_get_con_cantidad_fija_de_consultas(self):
+        self.crear_fecha(1, 2, dias=-7)
+        self.crear_fecha(2, 20)
+
+        # sesión + usuario + fechas + calendario + partidos + pronósticos
+        with self.assertNumQueries(6):
+            respuesta = self.client.get('/prode/')
+        self.assertEqual(respuesta.context['fecha_seleccionada'], 2)
+        self.assertEqual(len(respuesta.context['lista_partidos']), 20)
+        self.assertTrue(all(item['mi_pronostico'] for item in respuesta.context['lista_partidos']))
+
+        # Con el fixture en cache solo se consultan mis pronósticos
+        with self.assertNumQueries(3):
+            self.client.get('/prode/')
+
+        with self.assertNumQueries(4):
+            respuesta = self.client.get('/prode/?fecha=1')
+        self.assertEqual(len(respuesta.context['lista_partidos']), 2)
+        self.assertTrue(all(item['bloqueado'] for item in respuesta.context['lista_partidos']))
+
+    def test_cache_del_fixture_se_invalida(self):
+        self.crear_fecha(1, 2)
+        self.client.get('/prode/?fecha=1')
+
+        partido = Partido.objects.filter(numero_fecha=1).first()
+        partido.equipo_local = "Renombrado"
+        partido.save()
+        respuesta = self.client.get('/prode/?fecha=1')
+        self.assertContains(respuesta, "Renombrado")
+
+        # La sincronización usa bulk_update (sin signals) e invalida a mano
+        Partido.objects.create(api_id='99', equipo_local="X", equipo_visitante="Y",
+                               fecha_hora=timezone.now() + timedelta(days=1), numero_fecha=1)
+        self.client.get('/prode/?fecha=1')
+        with self.captureOnCommitCallbacks(execute=True):
+            sincronizar_partidos([match_api(99, matchday=1)])
+        respuesta = self.client.get('/prode/?fecha=1')
+        self.assertContains(respuesta, "Visitante")
+        self.assertNotContains(respuesta, ">Y<")
+
+    @override_settings(CACHES=CACHE_EN_ARCHIVOS)
+    def test_cache_en_archivos(self):
+        cache.clear()
+        self.crear_fecha(1, 3)
+        self.client.get('/prode/?fecha=1')
+        with self.assertNumQueries(3):
+            respuesta = self.client.get('/prode/?fecha=1')
+        self.assertEqual(len(respuesta.context['lista_partidos']), 3)
+
+    def test_cache_local_dura_poco(self):
+        # En memoria otro proceso no puede invalidarla: se guarda solo DURACION_LOCAL
+        self.crear_fecha(1, 3)
+        for caches, esperada in ((CACHE_EN_ARCHIVOS, fixture.DURACION), (None, DURACION_LOCAL)):
+            with override_settings(**({'CACHES': caches} if caches else {})):
+                cache.clear()
+                with mock.patch.object(cache, 'set', wraps=cache.set) as guardar:
+                    self.client.get('/prode/?fecha=1')
+                duraciones = {llamada.args[2] for llamada in guardar.call_args_list if llamada.args[0].startswith('fixture:')}
+                self.assertEqual(duraciones, {esperada})
+
+    def test_post_guarda_en_lote_y_respeta_el_cierre(self):
+        self.crear_fecha(3, 10)
+        partidos = list(Partido.objects.filter(numero_fecha=3).order_by('id'))
+        Pronostico.objects.filter(partido=partidos[0]).delete()
+        Partido.objects.filter(id=partidos[1].id).update(fecha_hora=timezone.now() - timedelta(minutes=1))
+
+        datos = {}
+        for partido in partidos:
+            datos[f'local_{partido.id}'] = 4
+            datos[f'visitante_{partido.id}'] = 4
+
+        # sesión + usuario + fechas + partidos + savepoint + upsert + release
+        with self.assertNumQueries(7):
+            respuesta = self.client.post('/prode/?fecha=3', datos)
+        self.assertRedirects(respuesta, '/prode/?fecha=3', fetch_redirect_response=False)
+
+        guardados = dict(Pronostico.objects.filter(usuario=self.usuario, partido__numero_fecha=3)
+                         .values_list('partido_id', 'goles_local_prediccion'))
+        self.assertEqual(guardados[partidos[0].id], 4)  # creado
+        self.assertEqual(guardados[partidos[1].id], 1)  # ya empezó: no cambia
+        self.assertEqual(guardados[partidos[9].id], 4)  # actualizado
+        self.assertEqual(len(guardados), 10)
+
+    def test_post_bloquea_con_la_base_y_no_con_el_fixture_cacheado(self):
+        self.crear_fecha(4, 2)
+        empieza, juega = Partido.objects.filter(numero_fecha=4).order_by('id')
+        self.client.get('/prode/?fecha=4')  # fixture en cache
+
+        # Otro proceso (cron / admin) cambia la base sin invalidar esta cache
+        Partido.objects.filter(id=empieza.id).update(fecha_hora=timezone.now() - timedelta(minutes=1))
+        Partido.objects.filter(id=juega.id).update(jugado=True)
+        self.client.post('/prode/?fecha=4', {f'local_{empieza.id}': 7, f'visitante_{empieza.id}': 7,
+                                             f'local_{juega.id}': 7, f'visitante_{juega.id}': 7})
+
+        self.assertFalse(Pronostico.objects.filter(usuario=self.usuario, goles_local_prediccion=7).exists())
+
+
+class RankingVistaTests(TestCase):
+
+    def setUp(self):
+        # 7 perfiles: 10, 8, 8, 8, 5, 5, 0 puntos
+        crear_empleados(Empresa.objects.create(nombre="Test", codigo_acceso="TEST"), [8, 10, 5, 8, 0, 8, 5])
+
+    def recorrer(self, tamanio):
+        posiciones = []
+        cursor = None
+        while True:
+            perfiles, cursor = pagina_ranking(PerfilEmpleado.objects.all(), cursor, tamanio)
+            posiciones += [(p.puntos_totales, p.posicion) for p in perfiles]
+            if not cursor:
+                return posiciones
+
+    def test_posiciones_compartidas_entre_paginas(self):
+        esperado = [(10, 1), (8, 2), (8, 2), (8, 2), (5, 5), (5, 5), (0, 7)]
+        for tamanio in (1, 2, 3, 50):
+            self.assertEqual(self.recorrer(tamanio), esperado)
+
+    def test_pagina_con_pocas_consultas(self):
+        with self.assertNumQueries(1):
+            respuesta = self.client.get('/ranking/')
+        self.assertEqual(respuesta.context['perfiles'][0].posicion, 1)
+        self.assertContains(respuesta, "user1")
+
+        # Cualquier página: la posición sale en la misma consulta (RANK() sobre la página)
+        _, cursor = pagina_ranking(PerfilEmpleado.objects.all(), None, 2)
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(f'/ranking/?despues={cursor}')
+        self.assertEqual([p.posicion for p in respuesta.context['perfiles']], [2, 2, 5, 5, 7])
+
+        # Con sesión: la de la sesión, la del usuario, la página y "mi posición"
+        self.client.force_login(User.objects.get(username="user4"))
+        with self.assertNumQueries(4):
+            respuesta = self.client.get(f'/ranking/?despues={cursor}')
+        self.assertEqual([p.posicion for p in respuesta.context['mi_zona']], [2, 5, 5, 7])
+
+    def test_alrededor_coincide_con_la_tabla(self):
+        tabla = [(p.id, p.posicion) for p in pagina_ranking(PerfilEmpleado.objects.all(), None, 50)[0]]
+        for i, (id_perfil, posicion) in enumerate(tabla):
+            perfil = PerfilEmpleado.objects.get(id=id_perfil)
+            with self.assertNumQueries(1):
+                filas = alrededor(PerfilEmpleado.objects.all(), perfil, 2)
+            self.assertEqual([(p.id, p.posicion) for p in filas], tabla[max(0, i - 2):i + 3])
+            self.assertEqual(perfil.posicion, posicion)
+
+    def test_alrededor_por_empresa_y_torneo(self):
+        otra = Empresa.objects.create(nombre="Otra", codigo_acceso="OTRA")
+        yo = PerfilEmpleado.objects.get(usuario__username="user6")  # 5 puntos
+        PerfilEmpleado.objects.filter(usuario__username__in=["user1", "user6"]).update(empresa=otra)
+
+        torneo = Torneo.objects.create(nombre="Amigos", creador=yo.usuario)
+        torneo.participantes.add(yo.usuario, User.objects.get(username="user0"), User.objects.get(username="user4"))
+
+        self.client.force_login(yo.usuario)
+        global_ = self.client.get('/ranking/alrededor/?n=1').json()
+        empresa = self.client.get(f'/ranking/alrededor/?empresa={otra.id}').json()
+        del_torneo = self.client.get(f'/ranking/alrededor/?torneo={torneo.id}').json()
+
+        self.assertEqual(global_['posicion'], 5)
+        self.assertEqual(len(global_['filas']), 3)
+        self.assertEqual([(f['usuario'], f['posicion']) for f in empresa['filas']], [("user1", 1), ("user6", 2)])
+        self.assertEqual(
+            [(f['posicion'], f['puntos'], f['soy_yo']) for f in del_torneo['filas']],
+            [(1, 8, False), (2, 5, True), (3, 0, False)],
+        )
+
+        # Tablas ajenas: no
+        otro_torneo = Torneo.objects.create(nombre="Ajeno", creador=yo.usuario)
+        self.assertEqual(self.client.get(f'/ranking/alrededor/?torneo={otro_torneo.id}').status_code, 404)
+        self.assertEqual(self.client.get(f'/ranking/alrededor/?empresa={otra.id + 1}').status_code, 404)
+
+    def test_widget_mi_posicion(self):
+        self.client.force_login(User.objects.get(username="user4"))  # último, 0 puntos
+        respuesta = self.client.get('/ranking/')
+        self.assertEqual([p.posicion for p in respuesta.context['mi_zona']], [2, 5, 5, 7])
+        self.assertContains(respuesta, "Mi posición")
+
+
+# --- RANKING POR EMPRESA ---
+class EmpresaRankingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.empresas = [
+            Empresa.objects.create(nombre="Acme", codigo_acceso="ACME"),
+            Empresa.objects.create(nombre="Globex", codigo_acceso="GLOBEX"),
+        ]
+        self.usuarios = crear_empleados(self.empresas, [0] * 8)
+
+    def totales_guardados(self):
+        return {e.nombre: (e.puntos_totales, e.cantidad_empleados) for e in Empresa.objects.all()}
+
+    def totales_reales(self):
+        return {
+            e.nombre: (
+                PerfilEmpleado.objects.filter(empresa=e).aggregate(t=Sum('puntos_totales'))['t'] or 0,
+                PerfilEmpleado.objects.filter(empresa=e).count(),
+            )
+            for e in Empresa.objects.all()
+        }
+
+    def test_totales_incrementales(self):
+        self.assertEqual(self.totales_guardados(), {"Acme": (0, 4), "Globex": (0, 4)})
+
+        rnd = random.Random(15)
+        partidos = []
+        for n in range(4):
+            partido = Partido.objects.create(equipo_local="L", equipo_visitante="V", numero_fecha=n + 1,
+                                             fecha_hora=timezone.now() - timedelta(days=1))
+            for usuario in self.usuarios:
+                Pronostico.objects.create(usuario=usuario, partido=partido,
+                                          goles_local_prediccion=rnd.randint(0, 2),
+                                          goles_visitante_prediccion=rnd.randint(0, 2))
+            partidos.append(partido)
+
+        for _ in range(3):
+            for partido in partidos:
+                partido.goles_local_real = rnd.randint(0, 2)
+                partido.goles_visitante_real = rnd.randint(0, 2)
+                partido.jugado = True
+                partido.save()
+                self.assertEqual(self.totales_guardados(), self.totales_reales())
+
+        PerfilEmpleado.objects.get(usuario=self.usuarios[0]).delete()
+        self.assertEqual(self.totales_guardados(), self.totales_reales())
+
+        # Una diferencia cargada a mano la detecta y corrige verificar_ranking
+        Empresa.objects.filter(nombre="Globex").update(puntos_totales=999)
+        salida = StringIO()
+        call_command('verificar_ranking', stdout=salida)
+        self.assertIn("Globex", salida.getvalue())
+        call_command('verificar_ranking', '--corregir', stdout=StringIO())
+        self.assertEqual(self.totales_guardados(), self.totales_reales())
+
+    def test_tabla_de_empresa_cacheada(self):
+        acme = self.empresas[0]
+        PerfilEmpleado.objects.filter(usuario=self.usuarios[2]).update(puntos_totales=5)
+
+        self.client.get(f'/empresas/{acme.id}/')
+        with self.assertNumQueries(1):  # solo la Empresa: la tabla sale de la cache
+            respuesta = self.client.get(f'/empresas/{acme.id}/')
+        self.assertEqual(
+            [(p.usuario.username, p.posicion) for p in respuesta.context['perfiles']],
+            [("user2", 1), ("user0", 2), ("user4", 2), ("user6", 2)],
+        )
+
+        # Cambian los puntos de un empleado de Acme: la tabla se vuelve a calcular
+        partido = Partido.objects.create(equipo_local="L", equipo_visitante="V", numero_fecha=1,
+                                         fecha_hora=timezone.now() - timedelta(days=1))
+        Pronostico.objects.create(usuario=self.usuarios[6], partido=partido,
+                                  goles_local_prediccion=3, goles_visitante_prediccion=0)
+        partido.goles_local_real, partido.goles_visitante_real, partido.jugado = 3, 0, True
+        with self.captureOnCommitCallbacks(execute=True):  # las versiones se incrementan al confirmar
+            partido.save()
+
+        respuesta = self.client.get(f'/empresas/{acme.id}/')
+        self.assertEqual(respuesta.context['perfiles'][1].usuario.username, "user6")
+
+        # El update() a mano de user2 no pasa por el motor de puntos: Acme solo suma los 3 de user6
+        respuesta = self.client.get('/empresas/')
+        self.assertEqual([e.nombre for e in respuesta.context['empresas']], ["Acme", "Globex"])
+        self.assertEqual(respuesta.context['empresas'][0].promedio_puntos, 0.75)
+
+
+# --- TORNEOS ---
+class TorneoVistasTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        empresa = Empresa.objects.create(nombre="Test", codigo_acceso="TEST")
+        self.usuarios = crear_empleados(empresa, [3, 9, 6, 6, 0])
+        self.yo = self.usuarios[0]
+        self.client.force_login(self.yo)
+
+    def crear_torneo(self, nombre, participantes):
+        torneo = Torneo.objects.create(nombre=nombre, creador=participantes[0])
+        torneo.participantes.add(*participantes)
+        return torneo
+
+    def test_mis_torneos_con_cantidades_y_posicion(self):
+        self.crear_torneo("A", [self.yo, self.usuarios[4]])
+        self.crear_torneo("B", [self.yo, self.usuarios[1], self.usuarios[2], self.usuarios[3]])
+        self.crear_torneo("Ajeno", [self.usuarios[1]])
+
+        # sesión + usuario + torneos (con los conteos)
+        with self.assertNumQueries(3):
+            respuesta = self.client.get('/torneos/')
+        self.assertEqual(
+            [(t.nombre, t.cantidad_participantes, t.mi_posicion) for t in respuesta.context['mis_grupos']],
+            [("A", 2, 1), ("B", 4, 4)],
+        )
+
+    def test_tabla_cacheada_se_invalida_al_unirse_y_al_puntuar(self):
+        torneo = self.crear_torneo("Amigos", [self.yo, self.usuarios[1]])
+        self.client.get(f'/torneos/{torneo.id}/')
+
+        # sesión + usuario + torneo + pertenencia: la tabla sale de la cache
+        with self.assertNumQueries(4):
+            respuesta = self.client.get(f'/torneos/{torneo.id}/')
+        self.assertEqual([p.usuario.username for p in respuesta.context['perfiles']], ["user1", "user0"])
+
+        # Se une alguien con el código
+        otro = Client()
+        otro.force_login(self.usuarios[2])
+        otro.post('/torneos/', {'unirse_torneo': 'true', 'codigo_torneo': torneo.codigo})
+        respuesta = self.client.get(f'/torneos/{torneo.id}/')
+        self.assertEqual([p.usuario.username for p in respuesta.context['perfiles']], ["user1", "user2", "user0"])
+
+        # Suma puntos un participante
+        partido = Partido.objects.create(equipo_local="L", equipo_visitante="V", numero_fecha=1,
+                                         fecha_hora=timezone.now() - timedelta(days=1))
+        Pronostico.objects.create(usuario=self.yo, partido=partido,
+                                  goles_local_prediccion=1, goles_visitante_prediccion=0)
+        partido.goles_local_real, partido.goles_visitante_real, partido.jugado = 1, 0, True
+        with self.captureOnCommitCallbacks(execute=True):
+            partido.save()
+        respuesta = self.client.get(f'/torneos/{torneo.id}/')
+        self.assertEqual(
+            [(p.usuario.username, p.posicion) for p in respuesta.context['perfiles']],
+            [("user1", 1), ("user0", 2), ("user2", 2)],
+        )
+
+        # Quien no participa vuelve a su lista
+        ajeno = Client()
+        ajeno.force_login(self.usuarios[4])
+        self.assertRedirects(ajeno.get(f'/torneos/{torneo.id}/'), '/torneos/')
+
+
+# --- HISTORIAL DEL RANKING ---
+class HistorialRankingTests(TestCase):
+
+    def setUp(self):
+        self.usuarios = crear_empleados(Empresa.objects.create(nombre="Test", codigo_acceso="TEST"), [0] * 6)
+
+        # 3 fechas de 2 partidos, todos con pronósticos
+        rnd = random.Random(14)
+        self.partidos = []
+        for numero_fecha in (1, 2, 3):
+            for _ in range(2):
+                partido = Partido.objects.create(
+                    equipo_local="Local", equipo_visitante="Visitante",
+                    fecha_hora=timezone.now() - timedelta(days=1), numero_fecha=numero_fecha,
+                )
+                for usuario in self.usuarios:
+                    Pronostico.objects.create(usuario=usuario, partido=partido,
+                                              goles_local_prediccion=rnd.randint(0, 2),
+                                              goles_visitante_prediccion=rnd.randint(0, 2))
+                self.partidos.append(partido)
+        self.rnd = rnd
+
+    def jugar(self, partido):
+        partido.goles_local_real = self.rnd.randint(0, 2)
+        partido.goles_visitante_real = self.rnd.randint(0, 2)
+        partido.jugado = True
+        partido.save()
+
+    def fotos(self):
+        return {
+            (usuario_id, numero_fecha): (puntos, posicion)
+            for usuario_id, numero_fecha, puntos, posicion in SnapshotRanking.objects.values_list(
+                'usuario_id', 'numero_fecha', 'puntos', 'posicion'
+            )
+        }
+
+    def fotos_esperadas(self, fechas):
+        esperado = {}
+        for numero_fecha in fechas:
+            puntos = {
+                usuario.id: Pronostico.objects.filter(
+                    usuario=usuario, partido__numero_fecha__lte=numero_fecha
+                ).aggregate(t=Sum('puntos_ganados'))['t'] or 0
+                for usuario in self.usuarios
+            }
+            for usuario_id, total in puntos.items():
+                mejores = sum(1 for otro in puntos.values() if otro > total)
+                esperado[(usuario_id, numero_fecha)] = (total, mejores + 1)
+        return esperado
+
+    def test_foto_al_completar_cada_fecha(self):
+        self.jugar(self.partidos[0])
+        self.assertEqual(self.fotos(), {})  # la fecha 1 todavía no terminó
+
+        self.jugar(self.partidos[1])
+        self.assertEqual(self.fotos(), self.fotos_esperadas([1]))
+
+        # La fecha 3 termina antes que la 2: se arma sobre la foto de la fecha 1
+        self.jugar(self.partidos[4])
+        self.jugar(self.partidos[5])
+        self.jugar(self.partidos[2])
+        self.assertEqual(self.fotos(), self.fotos_esperadas([1]) | {
+            clave: valor for clave, valor in self.fotos_esperadas([3]).items()
+            if clave[1] == 3
+        })
+
+        # Se completa la fecha 2: se guarda y se corrige la 3
+        self.jugar(self.partidos[3])
+        self.assertEqual(self.fotos(), self.fotos_esperadas([1, 2, 3]))
+
+        # Corregir un resultado de la fecha 1 corrige todas las fotos siguientes
+        self.jugar(self.partidos[0])
+        self.assertEqual(self.fotos(), self.fotos_esperadas([1, 2, 3]))
+
+        # Desmarcar un partido borra la foto de esa fecha
+        self.partidos[3].jugado = False
+        self.partidos[3].save()
+        self.assertFalse(SnapshotRanking.objects.filter(numero_fecha=2).exists())
+        self.assertEqual(SnapshotRanking.objects.filter(numero_fecha=3).count(), 6)
+
+    def test_flechas_e_historial_en_la_vista(self):
+        for partido in self.partidos[:2]:
+            self.jugar(partido)
+        # Después de la fecha 1, user5 suma puntos y pasa a liderar
+        PerfilEmpleado.objects.filter(usuario=self.usuarios[5]).update(puntos_totales=100)
+        anterior = SnapshotRanking.objects.get(usuario=self.usuarios[5], numero_fecha=1).posicion
+
+        with self.assertNumQueries(1):
+            respuesta = self.client.get('/ranking/')
+        lider = respuesta.context['perfiles'][0]
+        self.assertEqual(lider.usuario, self.usuarios[5])
+        self.assertEqual(lider.subio, anterior - 1)
+
+        self.client.force_login(self.usuarios[0])
+        historial = self.client.get('/ranking/historial/?usuario=user5').json()
+        self.assertEqual(historial['fechas'], [{'fecha': 1, 'puntos': SnapshotRanking.objects.get(
+            usuario=self.usuarios[5], numero_fecha=1).puntos, 'posicion': anterior}])
+
+
+# --- PLANES DE CONSULTA (índices) ---
+class PlanesDeConsultaTests(TestCase):
+    """
+    Corre los caminos calientes (vistas, signal de puntos, calcular_puntos,
+    sincronización, vigilar_partidos), captura cada consulta y le pide a
+    SQLite su EXPLAIN QUERY PLAN: ninguna puede recorrer entera una tabla
+    de la app ("SCAN core_..." sin índice). En las tablas de posiciones,
+    además, el orden tiene que salir del índice (sin ordenar en memoria).
+    """
+
+    def setUp(self):
+        cache.clear()
+        ahora = timezone.now()
+        empresa = Empresa.objects.create(nombre="Test", codigo_acceso="TEST")
+        self.usuarios = crear_empleados(empresa, [i % 7 for i in range(20)])
+        self.torneo = Torneo.objects.create(nombre="Amigos", creador=self.usuarios[0])
+        self.torneo.participantes.add(*self.usuarios[:5])
+
+        for n in range(1, 4):
+            for j in range(3):
+                partido = Partido.objects.create(
+                    api_id=f"{n}{j}", equipo_local="L", equipo_visitante="V", numero_fecha=n,
+                    fecha_hora=ahora + timedelta(days=n - 2, hours=j),
+                )
+                Pronostico.objects.bulk_create([
+                    Pronostico(usuario=u, partido=partido, goles_local_prediccion=1, goles_visitante_prediccion=0)
+                    for u in self.usuarios
+                ])
+        self.client.force_login(self.usuarios[0])
+
+    def assertSinScans(self, funcion, ordenado_por_indice=False):
+        with CaptureQueriesContext(connection) as consultas:
+            funcion()
+
+        for consulta in consultas.captured_queries:
+            sql = consulta['sql']
+            if not sql.lstrip().startswith(('SELECT', 'UPDATE', 'DELETE')):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [fila[-1] for fila in cursor.fetchall()]
+            for paso in plan:
+                tabla = paso.split()[1] if paso.startswith('SCAN ') else ''
+                if tabla.startswith('core_') and 'INDEX' not in paso:
+                    self.fail(f"{paso}\n{sql}")
+                # Páginas (LIMIT > 1) de perfiles ordenadas en memoria
+                pagina = re.search(r'FROM "core_perfilempleado".* LIMIT (\d+)$', sql)
+                if ordenado_por_indice and pagina and int(pagina.group(1)) > 1 and paso.startswith('USE TEMP B-TREE'):
+                    self.fail(f"{paso}\n{sql}")
+
+    def test_vistas(self):
+        torneo = self.torneo.id
+        empresa = Empresa.objects.get().id
+        _, cursor = pagina_ranking(PerfilEmpleado.objects.all(), None, 5)
+        self.assertSinScans(lambda: self.client.get('/prode/'))
+        self.assertSinScans(lambda: self.client.get('/prode/?fecha=3'))
+        self.assertSinScans(lambda: self.client.post('/prode/?fecha=3', {}))
+        self.assertSinScans(lambda: self.client.get('/ranking/'), ordenado_por_indice=True)
+        self.assertSinScans(lambda: self.client.get(f'/ranking/?despues={cursor}'), ordenado_por_indice=True)
+        self.assertSinScans(lambda: self.client.get('/ranking/alrededor/'), ordenado_por_indice=True)
+        self.assertSinScans(lambda: self.client.get(f'/ranking/alrededor/?empresa={empresa}&torneo={torneo}'))
+        self.assertSinScans(lambda: self.client.get('/ranking/historial/'))
+        self.assertSinScans(lambda: self.client.get(f'/empresas/{empresa}/'), ordenado_por_indice=True)
+        self.assertSinScans(lambda: self.client.get('/torneos/'))
+        self.assertSinScans(lambda: self.client.get(f'/torneos/{torneo}/'))
+
+    def test_signal_de_puntos(self):
+        for partido in Partido.objects.filter(numero_fecha=1):
+            partido.goles_local_real, partido.goles_visitante_real, partido.jugado = 1, 0, True
+            self.assertSinScans(partido.save)
+
+    def test_calcular_puntos_parcial(self):
+        from calcular_puntos import calcular_puntos
+
+        Partido.objects.filter(numero_fecha=1).update(jugado=True, goles_local_real=2, goles_visitante_real=0)
+        with mock.patch('builtins.print'):
+            self.assertSinScans(lambda: calcular_puntos(fecha=1))
+            self.assertSinScans(lambda: calcular_puntos(since=timezone.now()))
+
+    def test_sincronizacion_y_vigilancia(self):
+        from core.management.commands.vigilar_partidos import Command
+
+        partidos_api = [match_api(f"1{j}", 1, 0, 'FINISHED', matchday=1) for j in range(3)]
+        self.assertSinScans(lambda: sincronizar_partidos(partidos_api))
+
+        vigilancia = Command()
+        vigilancia.duracion = timedelta(minutes=150)
+        vigilancia.finalizados = {f"2{j}" for j in range(3)}
+        ahora = timezone.now()
+        self.assertSinScans(lambda: vigilancia.consultar_en_juego(ahora))
+        self.assertSinScans(lambda: vigilancia.segundos_hasta_proximo_partido(ahora, 3600))
+
+
+# --- DATOS SINTÉTICOS Y BENCHMARKS ---
+class GenerarDatosYBenchmarkTests(TestCase):
+
+    def generar(self, *extra):
+        call_command(
+            'generar_datos', '--empresas', '3', '--usuarios', '25', '--fechas', '4',
+            '--partidos-por-fecha', '3', '--torneos', '3', '--participantes', '5', *extra,
+            stdout=StringIO(),
+        )
+
+    def huella(self):
+        filas = Pronostico.objects.order_by('usuario__username', 'partido__api_id').values_list(
+            'usuario__username', 'partido__api_id', 'goles_local_prediccion', 'goles_visitante_prediccion',
+            'puntos_ganados',
+        )
+        return hashlib.sha256(repr(list(filas)).encode()).hexdigest()
+
+    def test_mundo_reproducible_y_consistente(self):
+        self.generar()
+        huella = self.huella()
+        self.assertEqual(Partido.objects.filter(jugado=True).count(), 6)
+        self.assertEqual(Torneo.objects.count(), 3)
+
+        # Totales, empresas e historial quedan como si se hubiera jugado de verdad
+        salida = StringIO()
+        call_command('verificar_ranking', stdout=salida)
+        self.assertIn("consistente", salida.getvalue())
+        self.assertEqual(SnapshotRanking.objects.filter(numero_fecha=2).count(), 25)
+
+        self.generar('--limpiar')
+        self.assertEqual(self.huella(), huella)
+        self.assertEqual(PerfilEmpleado.objects.count(), 25)
+
+    def test_benchmark_guarda_resultados(self):
+        self.generar()
+        with tempfile.TemporaryDirectory() as carpeta:
+            call_command(
+                'benchmark', '--repeticiones', '1', '--salida', carpeta,
+                '--payload', os.path.join(carpeta, 'payload.json'), stdout=StringIO(),
+            )
+            archivos = [f for f in os.listdir(carpeta) if f != 'payload.json']
+            with open(os.path.join(carpeta, archivos[0])) as entrada:
+                resultado = json.load(entrada)
+
+        self.assertEqual(resultado['datos']['usuarios'], 25)
+        escenarios = resultado['escenarios']
+        for nombre in ('senal_puntuar_partido', 'calcular_puntos_completo', 'sincronizar_api',
+                       'vista_prode', 'vista_ranking', 'vista_detalle_torneo'):
+            self.assertGreater(escenarios[nombre]['consultas'], 0)
+            self.assertGreater(escenarios[nombre]['memoria_pico_kb'], 0)
+        # Con la cache caliente el prode no vuelve a leer los partidos
+        self.assertLess(escenarios['vista_prode']['consultas'], escenarios['vista_prode_cache_fria']['consultas'])
+
+
+# --- MÉTRICAS POR VISTA ---
+@override_settings(PRODE_METRICAS=True, PRODE_METRICAS_UMBRAL_MS=10000)
+class MetricasTests(TestCase):
+
+    def setUp(self):
+        metricas.reiniciar()
+        self.addCleanup(metricas.reiniciar)
+        self.admin = User.objects.create(username="admin", is_staff=True)
+        usuario = User.objects.create(username="jugador")
+        PerfilEmpleado.objects.create(usuario=usuario, empresa=Empresa.objects.create(nombre="E", codigo_acceso="E"))
+        self.cliente = Client()
+        self.cliente.force_login(usuario)
+
+    def test_apagado_no_se_engancha(self):
+        with override_settings(PRODE_METRICAS=False):
+            with self.assertRaises(MiddlewareNotUsed):
+                metricas.MetricasMiddleware(lambda request: None)
+
+    def test_registra_percentiles_y_consultas_por_vista(self):
+        for _ in range(5):
+            self.cliente.get('/ranking/')
+
+        staff = Client()
+        staff.force_login(self.admin)
+        datos = staff.get('/metricas/').json()
+
+        ranking = datos['vistas']['ranking']
+        self.assertEqual(ranking['pedidos'], 5)
+        self.assertGreater(ranking['consultas_promedio'], 0)
+        self.assertLessEqual(ranking['p50_ms'], ranking['p95_ms'])
+        self.assertLessEqual(ranking['p95_ms'], ranking['p99_ms'])
+        self.assertIn('SELECT', ranking['consulta_mas_lenta'])
+
+    def test_solo_staff(self):
+        respuesta = self.cliente.get('/metricas/')
+        self.assertEqual(respuesta.status_code, 302)
+
+    @override_settings(PRODE_METRICAS_UMBRAL_MS=0)
+    def test_loguea_pedidos_lentos(self):
+        with self.assertLogs('core.metricas', 'WARNING') as logs:
+            self.cliente.get('/ranking/')
+        self.assertIn("Pedido lento: GET /ranking/ (ranking)", logs.output[0])
+
+    def test_streaming_se_mide_hasta_terminar_el_cuerpo(self):
+        staff = Client()
+        staff.force_login(self.admin)
+        respuesta = staff.get('/exportar/ranking/')
+        self.assertTrue(respuesta.streaming)
+        self.assertNotIn('exportar', metricas.resumen())  # Todavía no se mandó el cuerpo
+
+        b''.join(respuesta.streaming_content)
+        exportar = metricas.resumen()['exportar']
+        self.assertEqual(exportar['pedidos'], 1)
+        self.assertIn('core_perfilempleado', exportar['consulta_mas_lenta'])
+
+
+# --- SQLITE CON VARIOS PROCESOS ---
+class SqliteConcurrenciaTests(TransactionTestCase):
+
+    def test_conexion_nueva_aplica_los_pragmas(self):
+        from django.db.backends.sqlite3.base import DatabaseWrapper
+
+        with tempfile.TemporaryDirectory() as carpeta:
+            otra = DatabaseWrapper(
+                {**connection.settings_dict, 'NAME': os.path.join(carpeta, 'prueba.sqlite3')}, alias='prueba'
+            )
+            try:
+                cursor = otra.cursor()
+                valores = {
+                    pragma: cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+                    for pragma in ('journal_mode', 'busy_timeout', 'synchronous', 'cache_size')
+                }
+            finally:
+                otra.close()
+
+        self.assertEqual(valores['journal_mode'], 'wal')
+        self.assertEqual(valores['busy_timeout'], 20000)
+        self.assertEqual(valores['synchronous'], 1)  # NORMAL
+        self.assertEqual(valores['cache_size'], -20000)
+
+    def test_transacciones_de_escritura_empiezan_escribiendo(self):
+        # Una transacción que empieza con un SELECT toma primero un lock de
+        # lectura y después tiene que "subirlo" a escritura: ahí es donde
+        # SQLite devuelve "database is locked" sin esperar el busy_timeout.
+        from .management.commands.benchmark import match_de_partido
+
+        empresa = Empresa.objects.create(nombre="E", codigo_acceso="E")
+        partido = Partido.objects.create(
+            api_id='1', equipo_local="A", equipo_visitante="B", numero_fecha=1,
+            fecha_hora=timezone.now() - timedelta(hours=3),
+        )
+        for i, usuario in enumerate(crear_empleados(empresa, [0] * 3)):
+            Pronostico.objects.create(usuario=usuario, partido=partido, goles_local_prediccion=i,
+                                      goles_visitante_prediccion=0)
+
+        partido.jugado, partido.goles_local_real, partido.goles_visitante_real = True, 1, 0
+        with CaptureQueriesContext(connection) as capturadas:
+            sincronizar_partidos([match_de_partido(partido)])
+
+        sql = [q['sql'] for q in capturadas.captured_queries]
+        inicios = [i for i, sentencia in enumerate(sql) if sentencia == 'BEGIN']
+        self.assertEqual(len(inicios), 1)  # partidos, puntos e historial van juntos
+        for i in inicios:
+            self.assertFalse(sql[i + 1].startswith('SELECT'), sql[i + 1])
+        self.assertEqual(PerfilEmpleado.objects.get(usuario__username="user1").puntos_totales, 3)
+
+
+# --- RESULTADOS EN VIVO ---
+class ClienteSSEFalso:
+    """Hace de servidor ASGI para una conexión: junta lo que se manda y avisa cuando se desconecta."""
+
+    def __init__(self, app, metodo='GET', ruta='/eventos/'):
+        self.app = app
+        self.scope = {'type': 'http', 'method': metodo, 'path': ruta}
+        self.entrantes = asyncio.Queue()
+        self.enviados = []
+
+    async def receive(self):
+        return await self.entrantes.get()
+
+    async def send(self, mensaje):
+        self.enviados.append(mensaje)
+
+    async def correr(self):
+        await self.app(self.scope, self.receive, self.send)
+
+    def desconectar(self):
+        self.entrantes.put_nowait({'type': 'http.disconnect'})
+
+    @property
+    def cuerpo(self):
+        return b''.join(m.get('body', b'') for m in self.enviados if m['type'] == 'http.response.body')
+
+
+@override_settings(PRODE_EN_VIVO_INTERVALO=0.02)
+class ResultadosEnVivoTests(TestCase):
+
+    def setUp(self):
+        empresa = Empresa.objects.create(nombre="Test", codigo_acceso="TEST")
+        self.partido = Partido.objects.create(
+            api_id='1', equipo_local="A", equipo_visitante="B", numero_fecha=1,
+            fecha_hora=timezone.now() - timedelta(hours=3),
+        )
+        self.perfiles = []
+        for i, usuario in enumerate(crear_empleados(empresa, [0] * 3)):
+            self.perfiles.append(usuario.perfilempleado)
+            Pronostico.objects.create(usuario=usuario, partido=self.partido, goles_local_prediccion=i,
+                                      goles_visitante_prediccion=0)
+
+    def test_puntuar_publica_marcador_y_puntos_que_cambiaron(self):
+        from .models import EventoEnVivo
+
+        self.partido.jugado, self.partido.goles_local_real, self.partido.goles_visitante_real = True, 1, 0
+        self.partido.save()
+
+        datos = EventoEnVivo.objects.latest('id').datos
+        self.assertEqual(datos['partido'], {'id': self.partido.id, 'numero_fecha': 1, 'jugado': True,
+                                            'goles_local': 1, 'goles_visitante': 0})
+        # user0 (0-0) no suma: no cambió
+        self.assertEqual(sorted(datos['ranking']), [[self.perfiles[1].id, 3], [self.perfiles[2].id, 1]])
+
+    def test_sin_pronosticos_que_cambien_no_publica_puntos(self):
+        from .models import EventoEnVivo
+
+        self.partido.jugado, self.partido.goles_local_real, self.partido.goles_visitante_real = True, 3, 0
+        self.partido.save()
+        ultimo = EventoEnVivo.objects.latest('id').id
+
+        # Volver a puntuar sin cambios no publica nada
+        puntuar_partido(self.partido)
+        self.assertEqual(EventoEnVivo.objects.latest('id').id, ultimo)
+
+        # 3-0 -> 4-0: nadie cambia de puntaje, pero el marcador nuevo se publica solo
+        self.partido.goles_local_real = 4
+        self.partido.save()
+        datos = EventoEnVivo.objects.latest('id').datos
+        self.assertEqual((datos['partido']['goles_local'], datos['ranking']), (4, []))
+
+    def test_sincronizar_publica_partidos_sin_pronosticos(self):
+        from .management.commands.benchmark import match_de_partido
+        from .models import EventoEnVivo
+
+        sin_pronosticos = Partido.objects.create(
+            api_id='2', equipo_local="C", equipo_visitante="D", numero_fecha=1,
+            fecha_hora=timezone.now() - timedelta(hours=3),
+        )
+        sin_pronosticos.jugado, sin_pronosticos.goles_local_real, sin_pronosticos.goles_visitante_real = True, 2, 2
+        sincronizar_partidos([match_de_partido(sin_pronosticos)])
+
+        datos = EventoEnVivo.objects.get().datos
+        self.assertEqual((datos['partido']['id'], datos['partido']['goles_local']), (sin_pronosticos.id, 2))
+        self.assertEqual(datos['ranking'], [])
+
+    def test_recorta_los_eventos_viejos(self):
+        from . import en_vivo
+        from .models import EventoEnVivo
+
+        with mock.patch.object(en_vivo, 'CONSERVAR', 5), mock.patch.object(en_vivo, 'RECORTAR_CADA', 4):
+            for _ in range(3):
+                en_vivo.publicar_resultados([self.partido] * 4)
+        # Quedan los últimos (a lo sumo CONSERVAR + RECORTAR_CADA), sin huecos
+        ids = list(EventoEnVivo.objects.order_by('id').values_list('id', flat=True))
+        self.assertLessEqual(len(ids), 5 + 4)
+        self.assertEqual(ids, list(range(ids[-1] - len(ids) + 1, ids[-1] + 1)))
+
+    def test_una_consulta_por_vuelta_para_todos_los_clientes(self):
+        from asgiref.sync import async_to_sync, sync_to_async
+
+        from . import en_vivo
+
+        app = en_vivo.AplicacionEventos(django=None)
+        clientes = [ClienteSSEFalso(app) for _ in range(10)]
+        evento = 'event: resultado'
+
+        async def escenario():
+            tareas = [asyncio.ensure_future(cliente.correr()) for cliente in clientes]
+            await asyncio.sleep(0.05)
+            inicio = time.monotonic()
+            await sync_to_async(en_vivo.publicar_resultado)(self.partido, [(self.perfiles[0].id, 3)])
+            for _ in range(200):
+                if all(evento.encode() in cliente.cuerpo for cliente in clientes):
+                    break
+                await asyncio.sleep(0.01)
+            duracion = time.monotonic() - inicio
+            for cliente in clientes:
+                cliente.desconectar()
+            await asyncio.gather(*tareas)
+            return duracion
+
+        with mock.patch.object(en_vivo, '_eventos_desde', wraps=en_vivo._eventos_desde) as eventos_desde:
+            duracion = async_to_sync(escenario)()
+
+        for cliente in clientes:
+            self.assertEqual(cliente.enviados[0]['status'], 200)
+            self.assertIn((b'content-type', b'text/event-stream'), cliente.enviados[0]['headers'])
+            mensaje = cliente.cuerpo.decode().split('\n\n')[1]
+            self.assertIn(evento, mensaje)
+            datos = json.loads(mensaje.split('data: ')[1])
+            self.assertEqual(datos['ranking'], [[self.perfiles[0].id, 3]])
+        # Una lectura por intervalo (más margen), no una por cliente
+        self.assertLessEqual(eventos_desde.call_count, (0.05 + duracion) / 0.02 + 3)
+        self.assertEqual(app.publicador.suscriptores, set())
+
+    def test_cliente_lento_se_desconecta(self):
+        from asgiref.sync import async_to_sync
+
+        from . import en_vivo
+
+        async def escenario():
+            publicador = en_vivo.Publicador()
+            with mock.patch.object(en_vivo, 'PENDIENTES_MAXIMOS', 2):
+                cola = publicador.suscribir()
+            for i in range(3):
+                publicador.repartir(f"mensaje {i}".encode())
+            publicador.tarea.cancel()
+            return publicador, [cola.get_nowait() for _ in range(cola.qsize())]
+
+        publicador, pendientes = async_to_sync(escenario)()
+        self.assertEqual(pendientes, [None])
+        self.assertEqual(publicador.suscriptores, set())
+
+    def test_otras_rutas_y_metodos(self):
+        from asgiref.sync import async_to_sync
+
+        from . import en_vivo
+
+        llamadas = []
+
+        async def django(scope, receive, send):
+            llamadas.append(scope['path'])
+
+        app = en_vivo.AplicacionEventos(django)
+        post = ClienteSSEFalso(app, metodo='POST')
+        otra = ClienteSSEFalso(app, ruta='/ranking/')
+        async_to_sync(post.correr)()
+        async_to_sync(otra.correr)()
+
+        self.assertEqual(post.enviados[0]['status'], 405)
+        self.assertEqual(llamadas, ['/ranking/'])
+
+    def test_paginas_se_conectan_solo_si_esta_activo(self):
+        self.assertNotContains(self.client.get('/'), 'EventSource')
+        with override_settings(PRODE_EN_VIVO=True):
+            self.assertContains(self.client.get('/'), 'new EventSource("/eventos/")')
+
+
+# --- GET CONDICIONAL (ETag / 304) ---
+@override_settings(CACHES=CACHE_EN_ARCHIVOS)
+class GetCondicionalTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.usuarios = crear_empleados(Empresa.objects.create(nombre="Test", codigo_acceso="TEST"), [0] * 3)
+        self.yo = self.usuarios[0]
+        self.partido = Partido.objects.create(equipo_local="L", equipo_visitante="V", numero_fecha=1,
+                                              fecha_hora=timezone.now() + timedelta(hours=2))
+        Pronostico.objects.create(usuario=self.usuarios[1], partido=self.partido,
+                                  goles_local_prediccion=1, goles_visitante_prediccion=0)
+        self.client.force_login(self.yo)
+
+    def revalidar(self, url, cliente=None):
+        """Pide la página, la vuelve a pedir con su ETag y devuelve (304?, consultas a tablas de la app)."""
+        cliente = cliente or self.client
+        primera = cliente.get(url)
+        self.assertEqual(primera.status_code, 200)
+        self.assertIn('no-cache', primera['Cache-Control'])
+        self.assertIn('Last-Modified', primera)
+        with CaptureQueriesContext(connection) as capturadas:
+            segunda = cliente.get(url, HTTP_IF_NONE_MATCH=primera['ETag'])
+        return segunda.status_code == 304, [q['sql'] for q in capturadas.captured_queries if 'core_' in q['sql']]
+
+    def test_pagina_sin_cambios_responde_304_sin_consultas(self):
+        torneo = Torneo.objects.create(nombre="Amigos", creador=self.yo)
+        torneo.participantes.add(self.yo)
+
+        for url in ('/ranking/', '/prode/', f'/torneos/{torneo.id}/', f'/empresas/{self.yo.perfilempleado.empresa_id}/'):
+            no_modificada, consultas = self.revalidar(url)
+            self.assertTrue(no_modificada, url)
+            self.assertEqual(consultas, [], url)
+
+        # Sin sesión el ranking no consulta nada (ni la sesión)
+        anonimo = Client()
+        primera = anonimo.get('/ranking/')
+        with self.assertNumQueries(0):
+            self.assertEqual(anonimo.get('/ranking/', HTTP_IF_NONE_MATCH=primera['ETag']).status_code, 304)
+
+    def test_etag_cambia_con_los_datos(self):
+        ranking, prode = self.client.get('/ranking/')['ETag'], self.client.get('/prode/')['ETag']
+
+        # Guardar un pronóstico cambia solo mi prode
+        self.client.post('/prode/?fecha=1', {f'local_{self.partido.id}': 2, f'visitante_{self.partido.id}': 2})
+        self.assertNotEqual(self.client.get('/prode/')['ETag'], prode)
+        self.assertEqual(self.client.get('/ranking/')['ETag'], ranking)
+        prode = self.client.get('/prode/')['ETag']
+
+        # Puntuar el partido cambia el ranking y la fecha
+        self.partido.fecha_hora = timezone.now() - timedelta(hours=2)
+        self.partido.jugado, self.partido.goles_local_real, self.partido.goles_visitante_real = True, 1, 0
+        with self.captureOnCommitCallbacks(execute=True):
+            self.partido.save()
+        self.assertNotEqual(self.client.get('/ranking/')['ETag'], ranking)
+        self.assertNotEqual(self.client.get('/prode/')['ETag'], prode)
+
+        # Otro usuario (otra sesión) nunca recibe el ETag del primero
+        otro = Client()
+        otro.force_login(self.usuarios[1])
+        self.assertNotEqual(otro.get('/ranking/')['ETag'], self.client.get('/ranking/')['ETag'])
+
+    def test_partido_que_empieza_cambia_el_prode(self):
+        from django.utils import timezone as tz
+
+        etag = self.client.get('/prode/?fecha=1')['ETag']
+        despues = timezone.now() + timedelta(hours=3)
+        with mock.patch.object(tz, 'now', return_value=despues):
+            respuesta = self.client.get('/prode/?fecha=1', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.context['lista_partidos'][0]['bloqueado'])
+
+    def test_unirse_al_torneo_cambia_su_pagina(self):
+        torneo = Torneo.objects.create(nombre="Amigos", creador=self.yo)
+        torneo.participantes.add(self.yo)
+        etag = self.client.get(f'/torneos/{torneo.id}/')['ETag']
+
+        torneo.participantes.add(self.usuarios[2])
+        self.assertEqual(self.client.get(f'/torneos/{torneo.id}/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_api_ranking_valida_el_alcance_antes_de_la_version(self):
+        torneo = Torneo.objects.create(nombre="Amigos", creador=self.yo)
+        torneo.participantes.add(self.yo)
+
+        # '?torneo=01' es el mismo torneo que '?torneo=1': misma versión, mismo ETag
+        etag = self.client.get(f'/api/ranking/?torneo={torneo.id}')['ETag']
+        respuesta = self.client.get(f'/api/ranking/?torneo=0{torneo.id}', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+        for url in ('/api/ranking/?torneo=x', '/api/ranking/?empresa=1x'):
+            respuesta = self.client.get(url)
+            self.assertEqual(respuesta.status_code, 400, url)
+            self.assertNotIn('ETag', respuesta)
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_sin_cache_compartida_no_hay_etag(self):
+        # Otro proceso podría haber cambiado los datos sin que esta cache se entere
+        respuesta = self.client.get('/ranking/')
+        self.assertNotIn('ETag', respuesta)
+        self.assertEqual(self.client.get('/ranking/', HTTP_IF_NONE_MATCH='"x"').status_code, 200)
+
+
+# --- API JSON ---
+class ApiTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.empresa = Empresa.objects.create(nombre="Test", codigo_acceso="TEST")
+        self.usuarios = crear_empleados(self.empresa, [3, 9, 6, 6, 0, 1, 6])
+        self.yo = self.usuarios[0]
+        self.client.force_login(self.yo)
+        ahora = timezone.now()
+        self.partidos = [
+            Partido.objects.create(equipo_local=f"L{i}", equipo_visitante=f"V{i}", numero_fecha=1,
+                                   fecha_hora=ahora + timedelta(hours=horas))
+            for i, horas in enumerate([-1, 2, 3])
+        ]
+
+    def test_partidos_con_campos_elegidos(self):
+        respuesta = self.client.get('/api/partidos/?fecha=1&campos=id,local,jugado')
+        self.assertEqual(respuesta.json(), {'partidos': [
+            {'id': partido.id, 'local': partido.equipo_local, 'jugado': False} for partido in self.partidos
+        ]})
+        # JSON compacto: sin espacios entre separadores
+        self.assertEqual(respuesta.content.decode(), json.dumps(respuesta.json(), separators=(',', ':')))
+
+        self.assertEqual(len(self.client.get('/api/partidos/?fecha=2').json()['partidos']), 0)
+        respuesta = self.client.get('/api/partidos/?campos=id,color')
+        self.assertEqual(respuesta.status_code, 400)
+        self.assertIn("color", respuesta.json()['error'])
+
+    def test_ranking_paginado_por_cursor(self):
+        paginas, cursor = [], None
+        while True:
+            url = '/api/ranking/?n=3&campos=posicion,usuario,puntos' + (f'&despues={cursor}' if cursor else '')
+            with self.assertNumQueries(1):
+                datos = Client().get(url).json()
+            paginas.append(datos['filas'])
+            cursor = datos['siguiente']
+            if cursor is None:
+                break
+
+        filas = [fila for pagina in paginas for fila in pagina]
+        self.assertEqual([len(pagina) for pagina in paginas], [3, 3, 1])
+        self.assertEqual([(f['posicion'], f['puntos']) for f in filas],
+                         [(1, 9), (2, 6), (2, 6), (2, 6), (5, 3), (6, 1), (7, 0)])
+        # Mismas posiciones que la tabla HTML
+        esperadas, _ = pagina_ranking(PerfilEmpleado.objects.all())
+        self.assertEqual([f['usuario'] for f in filas], [p.usuario.username for p in esperadas])
+
+    def test_ranking_de_torneo_solo_para_participantes(self):
+        torneo = Torneo.objects.create(nombre="Amigos", creador=self.yo)
+        torneo.participantes.add(self.yo, self.usuarios[1])
+
+        datos = self.client.get(f'/api/ranking/?torneo={torneo.id}&campos=usuario').json()
+        self.assertEqual(datos['filas'], [{'usuario': "user1"}, {'usuario': "user0"}])
+        ajeno = Client()
+        ajeno.force_login(self.usuarios[2])
+        self.assertEqual(ajeno.get(f'/api/ranking/?torneo={torneo.id}').status_code, 404)
+        self.assertEqual(self.client.get('/api/ranking/?empresa=x').status_code, 400)
+
+    def test_pronosticos_en_lote(self):
+        empezado, futuro, otro_futuro = self.partidos
+        lote = {'pronosticos': [
+            {'partido': empezado.id, 'local': 1, 'visitante': 0},
+            {'partido': futuro.id, 'local': 2, 'visitante': 2},
+            {'partido': otro_futuro.id, 'local': 0, 'visitante': 3},
+            {'partido': 9999, 'local': 0, 'visitante': 0},
+        ]}
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = self.client.post('/api/pronosticos/', lote, content_type='application/json')
+        # Los partidos del lote y un solo upsert
+        self.assertEqual(len([q for q in capturadas.captured_queries if 'core_' in q['sql']]), 2)
+        self.assertEqual(respuesta.json(), {'guardados': [futuro.id, otro_futuro.id],
+                                            'rechazados': sorted([empezado.id, 9999])})
+
+        datos = self.client.get('/api/pronosticos/?fecha=1&campos=partido,local,visitante').json()
+        self.assertEqual(datos['pronosticos'], [{'partido': futuro.id, 'local': 2, 'visitante': 2},
+                                                {'partido': otro_futuro.id, 'local': 0, 'visitante': 3}])
+
+        for cuerpo in ('no es json', {'pronosticos': [{'partido': futuro.id}]},
+                       {'pronosticos': [{'partido': futuro.id, 'local': -1, 'visitante': 0}]},
+                       {'pronosticos': [{'partido': futuro.id, 'local': "2", 'visitante': 0}]}):
+            respuesta = self.client.post('/api/pronosticos/', cuerpo, content_type='application/json')
+            self.assertEqual(respuesta.status_code, 400, cuerpo)
+
+        self.assertEqual(Client().get('/api/pronosticos/').status_code, 401)
+        self.assertEqual(self.client.delete('/api/pronosticos/').status_code, 405)
+
+    def test_torneos(self):
+        torneo = Torneo.objects.create(nombre="Amigos", creador=self.yo)
+        torneo.participantes.add(self.yo, self.usuarios[1], self.usuarios[4])
+
+        with self.assertNumQueries(3):  # sesión, usuario y la consulta de torneos
+            datos = self.client.get('/api/torneos/?campos=nombre,participantes,mi_posicion').json()
+        self.assertEqual(datos['torneos'], [{'nombre': "Amigos", 'participantes': 3, 'mi_posicion': 2}])
+
+
+# --- EXPORTACIONES ---
+class ExportacionTests(TestCase):
+
+    def setUp(self):
+        self.empresas = [Empresa.objects.create(nombre=f"Empresa {i}", codigo_acceso=f"E{i}") for i in range(2)]
+        self.partidos = [
+            Partido.objects.create(equipo_local=f"L{i}", equipo_visitante=f"V{i}", numero_fecha=i + 1,
+                                   fecha_hora=timezone.now() - timedelta(days=1), jugado=True,
+                                   goles_local_real=1, goles_visitante_real=0)
+            for i in range(2)
+        ]
+        self.usuarios = crear_empleados(self.empresas, [3, 6, 6, 1])
+        for i, usuario in enumerate(self.usuarios):
+            for partido in self.partidos:
+                Pronostico.objects.create(usuario=usuario, partido=partido, goles_local_prediccion=i,
+                                          goles_visitante_prediccion=0)
+        self.staff = User.objects.create(username="admin", is_staff=True)
+        self.client.force_login(self.staff)
+
+    def descargar(self, url):
+        respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+        return b''.join(respuesta.streaming_content).decode()
+
+    def test_ranking_csv(self):
+        import csv
+
+        filas = list(csv.reader(StringIO(self.descargar('/exportar/ranking/'))))
+        self.assertEqual(filas[0], ['posicion', 'usuario', 'empresa', 'puntos'])
+        self.assertEqual([(f[0], f[1], f[3]) for f in filas[1:]],
+                         [('1', 'user1', '6'), ('1', 'user2', '6'), ('3', 'user0', '3'), ('4', 'user3', '1')])
+
+        filas = list(csv.reader(StringIO(self.descargar(f'/exportar/ranking/?empresa={self.empresas[1].id}'))))
+        self.assertEqual([(f[0], f[1], f[2]) for f in filas[1:]], [('1', 'user1', 'Empresa 1'), ('2', 'user3', 'Empresa 1')])
+
+        # Con fecha: la foto del final de esa fecha
+        SnapshotRanking.objects.create(usuario=self.usuarios[3], numero_fecha=1, puntos=5, posicion=1)
+        SnapshotRanking.objects.create(usuario=self.usuarios[0], numero_fecha=1, puntos=2, posicion=2)
+        filas = list(csv.reader(StringIO(self.descargar('/exportar/ranking/?fecha=1'))))
+        self.assertEqual([(f[0], f[1], f[3]) for f in filas[1:]], [('1', 'user3', '5'), ('2', 'user0', '2')])
+
+    def test_pronosticos_ndjson(self):
+        torneo = Torneo.objects.create(nombre="Amigos", creador=self.usuarios[0])
+        torneo.participantes.add(self.usuarios[0], self.usuarios[2])
+
+        respuesta = self.client.get(f'/exportar/pronosticos/?formato=ndjson&fecha=2&torneo={torneo.id}')
+        self.assertEqual(respuesta['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertIn(f'pronosticos-torneo{torneo.id}-fecha2.ndjson', respuesta['Content-Disposition'])
+        filas = [json.loads(linea) for linea in b''.join(respuesta.streaming_content).decode().splitlines()]
+        self.assertEqual([(f['usuario'], f['fecha'], f['pronostico_local'], f['goles_local']) for f in filas],
+                         [('user0', 2, 0, 1), ('user2', 2, 2, 1)])
+        self.assertEqual(filas[0]['empresa'], "Empresa 0")
+
+    def test_de_a_tramos(self):
+        from . import exportacion
+
+        with mock.patch.object(exportacion, 'TAMANIO_TRAMO', 3):
+            bloques = list(exportacion.exportar('pronosticos'))
+        self.assertEqual([bloque.count('\n') for bloque in bloques], [3, 3, 3])  # encabezado + 8 filas
+
+    def test_solo_staff_y_parametros(self):
+        comun = Client()
+        comun.force_login(self.usuarios[0])
+        self.assertEqual(comun.get('/exportar/pronosticos/').status_code, 302)
+        self.assertEqual(self.client.get('/exportar/usuarios/').status_code, 404)
+        self.assertEqual(self.client.get('/exportar/ranking/?formato=xml').status_code, 404)
+        self.assertEqual(self.client.get('/exportar/ranking/?fecha=x').status_code, 400)
+
+    def test_comando(self):
+        salida = StringIO()
+        call_command('exportar', 'pronosticos', '--fecha', '1', '--formato', 'ndjson', stdout=salida)
+        self.assertEqual(len(salida.getvalue().splitlines()), 4)
+
+        with tempfile.TemporaryDirectory() as carpeta:
+            archivo = os.path.join(carpeta, 'ranking.csv')
+            call_command('exportar', 'ranking', '--empresa', str(self.empresas[0].id), '--salida', archivo,
+                         stdout=StringIO())
+            with open(archivo, encoding='utf-8') as entrada:
+                self.assertEqual(entrada.read().splitlines()[1:], ['1,user2,Empresa 0,6', '2,user0,Empresa 0,3'])
+
+
+class ExportacionAsgiTests(TransactionTestCase):
+
+    def setUp(self):
+        crear_empleados(Empresa.objects.create(nombre="E", codigo_acceso="E"), [0] * 3)
+        staff = Client()
+        staff.force_login(User.objects.create(username="admin", is_staff=True))
+        self.sesion = staff.cookies['sessionid'].value
+
+    def descargar(self, ruta, mientras=None):
+        """Pide `ruta` al handler ASGI; `mientras` corre en el mismo loop hasta que termina la respuesta."""
+        from .asgi import ManejadorASGI
+
+        cliente = ClienteSSEFalso(ManejadorASGI(), ruta=ruta)
+        cliente.scope['headers'] = [(b'host', b'testserver'), (b'cookie', f'sessionid={self.sesion}'.encode())]
+        cliente.entrantes.put_nowait({'type': 'http.request', 'body': b''})
+
+        async def escenario():
+            otra = asyncio.ensure_future(mientras()) if mientras else None
+            await cliente.correr()
+            if otra:
+                otra.cancel()
+
+        asyncio.run(escenario())
+        self.assertEqual(cliente.enviados[0]['status'], 200)
+        return cliente.cuerpo.decode()
+
+    def test_con_asgi_lee_la_base_fuera_del_event_loop(self):
+        # Django 4.1 recorre el streaming dentro del loop: ahí el ORM no se puede usar
+        texto = self.descargar('/exportar/ranking/')
+        self.assertEqual(texto.splitlines()[1:], ['1,user0,E,0', '1,user1,E,0', '1,user2,E,0'])
+
+    def test_no_frena_el_event_loop_mientras_arma_los_bloques(self):
+        def lento(que, formato, **filtros):
+            for _ in range(4):
+                time.sleep(0.05)
+                yield f"{User.objects.count()}\n"
+
+        vueltas = []
+
+        async def contar():
+            while True:
+                vueltas.append(time.monotonic())
+                await asyncio.sleep(0.01)
+
+        with mock.patch('core.exportacion.exportar', lento):
+            texto = self.descargar('/exportar/ranking/', mientras=contar)
+        self.assertEqual(texto, "4\n" * 4)
+        # 0.2 s armando bloques: el loop siguió dando vueltas mientras tanto
+        self.assertGreaterEqual(len(vueltas), 10)
@@ -1,6 +1,6 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views # Importamos vistas de autenticación
-from . import views
+from . import api, views
 
 urlpatterns = [
     path('', views.home, name='home'),
@@ -13,8 +13,22 @@ urlpatterns = [
     # --- RUTAS DEL JUEGO ---
     path('prode/', views.prode, name='prode'),
     path('ranking/', views.ranking, name='ranking'),
+    path('ranking/alrededor/', views.ranking_alrededor, name='ranking_alrededor'),
+    path('ranking/historial/', views.ranking_historial, name='ranking_historial'),
+    path('empresas/', views.ranking_empresas, name='ranking_empresas'),
+    path('empresas/<int:empresa_id>/', views.ranking_empresa, name='ranking_empresa'),
     
     # --- RUTAS DE TORNEOS ---
     path('torneos/', views.mis_torneos, name='mis_torneos'),
     path('torneos/<int:torneo_id>/', views.detalle_torneo, name='detalle_torneo'),
+
+    # --- API JSON ---
+    path('api/partidos/', api.partidos, name='api_partidos'),
+    path('api/pronosticos/', api.pronosticos, name='api_pronosticos'),
+    path('api/ranking/', api.ranking, name='api_ranking'),
+    path('api/torneos/', api.torneos, name='api_torneos'),
+
+    # --- MÉTRICAS Y EXPORTACIONES (STAFF) ---
+    path('metricas/', views.ver_metricas, name='metricas'),
+    path('exportar/<str:que>/', views.exportar, name='exportar'),
 ]
\ No newline at end of file
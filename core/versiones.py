@@ -0,0 +1,74 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# --- VERSIONES DE DATOS (para invalidar cache) ---
+# Cada "dominio" de datos (ej: 'fixture') tiene un número de versión guardado
+# en la cache. Las claves cacheadas incluyen ese número: al incrementarlo,
+# todo lo guardado con la versión vieja deja de usarse sin tener que borrarlo.
+#
+# La versión es un timestamp en microsegundos (y no un contador que arranca
+# en 1) para que, si la cache pierde la clave, la versión nueva nunca
+# coincida con una vieja que todavía tenga datos guardados.
+#
+# Con una cache local (LocMemCache, la de por defecto) cada proceso tiene sus
+# propias versiones: un incrementar() hecho en otro proceso (otro worker,
+# cron, vigilar_partidos) no se ve. Ver cache_compartida(): en ese caso lo
+# cacheado dura como mucho DURACION_LOCAL, así nunca queda viejo mucho tiempo.
+
+DURACION_LOCAL = 60
+
+BACKENDS_LOCALES = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def cache_compartida():
+    """True si todos los procesos usan la misma cache (y ven las mismas versiones)."""
+    return settings.CACHES['default']['BACKEND'] not in BACKENDS_LOCALES
+
+
+def duracion(segundos):
+    """Timeout para cache.set: el pedido con cache compartida, DURACION_LOCAL como máximo si no."""
+    return segundos if cache_compartida() else min(segundos, DURACION_LOCAL)
+
+
+def _clave(dominio):
+    return f"version:{dominio}"
+
+
+def version(dominio):
+    """Versión actual de un dominio. Si no existe, la crea."""
+    actual = cache.get(_clave(dominio))
+    if actual is None:
+        cache.add(_clave(dominio), time.time_ns() // 1000, timeout=None)
+        actual = cache.get(_clave(dominio))
+    return actual
+
+
+def incrementar(*dominios):
+    """Marca uno o más dominios como modificados."""
+    actuales = cache.get_many([_clave(d) for d in dominios])
+    ahora = time.time_ns() // 1000
+    cache.set_many({
+        _clave(d): max(ahora, actuales.get(_clave(d), 0) + 1) for d in dominios
+    }, timeout=None)
+
+
+def incrementar_al_confirmar(*dominios):
+    """
+    Como incrementar, pero cuando se confirma la transacción en curso (enseguida
+    si no hay ninguna). Antes, otra conexión todavía ve los datos viejos y los
+    guardaría en la cache con la versión nueva.
+    """
+    if dominios:
+        transaction.on_commit(lambda: incrementar(*dominios))
+
+
+def versiones(*dominios):
+    """Versiones de varios dominios con una sola lectura de la cache (crea las que falten)."""
+    actuales = cache.get_many([_clave(d) for d in dominios])
+    return [actuales.get(_clave(d)) or version(d) for d in dominios]
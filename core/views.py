@@ -1,11 +1,19 @@
-from django.shortcuts import render, redirect
+from django.conf import settings
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
+from django.db.models import Case, Count, F, FloatField, OuterRef, Q, Subquery, When
 from django.utils import timezone
 from django.contrib import messages
-from .models import Partido, Pronostico, PerfilEmpleado, Empresa, Torneo
+from . import exportacion, fixture, metricas
+from .condicional import dominios_prode, dominios_ranking, dominios_ranking_empresa, dominios_torneo, segun_versiones
+from .models import Partido, Pronostico, PerfilEmpleado, Empresa, SnapshotRanking, Torneo
+from .pronosticos import guardar_pronosticos
+from .ranking import alrededor, pagina_ranking, pagina_ranking_empresa, pagina_ranking_torneo, perfiles_del_alcance
 
 # --- VISTA 1: REGISTRO DE USUARIO ---
 def registro(request):
@@ -32,58 +40,64 @@ def home(request):
     return render(request, 'home.html')
 
 # --- VISTA 3: PRODE (JUEGO) ---
+def fecha_a_mostrar(fecha_pedida, fechas_disponibles, ahora):
+    """Fecha a mostrar: la pedida, la del próximo partido o la última (fin de temporada)."""
+    if fecha_pedida:
+        return int(fecha_pedida)
+
+    # Busca el primer partido que empiece HOY o en el futuro
+    fecha_proximo_partido = fixture.fecha_del_proximo_partido(ahora)
+
+    if fecha_proximo_partido:
+        # Si hay partido futuro, mostrar esa fecha
+        return fecha_proximo_partido
+    # Si no hay (fin de temporada), mostrar la última disponible
+    return fechas_disponibles[-1] if fechas_disponibles else 1
+
+
 @login_required
+@segun_versiones(dominios_prode)
 def prode(request):
     usuario_actual = request.user
     ahora = timezone.now()
     
-    # Obtener listado de fechas para el dropdown
-    fechas_disponibles = Partido.objects.values_list('numero_fecha', flat=True).distinct().order_by('numero_fecha')
-    
-    # --- LÓGICA DE FECHA INTELIGENTE ---
-    fecha_seleccionada = request.GET.get('fecha')
-    
-    if not fecha_seleccionada:
-        # Busca el primer partido que empiece HOY o en el futuro
-        proximo_partido = Partido.objects.filter(fecha_hora__gte=ahora).order_by('fecha_hora').first()
-        
-        if proximo_partido:
-            # Si hay partido futuro, mostrar esa fecha
-            fecha_seleccionada = proximo_partido.numero_fecha
-        else:
-            # Si no hay (fin de temporada), mostrar la última disponible
-            fecha_seleccionada = fechas_disponibles.last() if fechas_disponibles else 1
-    
-    if fecha_seleccionada:
-        fecha_seleccionada = int(fecha_seleccionada)
+    # Obtener listado de fechas para el dropdown (compartido, desde la cache)
+    fechas_disponibles = fixture.fechas_disponibles()
+    fecha_seleccionada = fecha_a_mostrar(request.GET.get('fecha'), fechas_disponibles, ahora)
 
     # GUARDAR PRONÓSTICOS (POST)
     if request.method == "POST":
-        partidos_de_la_fecha = Partido.objects.filter(numero_fecha=fecha_seleccionada)
-        
+        # El bloqueo por horario se decide con la base y no con el fixture
+        # cacheado: la cache puede no ver los cambios del cron o del admin
+        partidos_de_la_fecha = list(
+            Partido.objects.filter(numero_fecha=fecha_seleccionada).only('id', 'fecha_hora', 'jugado')
+        )
+
+        goles_por_partido = {}
         for partido in partidos_de_la_fecha:
-            # Seguridad: Bloquear si el partido ya empezó
-            if partido.fecha_hora > ahora:
-                goles_local = request.POST.get(f'local_{partido.id}')
-                goles_visitante = request.POST.get(f'visitante_{partido.id}')
-
-                if goles_local and goles_visitante:
-                    Pronostico.objects.update_or_create(
-                        usuario=usuario_actual,
-                        partido=partido,
-                        defaults={
-                            'goles_local_prediccion': int(goles_local),
-                            'goles_visitante_prediccion': int(goles_visitante)
-                        }
-                    )
+            goles_local = request.POST.get(f'local_{partido.id}')
+            goles_visitante = request.POST.get(f'visitante_{partido.id}')
+
+            if goles_local and goles_visitante:
+                goles_por_partido[partido.id] = (int(goles_local), int(goles_visitante))
+
+        # Se guardan todos juntos (los partidos ya empezados se ignoran)
+        guardar_pronosticos(usuario_actual, partidos_de_la_fecha, goles_por_partido, ahora)
         return redirect(f'/prode/?fecha={fecha_seleccionada}')
 
     # MOSTRAR DATOS (GET)
-    partidos = Partido.objects.filter(numero_fecha=fecha_seleccionada).order_by('fecha_hora')
+    # Los partidos son iguales para todos: vienen de la cache
+    partidos = fixture.partidos_de_fecha(fecha_seleccionada)
+
+    # Todos mis pronósticos de la fecha en UNA consulta, indexados por partido
+    mis_pronosticos = {
+        pron.partido_id: pron
+        for pron in Pronostico.objects.filter(usuario=usuario_actual, partido__numero_fecha=fecha_seleccionada)
+    }
     lista_partidos = []
     
     for p in partidos:
-        pronostico = Pronostico.objects.filter(usuario=usuario_actual, partido=p).first()
+        pronostico = mis_pronosticos.get(p.id)
         # Bloquear si ya se jugó O si ya pasó la hora
         esta_bloqueado = p.jugado or (p.fecha_hora < ahora)
 
@@ -103,9 +117,119 @@ def prode(request):
     return render(request, 'prode.html', contexto)
 
 # --- VISTA 4: RANKING GLOBAL ---
+@segun_versiones(dominios_ranking)
 def ranking(request):
-    perfiles = PerfilEmpleado.objects.all().order_by('-puntos_totales')
-    return render(request, 'ranking.html', {'perfiles': perfiles})
+    # Página de la tabla (con la posición calculada en la base)
+    cursor = request.GET.get('despues')
+
+    # Posición en la última fecha terminada (para las flechas de movimiento):
+    # una búsqueda por índice (usuario, numero_fecha) por fila, en la misma consulta
+    ultima_foto = SnapshotRanking.objects.filter(usuario=OuterRef('usuario')).order_by('-numero_fecha')
+    con_historial = PerfilEmpleado.objects.annotate(
+        posicion_anterior=Subquery(ultima_foto.values('posicion')[:1])
+    )
+    perfiles, cursor_siguiente = pagina_ranking(con_historial, cursor)
+    for perfil in perfiles:
+        if perfil.posicion_anterior is not None:
+            perfil.subio = max(perfil.posicion_anterior - perfil.posicion, 0)
+            perfil.bajo = max(perfil.posicion - perfil.posicion_anterior, 0)
+
+    # "Mi posición": el usuario y sus vecinos, aunque esté lejos de esta página
+    # (una consulta, sin leer antes el perfil)
+    mi_zona = None
+    if request.user.is_authenticated:
+        mi_zona = alrededor(PerfilEmpleado.objects.all(), PerfilEmpleado.objects.filter(usuario=request.user))
+
+    return render(request, 'ranking.html', {
+        'perfiles': perfiles,
+        'cursor_siguiente': cursor_siguiente,
+        'es_primera_pagina': not cursor,
+        'mi_zona': mi_zona,
+    })
+
+# --- VISTA 4B: MI POSICIÓN (JSON) ---
+@login_required
+def ranking_alrededor(request):
+    """
+    Mi posición y N vecinos de arriba y de abajo en el ranking global,
+    de una empresa (?empresa=<id>) o de un torneo (?torneo=<id>).
+    """
+    mi_perfil = PerfilEmpleado.objects.select_related('usuario', 'empresa').filter(usuario=request.user).first()
+    if mi_perfil is None:
+        raise Http404("El usuario no tiene perfil")
+
+    try:
+        cantidad = min(int(request.GET.get('n', 3)), 25)
+        empresa_id = int(request.GET['empresa']) if request.GET.get('empresa') else None
+        torneo_id = int(request.GET['torneo']) if request.GET.get('torneo') else None
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
+
+    # Solo se puede mirar la tabla de una empresa o un torneo propio
+    if empresa_id is not None and empresa_id != mi_perfil.empresa_id:
+        raise Http404("No pertenecés a esa empresa")
+    if torneo_id is not None and not Torneo.objects.filter(id=torneo_id, participantes=request.user).exists():
+        raise Http404("No participás de ese torneo")
+
+    filas = alrededor(perfiles_del_alcance(empresa_id, torneo_id), mi_perfil, max(cantidad, 0))
+
+    return JsonResponse({
+        'posicion': mi_perfil.posicion,
+        'filas': [
+            {
+                'posicion': perfil.posicion,
+                'usuario': perfil.usuario.username,
+                'empresa': perfil.empresa.nombre if perfil.empresa else None,
+                'puntos': perfil.puntos_totales,
+                'soy_yo': perfil.id == mi_perfil.id,
+            }
+            for perfil in filas
+        ],
+    })
+
+# --- VISTA 4C: HISTORIAL DE POSICIONES (JSON) ---
+@login_required
+def ranking_historial(request):
+    """Puntos y posición al final de cada fecha (mío o de ?usuario=<nombre>)."""
+    nombre = request.GET.get('usuario')
+    usuario = get_object_or_404(User, username=nombre) if nombre else request.user
+
+    fotos = SnapshotRanking.objects.filter(usuario=usuario).order_by('numero_fecha')
+    return JsonResponse({
+        'usuario': usuario.username,
+        'fechas': [
+            {'fecha': numero_fecha, 'puntos': puntos, 'posicion': posicion}
+            for numero_fecha, puntos, posicion in fotos.values_list('numero_fecha', 'puntos', 'posicion')
+        ],
+    })
+
+# --- VISTA 4D: RANKING DE UNA EMPRESA ---
+@segun_versiones(dominios_ranking_empresa)
+def ranking_empresa(request, empresa_id):
+    empresa = get_object_or_404(Empresa, id=empresa_id)
+
+    cursor = request.GET.get('despues')
+    perfiles, cursor_siguiente = pagina_ranking_empresa(empresa.id, cursor)
+
+    return render(request, 'ranking.html', {
+        'titulo': f"🏢 {empresa.nombre}",
+        'perfiles': perfiles,
+        'cursor_siguiente': cursor_siguiente,
+        'es_primera_pagina': not cursor,
+    })
+
+# --- VISTA 4E: EMPRESA VS EMPRESA ---
+def ranking_empresas(request):
+    # Los totales ya están guardados en cada Empresa: no hace falta agrupar perfiles
+    empresas = Empresa.objects.filter(cantidad_empleados__gt=0).annotate(
+        promedio_puntos=Case(
+            When(cantidad_empleados__gt=0, then=F('puntos_totales') * 1.0 / F('cantidad_empleados')),
+            default=0.0,
+            output_field=FloatField(),
+        )
+    ).order_by('-promedio_puntos', '-puntos_totales')
+
+    return render(request, 'empresas.html', {'empresas': empresas})
 
 # --- VISTA 5: MIS TORNEOS (PANEL PRINCIPAL) ---
 @login_required
@@ -123,7 +247,7 @@ def mis_torneos(request):
         codigo = request.POST.get('codigo_torneo', '').upper().strip()
         try:
             torneo = Torneo.objects.get(codigo=codigo)
-            if request.user in torneo.participantes.all():
+            if torneo.participantes.filter(pk=request.user.pk).exists():
                 messages.warning(request, "¡Ya estás en este torneo!")
             else:
                 torneo.participantes.add(request.user)
@@ -132,19 +256,68 @@ def mis_torneos(request):
         except Torneo.DoesNotExist:
             messages.error(request, "Código inválido. Verifica e intenta de nuevo.")
 
-    # Listar mis torneos
-    mis_grupos = request.user.torneos_participados.all()
+    # Listar mis torneos, con la cantidad de participantes y mi posición en
+    # cada uno (1 + los que tienen más puntos que yo), todo en una consulta
+    mis_puntos = PerfilEmpleado.objects.filter(usuario=request.user).values('puntos_totales')[:1]
+    mis_grupos = Torneo.objects.filter(
+        id__in=Torneo.participantes.through.objects.filter(user=request.user).values('torneo')
+    ).annotate(
+        cantidad_participantes=Count('participantes', distinct=True),
+        mejores=Count(
+            'participantes',
+            filter=Q(participantes__perfilempleado__puntos_totales__gt=Subquery(mis_puntos)),
+            distinct=True,
+        ),
+    ).order_by('nombre')
+    for torneo in mis_grupos:
+        torneo.mi_posicion = torneo.mejores + 1
+
     return render(request, 'torneos.html', {'mis_grupos': mis_grupos})
 
 # --- VISTA 6: RANKING DEL TORNEO ---
 @login_required
+@segun_versiones(dominios_torneo)
 def detalle_torneo(request, torneo_id):
-    torneo = Torneo.objects.get(id=torneo_id)
-    
-    if request.user not in torneo.participantes.all():
+    torneo = get_object_or_404(Torneo, id=torneo_id)
+
+    # Una búsqueda por índice en la tabla intermedia, sin traer a todos los participantes
+    if not torneo.participantes.filter(pk=request.user.pk).exists():
         return redirect('mis_torneos')
 
-    participantes_ids = torneo.participantes.values_list('id', flat=True)
-    perfiles = PerfilEmpleado.objects.filter(usuario__id__in=participantes_ids).order_by('-puntos_totales')
+    # La tabla del torneo sale de la cache mientras nadie sume puntos ni se una
+    cursor = request.GET.get('despues')
+    perfiles, cursor_siguiente = pagina_ranking_torneo(torneo.id, cursor)
+
+    return render(request, 'detalle_torneo.html', {
+        'torneo': torneo,
+        'perfiles': perfiles,
+        'cursor_siguiente': cursor_siguiente,
+        'es_primera_pagina': not cursor,
+    })
+
+# --- VISTA 7: MÉTRICAS (SOLO STAFF) ---
+@staff_member_required
+def ver_metricas(request):
+    """p50/p95/p99 y consultas por vista de este proceso (PRODE_METRICAS=1)."""
+    return JsonResponse({'activas': settings.PRODE_METRICAS, 'vistas': metricas.resumen()})
+
+# --- VISTA 8: EXPORTACIONES (SOLO STAFF) ---
+@staff_member_required
+def exportar(request, que):
+    """
+    Tabla de posiciones o pronósticos en streaming (?formato=csv|ndjson),
+    filtrados por ?empresa=<id>, ?torneo=<id> y/o ?fecha=<n>.
+    """
+    formato = request.GET.get('formato', 'csv')
+    if que not in exportacion.EXPORTACIONES or formato not in exportacion.FORMATOS:
+        raise Http404("Exportación desconocida")
+    try:
+        filtros = {clave: int(request.GET[clave]) for clave in ('empresa', 'torneo', 'fecha') if request.GET.get(clave)}
+    except ValueError:
+        return JsonResponse({'error': 'Parámetros inválidos'}, status=400)
 
-    return render(request, 'detalle_torneo.html', {'torneo': torneo, 'perfiles': perfiles})
\ No newline at end of file
+    bloques = exportacion.exportar(que, formato, **filtros)
+    nombre = '-'.join([que, *[f"{clave}{valor}" for clave, valor in filtros.items()]])
+    respuesta = StreamingHttpResponse(bloques, content_type=exportacion.FORMATOS[formato])
+    respuesta['Content-Disposition'] = f'attachment; filename="{nombre}.{formato}"'
+    return respuesta
@@ -9,8 +9,23 @@ https://docs.djangoproject.com/en/4.1/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mundial_prode.settings')
+# Con ASGI cada pedido corre su parte sync en un hilo propio: las conexiones
+# persistentes quedarían abiertas en hilos muertos
+os.environ.setdefault('PRODE_CONN_MAX_AGE', '0')
+# Resultados en vivo por /eventos/ (solo se puede con ASGI)
+os.environ.setdefault('PRODE_EN_VIVO', '1')
 
-application = get_asgi_application()
+# Como get_asgi_application(), pero con el handler que arma los streaming
+# (exportaciones) fuera del event loop
+django.setup(set_prefix=False)
+
+from core.asgi import ManejadorASGI  # noqa: E402 (después de configurar Django)
+from core.en_vivo import AplicacionEventos  # noqa: E402
+
+django_application = ManejadorASGI()
+
+# /eventos/ lo atiende el stream de resultados en vivo; todo lo demás, Django
+application = AplicacionEventos(django_application)
@@ -42,6 +42,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.metricas.MetricasMiddleware',  # Solo se activa con PRODE_METRICAS=1
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -66,6 +67,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.en_vivo',
             ],
         },
     },
@@ -79,10 +81,49 @@ WSGI_APPLICATION = 'mundial_prode.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # PRODE_DB permite usar otra base (ej: un mundo sintético para benchmarks)
+        'NAME': os.getenv('PRODE_DB', BASE_DIR / 'db.sqlite3'),
+        # Conexiones persistentes: no abrir (y reconfigurar) una por pedido
+        'CONN_MAX_AGE': int(os.getenv('PRODE_CONN_MAX_AGE', '600')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# PRAGMAs que se aplican a cada conexión nueva (ver core/sqlite.py):
+# - journal_mode WAL: los lectores no esperan a los escritores
+# - busy_timeout: un escritor espera hasta N ms el lock en vez de fallar
+# - synchronous NORMAL: en WAL no pierde consistencia, solo fsync al checkpoint
+# - cache_size negativo = KiB de cache de páginas por conexión
+PRODE_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': int(os.getenv('PRODE_SQLITE_BUSY_TIMEOUT_MS', '20000')),
+    'synchronous': 'NORMAL',
+    'cache_size': -int(os.getenv('PRODE_SQLITE_CACHE_KB', '20000')),
+}
+
+
+# Cache
+# Por defecto en memoria (sirve para un solo proceso). Si corren varios
+# procesos (varios workers web + cron/vigilar_partidos) definir PRODE_CACHE_DIR
+# para que todos compartan la misma cache en disco. Sin cache compartida no hay
+# GET condicional (ETag/304, ver core/condicional.py) y el fixture y las tablas
+# se guardan solo por un minuto (core/versiones.py, DURACION_LOCAL).
+
+if os.getenv('PRODE_CACHE_DIR'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.getenv('PRODE_CACHE_DIR'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'prode',
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -128,4 +169,26 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # A dónde ir después de iniciar sesión
 LOGIN_REDIRECT_URL = 'home'
 # A dónde ir después de cerrar sesión
-LOGOUT_REDIRECT_URL = 'home'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = 'home'
+
+# --- API DE FOOTBALL DATA ---
+FOOTBALL_DATA_URL = os.getenv('FOOTBALL_DATA_URL', 'https://api.football-data.org/v4')
+# Competencia a sincronizar (2021 = Premier League, 2000 = Mundial). Es una
+# sola: el fixture, el prode y el historial se arman por número de fecha
+FOOTBALL_DATA_COMPETICION = os.getenv('COMPETICION', '2021')
+# Acá se guardan los ETag de la API entre ejecuciones (GET condicional)
+FOOTBALL_DATA_ESTADO = os.getenv('FOOTBALL_DATA_ESTADO', str(BASE_DIR / '.football_data_estado.json'))
+# Archivo que actualiza "manage.py vigilar_partidos" en cada vuelta (para monitorearlo)
+PRODE_HEARTBEAT = os.getenv('PRODE_HEARTBEAT', str(BASE_DIR / '.vigilar_partidos.heartbeat'))
+
+# --- MÉTRICAS ---
+# Tiempos y consultas por vista (se ven en /metricas/, solo staff)
+PRODE_METRICAS = os.getenv('PRODE_METRICAS') == '1'
+# Los pedidos más lentos que esto se escriben en el log
+PRODE_METRICAS_UMBRAL_MS = int(os.getenv('PRODE_METRICAS_UMBRAL_MS', '500'))
+
+# --- RESULTADOS EN VIVO ---
+# Lo activa mundial_prode/asgi.py: las páginas se conectan a /eventos/ (SSE)
+PRODE_EN_VIVO = os.getenv('PRODE_EN_VIVO') == '1'
+# Cada cuántos segundos el proceso ASGI busca eventos nuevos (una consulta para todos los clientes)
+PRODE_EN_VIVO_INTERVALO = float(os.getenv('PRODE_EN_VIVO_INTERVALO', '1'))